@@ -0,0 +1,11 @@
+from core.base_service import BaseService
+from utils.httpclient import http_clients
+
+__all__ = ("HTTPClientService",)
+
+
+class HTTPClientService(BaseService.Dependence):
+    """共用 HTTP 客户端的生命周期管理，Bot 关闭时关闭所有连接"""
+
+    async def shutdown(self):
+        await http_clients.close()
@@ -0,0 +1 @@
+"""RenderCacheService"""
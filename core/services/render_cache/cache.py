@@ -0,0 +1,49 @@
+from typing import Optional, Sequence
+
+from core.base_service import BaseService
+from core.dependence.redisdb import RedisDB
+
+__all__ = ("RenderResultCache",)
+
+
+class RenderResultCache(BaseService.Component):
+    """渲染结果缓存，保存渲染输入的哈希值对应的 Telegram file_id"""
+
+    qname = "render_cache"
+
+    def __init__(self, redis: RedisDB):
+        self.client = redis.client
+
+    def get_key(self, digest: str, file_type: str) -> str:
+        return f"{self.qname}:file_id:{file_type}:{digest}"
+
+    def get_tag_key(self, tag: str) -> str:
+        return f"{self.qname}:tag:{tag}"
+
+    async def get_file_id(self, digest: str, file_type: str) -> Optional[str]:
+        data = await self.client.get(self.get_key(digest, file_type))
+        if data is None:
+            return None
+        return str(data, encoding="utf-8")
+
+    async def set_file_id(self, digest: str, file_type: str, file_id: str, ttl: int, tags: Sequence[str] = ()):
+        """保存 file_id，并记录到标签中以便按标签清除"""
+        key = self.get_key(digest, file_type)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(key, file_id, ex=ttl)
+            for tag in tags:
+                tag_key = self.get_tag_key(tag)
+                pipe.sadd(tag_key, key)
+                pipe.expire(tag_key, ttl)
+            await pipe.execute()
+
+    async def invalidate(self, tag: str) -> int:
+        """清除标签下的所有缓存
+        :return: 清除的缓存数量
+        """
+        tag_key = self.get_tag_key(tag)
+        keys = await self.client.smembers(tag_key)
+        if keys:
+            await self.client.delete(*keys)
+        await self.client.delete(tag_key)
+        return len(keys)
@@ -0,0 +1,99 @@
+"""渲染结果编码
+
+浏览器截图为 PNG，作为图片发送时 Telegram 会重新压缩为 JPEG，因此默认在上传前编码为 JPEG，
+并按 Telegram 的图片限制缩放。无法通过缩放满足限制的图片保留原始 PNG。
+"""
+
+from enum import Enum
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from pydantic_settings import SettingsConfigDict
+
+from gram_core.basemodel import Settings
+
+__all__ = ("OutputFormat", "RenderOutputConfig", "ImageEncoder")
+
+
+class OutputFormat(str, Enum):
+    PNG = "png"
+    JPEG = "jpeg"
+    WEBP = "webp"
+
+
+class RenderOutputConfig(Settings):
+    """渲染结果编码配置"""
+
+    format: OutputFormat = OutputFormat.JPEG
+    """默认编码格式"""
+    quality: int = 90
+    """JPEG 与 WebP 的质量"""
+    templates: Dict[str, OutputFormat] = {}
+    """按模板指定编码格式"""
+    max_size: int = 10 * 1024 * 1024
+    """图片最大字节数"""
+    max_side_sum: int = 10000
+    """图片宽高之和的最大值"""
+    max_ratio: float = 20
+    """图片宽高比的最大值"""
+    min_scale: float = 0.5
+    """最小缩放比例，需要缩放得更小时不做处理"""
+
+    model_config = SettingsConfigDict(env_prefix="render_output_")
+
+
+class ImageEncoder:
+    """渲染结果编码器"""
+
+    def __init__(self, config: Optional[RenderOutputConfig] = None):
+        self.config = config or RenderOutputConfig()
+
+    def get_format(self, template_name: str, output_format: Optional[OutputFormat] = None) -> OutputFormat:
+        """模板的编码格式，优先使用调用时指定的格式，其次为配置中按模板指定的格式"""
+        if output_format is not None:
+            return output_format
+        return self.config.templates.get(template_name, self.config.format)
+
+    def get_scale(self, width: int, height: int) -> Optional[float]:
+        """满足图片限制需要的缩放比例
+        :return: 缩放比例，无法通过缩放满足时为 None
+        """
+        if max(width, height) > self.config.max_ratio * min(width, height):
+            return None
+        scale = min(1.0, self.config.max_side_sum / (width + height))
+        if scale < self.config.min_scale:
+            return None
+        return scale
+
+    def encode(self, data: bytes, output_format: OutputFormat) -> Tuple[Optional[bytes], str]:
+        """编码为适合以图片发送的格式
+        :param data: PNG 截图
+        :param output_format: 编码格式
+        :return: 编码结果与文件扩展名，无法以图片发送时编码结果为 None
+        """
+        from PIL import Image  # pylint: disable=C0415
+
+        with Image.open(BytesIO(data)) as image:
+            scale = self.get_scale(image.width, image.height)
+            if scale is None:
+                return None, "png"
+            if scale == 1 and output_format == OutputFormat.PNG and len(data) <= self.config.max_size:
+                return data, "png"
+            if scale < 1:
+                size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+                image = image.resize(size, Image.LANCZOS)
+            quality = self.config.quality
+            while True:
+                output = BytesIO()
+                if output_format == OutputFormat.PNG:
+                    image.save(output, "PNG", optimize=True)
+                elif output_format == OutputFormat.WEBP:
+                    image.save(output, "WEBP", quality=quality, method=4)
+                else:
+                    image.convert("RGB").save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+                result = output.getvalue()
+                if len(result) <= self.config.max_size:
+                    return result, output_format.value.replace("jpeg", "jpg")
+                if output_format == OutputFormat.PNG or quality <= 50:
+                    return None, "png"
+                quality -= 10
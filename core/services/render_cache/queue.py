@@ -0,0 +1,181 @@
+"""渲染队列
+
+限制同时进行的浏览器渲染数量，超出的请求按优先级排队，同一优先级内按对话轮流执行，
+避免单个对话的大量请求占满所有渲染位置。
+"""
+
+import asyncio
+import time
+from collections import Counter, OrderedDict, deque
+from enum import IntEnum
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional, TypeVar
+
+from pydantic_settings import SettingsConfigDict
+
+from gram_core.basemodel import Settings
+
+__all__ = ("RenderQueueConfig", "RenderPriority", "RenderQueueFull", "RenderQueue")
+
+T = TypeVar("T")
+
+
+class RenderQueueConfig(Settings):
+    """渲染队列配置"""
+
+    workers: int = 4
+    """同时进行的渲染数"""
+    max_queue: int = 100
+    """最多排队的渲染数，超出时拒绝新的渲染"""
+    template_workers: int = 0
+    """同一模板同时进行的渲染数，0 表示不限制"""
+
+    model_config = SettingsConfigDict(env_prefix="render_queue_")
+
+
+class RenderPriority(IntEnum):
+    """渲染优先级，数值越小越先执行"""
+
+    INTERACTIVE = 0
+    """用户命令"""
+    BATCH = 10
+    """定时任务等批量渲染"""
+
+
+class RenderQueueFull(Exception):
+    """渲染队列已满"""
+
+
+class _Waiter:
+    __slots__ = ("future", "template", "enqueued")
+
+    def __init__(self, future: "asyncio.Future", template: str):
+        self.future = future
+        self.template = template
+        self.enqueued = time.monotonic()
+
+
+class RenderQueue:
+    """渲染队列"""
+
+    def __init__(self, workers: int = 4, max_queue: int = 100, template_workers: int = 0):
+        """
+        :param workers: 同时进行的渲染数
+        :param max_queue: 最多排队的渲染数
+        :param template_workers: 同一模板同时进行的渲染数，0 表示不限制
+        """
+        self.workers = max(workers, 1)
+        self.max_queue = max_queue
+        self.template_workers = template_workers
+        self._queues: Dict[int, "OrderedDict[Hashable, Deque[_Waiter]]"] = {}
+        self._template_running: Counter = Counter()
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.avg_wait = 0.0
+        self.max_wait = 0.0
+
+    def _can_start(self, template: str) -> bool:
+        if self.running >= self.workers:
+            return False
+        return not self.template_workers or self._template_running[template] < self.template_workers
+
+    def _start(self, template: str):
+        self.running += 1
+        self._template_running[template] += 1
+
+    def _release(self, template: str):
+        self.running -= 1
+        self._template_running[template] -= 1
+        if self._template_running[template] <= 0:
+            del self._template_running[template]
+        self.completed += 1
+        self._dispatch()
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """按优先级取出下一个可以执行的渲染，同一优先级内各对话轮流"""
+        for priority in sorted(self._queues):
+            chats = self._queues[priority]
+            for chat_id in list(chats):
+                waiters = chats[chat_id]
+                while waiters and waiters[0].future.done():
+                    waiters.popleft()
+                if not waiters:
+                    del chats[chat_id]
+                    continue
+                if self.template_workers and self._template_running[waiters[0].template] >= self.template_workers:
+                    continue
+                waiter = waiters.popleft()
+                # 执行过的对话移到末尾
+                del chats[chat_id]
+                if waiters:
+                    chats[chat_id] = waiters
+                return waiter
+            if not chats:
+                del self._queues[priority]
+        return None
+
+    def _dispatch(self):
+        while self.running < self.workers:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self.queued -= 1
+            self._start(waiter.template)
+            wait = time.monotonic() - waiter.enqueued
+            self.avg_wait = wait if not self.avg_wait else self.avg_wait * 0.9 + wait * 0.1
+            self.max_wait = max(self.max_wait, wait)
+            waiter.future.set_result(None)
+
+    async def _acquire(self, template: str, priority: int, chat_id: Hashable):
+        if not self.queued and self._can_start(template):
+            self._start(template)
+            return
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise RenderQueueFull
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), template)
+        self._queues.setdefault(priority, OrderedDict()).setdefault(chat_id, deque()).append(waiter)
+        self.queued += 1
+        # 排队中的渲染可能都受模板限制，此时其他模板可以直接执行
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                self.queued -= 1
+            else:
+                # 已经分配到渲染位置时归还
+                self._release(template)
+            raise
+
+    async def run(
+        self,
+        func: Callable[[], Awaitable[T]],
+        template: str = "",
+        priority: int = RenderPriority.INTERACTIVE,
+        chat_id: Optional[Hashable] = None,
+    ) -> T:
+        """在队列中执行渲染
+        :param func: 渲染函数
+        :param template: 模板名
+        :param priority: 优先级
+        :param chat_id: 对话 ID，用于对话间轮流执行
+        :return: 渲染结果
+        :raise RenderQueueFull: 排队的渲染数超出上限
+        """
+        await self._acquire(template, priority, chat_id)
+        try:
+            return await func()
+        finally:
+            self._release(template)
+
+    def get_metrics(self) -> Dict[str, float]:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait": self.avg_wait,
+            "max_wait": self.max_wait,
+        }
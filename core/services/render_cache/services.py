@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+from typing import Any, Collection, Dict, Hashable, Optional, Sequence
+
+from pydantic import BaseModel
+
+from core.base_service import BaseService
+from core.services.render_cache.cache import RenderResultCache
+from core.services.render_cache.encoder import ImageEncoder, OutputFormat
+from core.services.render_cache.queue import RenderPriority, RenderQueue, RenderQueueConfig
+from core.services.template.models import FileType, RenderResult
+from core.services.template.services import TemplateService
+from utils import tailwind
+from utils.log import logger
+
+try:
+    import ujson as jsonlib
+except ImportError:
+    import json as jsonlib
+
+__all__ = ("RenderCacheService",)
+
+
+class _FileIdCacheProxy:
+    """发送渲染结果后，除原有的 HTML 缓存外同时按渲染输入保存 file_id"""
+
+    def __init__(self, cache: Any, render_cache: "RenderCacheService", digest: str, ttl: int, tags: Sequence[str]):
+        self._cache = cache
+        self._render_cache = render_cache
+        self._digest = digest
+        self._ttl = ttl
+        self._tags = tags
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._cache, item)
+
+    async def set_data(self, html: str, file_type: str, file_id: str, *args, **kwargs):
+        if self._cache is not None:
+            await self._cache.set_data(html, file_type, file_id, *args, **kwargs)
+        await self._render_cache.cache.set_file_id(
+            self._digest, getattr(file_type, "name", str(file_type)), file_id, self._ttl, self._tags
+        )
+
+
+class RenderCacheService(BaseService):
+    """按渲染输入缓存渲染结果
+
+    以模板名、渲染参数与规范化后的渲染数据的哈希值为键保存 Telegram file_id，
+    相同数据再次渲染时直接返回 file_id，不再经过模板与浏览器，不同用户与对话之间共享。
+    """
+
+    VOLATILE_KEYS = frozenset({"time", "now", "render_time", "update_time"})
+    """默认忽略的渲染数据字段，这些字段通常是渲染时的当前时间"""
+
+    def __init__(self, template_service: TemplateService, cache: RenderResultCache):
+        self.template_service = template_service
+        self.cache = cache
+        config = RenderQueueConfig()
+        self.queue = RenderQueue(config.workers, config.max_queue, config.template_workers)
+        self.encoder = ImageEncoder()
+
+    async def initialize(self) -> None:
+        # 模板使用预编译的样式，修改模板后未重新构建时提示
+        tailwind.check()
+
+    @classmethod
+    def normalize(cls, data: Any, volatile: Collection[str]) -> Any:
+        """将渲染数据转换为可稳定序列化的结构，忽略 volatile 中的字段"""
+        if isinstance(data, BaseModel):
+            data = data.model_dump(mode="json", by_alias=True)
+        if isinstance(data, dict):
+            return {str(k): cls.normalize(v, volatile) for k, v in data.items() if k not in volatile}
+        if isinstance(data, (list, tuple)):
+            return [cls.normalize(i, volatile) for i in data]
+        if isinstance(data, (set, frozenset)):
+            return sorted((cls.normalize(i, volatile) for i in data), key=repr)
+        if data is None or isinstance(data, (str, int, float, bool)):
+            return data
+        return str(data)
+
+    def get_digest(
+        self, template_name: str, template_data: Dict[str, Any], volatile: Collection[str] = (), **options
+    ) -> str:
+        """计算渲染输入的哈希值
+        :param template_name: 模板名
+        :param template_data: 渲染数据
+        :param volatile: 额外忽略的渲染数据字段
+        :param options: 影响渲染结果的参数
+        :return: 哈希值
+        """
+        ignore = self.VOLATILE_KEYS.union(volatile)
+        payload = {
+            "template": template_name,
+            "data": self.normalize(template_data, ignore),
+            "options": self.normalize(options, ()),
+        }
+        return hashlib.sha1(jsonlib.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    async def render(
+        self,
+        template_name: str,
+        template_data: Dict[str, Any],
+        viewport: Optional[Dict[str, int]] = None,
+        full_page: bool = True,
+        evaluate: Optional[str] = None,
+        query_selector: Optional[str] = None,
+        file_type: FileType = FileType.PHOTO,
+        ttl: int = 24 * 60 * 60,
+        caption: Optional[str] = None,
+        parse_mode: Optional[str] = None,
+        filename: Optional[str] = None,
+        tags: Sequence[str] = (),
+        volatile: Collection[str] = (),
+        priority: int = RenderPriority.INTERACTIVE,
+        chat_id: Optional[Hashable] = None,
+        output_format: Optional[OutputFormat] = None,
+    ) -> RenderResult:
+        """渲染模板，参数与 TemplateService.render 相同，未命中缓存时在渲染队列中排队
+        :param ttl: 缓存时间
+        :param tags: 缓存标签，可以通过 invalidate 按标签清除
+        :param volatile: 额外忽略的渲染数据字段
+        :param priority: 渲染优先级
+        :param chat_id: 对话 ID，排队时各对话轮流渲染
+        :param output_format: 以图片发送时的编码格式，默认使用配置
+        :return: 渲染结果，命中缓存时为 file_id
+        :raise RenderQueueFull: 排队的渲染数超出上限
+        """
+        digest = self.get_digest(
+            template_name,
+            template_data,
+            volatile,
+            viewport=viewport,
+            full_page=full_page,
+            evaluate=evaluate,
+            query_selector=query_selector,
+        )
+        cached_type = file_type
+        file_id = await self.cache.get_file_id(digest, file_type.name)
+        if file_id is None and file_type == FileType.PHOTO:
+            # 无法以图片发送的渲染结果已改为以文件发送
+            cached_type = FileType.DOCUMENT
+            file_id = await self.cache.get_file_id(digest, cached_type.name)
+        if file_id is not None:
+            logger.debug("%s 命中渲染缓存，返回 file_id[%s]", template_name, file_id)
+            return RenderResult(
+                html="",
+                photo=file_id,
+                file_type=cached_type,
+                cache=_FileIdCacheProxy(None, self, digest, ttl, tags),
+                ttl=ttl,
+                caption=caption,
+                parse_mode=parse_mode,
+                filename=filename,
+            )
+        result = await self.queue.run(
+            lambda: self.template_service.render(
+                template_name,
+                template_data,
+                viewport=viewport,
+                full_page=full_page,
+                evaluate=evaluate,
+                query_selector=query_selector,
+                file_type=file_type,
+                ttl=ttl,
+                caption=caption,
+                parse_mode=parse_mode,
+                filename=filename,
+            ),
+            template=template_name,
+            priority=priority,
+            chat_id=chat_id,
+        )
+        if file_type == FileType.PHOTO and isinstance(result.photo, bytes):
+            await self.encode(result, self.encoder.get_format(template_name, output_format))
+        result.cache = _FileIdCacheProxy(result.cache, self, digest, ttl, tags)
+        return result
+
+    async def encode(self, result: RenderResult, output_format: OutputFormat):
+        """按配置编码并缩放截图，无法以图片发送时改为以文件发送"""
+        loop = asyncio.get_running_loop()
+        try:
+            photo, suffix = await loop.run_in_executor(None, self.encoder.encode, result.photo, output_format)
+        except Exception as exc:  # pylint: disable=W0703
+            logger.warning("编码渲染结果失败", exc_info=exc)
+            return
+        if photo is None:
+            result.file_type = FileType.DOCUMENT
+            return
+        result.photo = photo
+        if result.filename:
+            result.filename = f"{result.filename.rsplit('.', 1)[0]}.{suffix}"
+
+    async def invalidate(self, tag: str):
+        """按标签清除缓存"""
+        count = await self.cache.invalidate(tag)
+        if count:
+            logger.debug("清除渲染缓存 tag[%s] count[%s]", tag, count)
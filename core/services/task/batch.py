@@ -0,0 +1,32 @@
+from typing import List, Sequence, TYPE_CHECKING
+
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+    from sqlmodel import SQLModel
+
+__all__ = ("update_batch",)
+
+
+async def update_batch(engine: "AsyncEngine", rows: Sequence["SQLModel"]) -> List[int]:
+    """在一个事务中批量写入已修改的数据
+
+    每条数据在单独的 SAVEPOINT 中写入，某条数据已过期（如执行任务时被用户删除）只回滚这一条，
+    其余数据的修改不会被回滚或过期。
+    :param engine: 数据库引擎
+    :param rows: 需要写入的数据
+    :return: 已过期、未写入的数据的下标，这些数据的属性已过期，不能再访问
+    """
+    stale = []
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        for index, row in enumerate(rows):
+            try:
+                async with session.begin_nested():
+                    session.add(row)
+            except StaleDataError:
+                stale.append(index)
+                session.expunge(row)
+        await session.commit()
+    return stale
@@ -0,0 +1,186 @@
+"""元数据编译缓存
+
+将 JSON 元数据编译为带索引的二进制文件，使用 mmap 映射，按键读取时才解码对应的值。
+缓存以源文件的大小、修改时间与哈希值校验，源文件变化后自动重新编译。
+
+文件格式：``MDC1`` + 头部长度(u32) + 头部 JSON + 所有值的 JSON 数据。
+头部包含源文件信息与 ``[[键, 偏移, 长度, 标量字段], ...]`` 索引，值为对象时标量字段为其中的字符串、数字等字段，
+用于建立二级索引时不必解码完整的值。
+"""
+
+import hashlib
+import mmap
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+from pydantic_settings import SettingsConfigDict
+
+from gram_core.basemodel import Settings
+from utils.log import logger
+
+try:
+    import ujson as jsonlib
+except ImportError:
+    import json as jsonlib
+
+__all__ = ("MetadataCacheConfig", "CompiledMetadata", "load_compiled")
+
+MAGIC = b"MDC1"
+VERSION = 2
+_HEADER = struct.Struct("<4sI")
+_MISSING = object()
+_SCALARS = (str, int, float, bool, type(None))
+
+
+class MetadataCacheConfig(Settings):
+    """元数据编译缓存配置"""
+
+    compiled_cache: bool = False
+    """是否使用编译缓存"""
+
+    model_config = SettingsConfigDict(env_prefix="metadata_")
+
+
+def _file_hash(path: Path) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class CompiledMetadata(Mapping):
+    """编译后的元数据，值在第一次访问时解码"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, header_length = _HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError("Invalid compiled metadata file")
+            self.header: Dict[str, Any] = jsonlib.loads(self._mmap[_HEADER.size : _HEADER.size + header_length])
+            self._base = _HEADER.size + header_length
+        except Exception:
+            self.close()
+            raise
+        self._index: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._fields: Dict[str, Dict[str, Any]] = {}
+        for key, offset, length, fields in self.header["keys"]:
+            self._index[key] = (offset, length)
+            if fields is not None:
+                self._fields[key] = fields
+        self._decoded: Dict[str, Any] = {}
+
+    def close(self):
+        self._mmap.close()
+
+    def is_valid(self, source: Path) -> bool:
+        """检查缓存是否与源文件一致"""
+        header = self.header
+        if header.get("version") != VERSION:
+            return False
+        stat = source.stat()
+        if header.get("size") == stat.st_size and header.get("mtime_ns") == stat.st_mtime_ns:
+            return True
+        # 修改时间变化但内容未变时仍可使用
+        return header.get("size") == stat.st_size and header.get("sha1") == _file_hash(source)
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._decoded.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        position = self._index[key]
+        if position is None:
+            raise KeyError(key)
+        offset, length = position
+        start = self._base + offset
+        value = self._decoded[key] = jsonlib.loads(self._mmap[start : start + length])
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        self._index.setdefault(key, None)
+        self._fields.pop(key, None)
+        self._decoded[key] = value
+
+    def __delitem__(self, key: str):
+        del self._index[key]
+        self._fields.pop(key, None)
+        self._decoded.pop(key, None)
+
+    def index_items(self) -> Iterator[Tuple[str, Any]]:
+        """遍历用于建立索引的键值，值为对象时只包含其中的标量字段，不解码完整的值"""
+        for key in self._index:
+            fields = self._fields.get(key)
+            yield key, self[key] if fields is None else fields
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __repr__(self) -> str:
+        return f"<CompiledMetadata {self.path.name} keys={len(self)}>"
+
+    @staticmethod
+    def compile(source: Path, target: Path):
+        """将 JSON 元数据编译为缓存文件
+        :param source: JSON 文件
+        :param target: 缓存文件
+        """
+        stat = source.stat()
+        with open(source, "rb") as file:
+            raw = file.read()
+        data = jsonlib.loads(raw)
+        keys, values, offset = [], [], 0
+        for key, value in data.items():
+            encoded = jsonlib.dumps(value, ensure_ascii=False).encode("utf-8")
+            fields = {k: v for k, v in value.items() if isinstance(v, _SCALARS)} if isinstance(value, dict) else None
+            keys.append([key, offset, len(encoded), fields])
+            values.append(encoded)
+            offset += len(encoded)
+        header = jsonlib.dumps(
+            {
+                "version": VERSION,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha1": hashlib.sha1(raw).hexdigest(),
+                "keys": keys,
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        tmp_path = target.with_name(f"{target.name}.tmp")
+        with open(tmp_path, "wb") as file:
+            file.write(_HEADER.pack(MAGIC, len(header)))
+            file.write(header)
+            for encoded in values:
+                file.write(encoded)
+        tmp_path.replace(target)
+
+
+def load_compiled(source: Path) -> Optional[CompiledMetadata]:
+    """读取 JSON 元数据对应的编译缓存，缓存不存在或已过期时重新编译
+    :param source: JSON 文件
+    :return: 编译后的元数据，源文件不是对象或编译失败时返回 None
+    """
+    target = source.with_suffix(".mdc")
+    if target.exists():
+        try:
+            compiled = CompiledMetadata(target)
+            if compiled.is_valid(source):
+                return compiled
+            compiled.close()
+        except (OSError, ValueError, KeyError, struct.error) as exc:
+            logger.warning("元数据缓存 %s 读取失败 %s", target.name, repr(exc))
+    try:
+        CompiledMetadata.compile(source, target)
+        return CompiledMetadata(target)
+    except (OSError, ValueError, AttributeError) as exc:
+        logger.warning("元数据缓存 %s 编译失败 %s", target.name, repr(exc))
+        return None
@@ -2,9 +2,9 @@
 
 from __future__ import annotations
 
-import functools
-from typing import Any, Generic, ItemsView, Iterator, KeysView, Optional, TypeVar, ValuesView
+from typing import Any, Callable, Generic, ItemsView, Iterator, KeysView, Optional, TypeVar, ValuesView
 
+from metadata.cache import CompiledMetadata, MetadataCacheConfig, load_compiled
 from utils.const import PROJECT_ROOT
 from utils.log import logger
 from utils.typedefs import StrOrInt
@@ -26,6 +26,7 @@ __all__ = (
     "Data",
     "weapon_to_game_id",
     "avatar_to_game_id",
+    "reload_metadata",
 )
 
 K = TypeVar("K")
@@ -35,34 +36,92 @@ data_dir = PROJECT_ROOT.joinpath("metadata/data/")
 data_dir.mkdir(parents=True, exist_ok=True)
 
 _cache = {}
+_cache_config = MetadataCacheConfig()
 
 
 class Data(dict, Generic[K, V]):
     _dict: dict[K, V]
     _file_name: str
+    _loaded: bool
+    _indexes: dict[str, dict]
+    _instances: list["Data"] = []
 
     @property
     def data(self) -> dict[K, V]:
-        if (result := _cache.get(self._file_name)) not in [None, {}]:
+        if self._loaded:
+            return self._dict
+        if result := _cache.get(self._file_name):
             self._dict = result
+            self._loaded = True
+            return self._dict
+        path = data_dir.joinpath(self._file_name).with_suffix(".json")
+        if not path.exists():
+            logger.error(
+                '暂未找到名为 "%s" 的 metadata , ' "请先使用 [yellow bold]/refresh_metadata[/] 命令下载",
+                self._file_name,
+                extra={"markup": True},
+            )
+            self._dict = {}
+            return self._dict
+        if (compiled := load_compiled(path) if _cache_config.compiled_cache else None) is not None:
+            self._dict = compiled
         else:
-            path = data_dir.joinpath(self._file_name).with_suffix(".json")
-            if not path.exists():
-                logger.error(
-                    '暂未找到名为 "%s" 的 metadata , ' "请先使用 [yellow bold]/refresh_metadata[/] 命令下载",
-                    self._file_name,
-                    extra={"markup": True},
-                )
-                self._dict = {}
             with open(path, encoding="utf-8") as file:
                 self._dict = jsonlib.load(file)
-            _cache.update({self._file_name: self._dict})
+        _cache.update({self._file_name: self._dict})
+        self._loaded = True
         return self._dict
 
+    def reload(self) -> None:
+        """丢弃已加载的数据与索引，下次访问时重新读取文件"""
+        _cache.pop(self._file_name, None)
+        if isinstance(self._dict, CompiledMetadata):
+            self._dict.close()
+        self._dict = {}
+        self._loaded = False
+        self._indexes = {}
+
+    def _get_index(self, name: str, func: Callable[[Any, Any], Any], table: Optional[dict] = None) -> dict:
+        """获取二级索引，不存在时建立
+        :param name: 索引名称
+        :param func: 从键值计算索引键的函数，返回 None 时不加入索引；使用编译缓存时值只包含其中的标量字段
+        :param table: 建立索引的数据，默认为整个文件
+        :return: 索引键 -> 数据的键，索引键重复时以先出现的为准
+        """
+        if (index := self._indexes.get(name)) is not None:
+            return index
+        data = self.data if table is None else table
+        index = {}
+        # 编译缓存只读取头部中的标量字段，不解码所有的值
+        items = data.index_items() if isinstance(data, CompiledMetadata) else data.items()
+        for key, value in items:
+            if (index_key := func(key, value)) is not None:
+                index.setdefault(index_key, key)
+        if self._loaded:
+            self._indexes[name] = index
+        return index
+
+    def get_key_by_name(self, name: str) -> K | None:
+        """通过名称获取数据的键"""
+        return self._get_index("name", lambda _, value: value.get("name")).get(name)
+
+    def get_key_by_icon_suffix(self, suffix: str) -> K | None:
+        """通过图标文件名的最后一段获取数据的键"""
+        index = self._get_index("icon", lambda _, value: value["icon"].split("_")[-1] if "icon" in value else None)
+        return index.get(suffix)
+
+    def get_key_by_honey_id(self, item_type: str, honey_id: str) -> StrOrInt | None:
+        """通过 honey impact 的 id 获取数据的键，仅用于 HONEY_DATA"""
+        index = self._get_index(f"honey:{item_type}", lambda _, value: value[0], self.data.get(item_type, {}))
+        return index.get(honey_id)
+
     def __init__(self, file_name: str):
         self._file_name = file_name
         self._dict = {}
+        self._loaded = False
+        self._indexes = {}
         super(Data, self).__init__()
+        Data._instances.append(self)
 
     def __str__(self) -> str:
         return self.data.__str__()
@@ -95,32 +154,33 @@ class Data(dict, Generic[K, V]):
         return self.data.items()
 
 
-HONEY_DATA: dict[str, dict[StrOrInt, list[str | int]]] = Data("honey")
+HONEY_DATA: Data[str, dict[StrOrInt, list[str | int]]] = Data("honey")
+
+AVATAR_DATA: Data[str, dict[str, int | str | list[int]]] = Data("avatar")
+WEAPON_DATA: Data[str, dict[str, int | str]] = Data("weapon")
+MATERIAL_DATA: Data[str, dict[str, int | str]] = Data("material")
+ARTIFACT_DATA: Data[str, dict[str, int | str | list[int] | dict[str, str]]] = Data("reliquary")
+NAMECARD_DATA: Data[str, dict[str, int | str]] = Data("namecard")
+
 
-AVATAR_DATA: dict[str, dict[str, int | str | list[int]]] = Data("avatar")
-WEAPON_DATA: dict[str, dict[str, int | str]] = Data("weapon")
-MATERIAL_DATA: dict[str, dict[str, int | str]] = Data("material")
-ARTIFACT_DATA: dict[str, dict[str, int | str | list[int] | dict[str, str]]] = Data("reliquary")
-NAMECARD_DATA: dict[str, dict[str, int | str]] = Data("namecard")
+def reload_metadata() -> None:
+    """元数据更新后调用，使所有已加载的数据与索引失效"""
+    _cache.clear()
+    for data in Data._instances:  # pylint: disable=W0212
+        data.reload()
 
 
-@functools.lru_cache()
 def honey_id_to_game_id(honey_id: str, item_type: str) -> str | None:
-    return next((key for key, value in HONEY_DATA[item_type].items() if value[0] == honey_id), None)
+    return HONEY_DATA.get_key_by_honey_id(item_type, honey_id)
 
 
-@functools.lru_cache
 def game_id_to_role_id(gid: str) -> int | None:
-    return next(
-        (int(key.split("-")[0]) for key, value in AVATAR_DATA.items() if value["icon"].split("_")[-1] == gid), None
-    )
+    return int(key.split("-")[0]) if (key := AVATAR_DATA.get_key_by_icon_suffix(gid)) is not None else None
 
 
-@functools.lru_cache()
 def weapon_to_game_id(name: str) -> Optional[int]:
-    return next((int(key) for key, value in WEAPON_DATA.items() if value["name"] == name), None)
+    return int(key) if (key := WEAPON_DATA.get_key_by_name(name)) is not None else None
 
 
-@functools.lru_cache()
 def avatar_to_game_id(name: str) -> Optional[int]:
-    return next((int(key) for key, value in AVATAR_DATA.items() if value["name"] == name), None)
+    return int(key) if (key := AVATAR_DATA.get_key_by_name(name)) is not None else None
@@ -2,9 +2,11 @@ from contextlib import contextmanager
 from typing import Iterator, Dict
 
 from aiofiles import open as async_open
-from httpx import URL, AsyncClient, RemoteProtocolError, Response
+from httpx import URL, RemoteProtocolError, Response
 
+from metadata.genshin import reload_metadata
 from utils.const import AMBR_HOST, PROJECT_ROOT
+from utils.httpclient import get_client
 from utils.log import logger
 
 try:
@@ -26,8 +28,6 @@ RESOURCE_DEFAULT_PATH = f"{RESOURCE_REPO}/{RESOURCE_BRANCH}/{RESOURCE_ROOT}/"
 RESOURCE_FAST_URL = f"https://genshin-res.paimon.vip/{RESOURCE_ROOT}/"
 RESOURCE_FightPropRule_URL = "https://fightproprule.paimon.vip/"
 
-client = AsyncClient()
-
 
 async def fix_metadata_from_ambr(json_data: Dict[str, Dict], data_type: str):
     if data_type == "weapon":
@@ -35,7 +35,7 @@ async def fix_metadata_from_ambr(json_data: Dict[str, Dict], data_type: str):
         need_attr = ["id", "rank", "type", "name", "icon", "route"]
         for wid in need_append_ids:
             url = AMBR_HOST.join(f"v2/chs/{data_type}/{wid}")
-            response = await client.get(url)
+            response = await get_client().get(url)
             json_data_ = jsonlib.loads(response.text)["data"]
             json_data[str(json_data_["id"])] = {k: json_data_[k] for k in need_attr}
 
@@ -49,19 +49,20 @@ async def update_metadata_from_ambr(overwrite: bool = True):
             continue
         url = AMBR_HOST.join(f"v2/chs/{target}")
         path.parent.mkdir(parents=True, exist_ok=True)
-        response = await client.get(url)
+        response = await get_client().get(url)
         json_data = jsonlib.loads(response.text)["data"]["items"]
         await fix_metadata_from_ambr(json_data, target)
         async with async_open(path, mode="w", encoding="utf-8") as file:
             data = jsonlib.dumps(json_data, ensure_ascii=False, indent=4)
             await file.write(data)
         result.append(json_data)
+    reload_metadata()
     return result
 
 
 @contextmanager
 async def stream_request(method, url) -> Iterator[Response]:
-    async with client.stream(method=method, url=url) as response:
+    async with get_client().stream(method=method, url=url) as response:
         yield response
 
 
@@ -82,7 +83,7 @@ async def update_metadata_from_github(overwrite: bool = True):
             material_url = host.join("ExcelBinOutput/MaterialExcelConfigData.json")
 
             material_json_data = []
-            async with client.stream("GET", material_url) as response:
+            async with get_client().stream("GET", material_url) as response:
                 started = False
                 cell = []
                 async for line in response.aiter_lines():
@@ -108,7 +109,7 @@ async def update_metadata_from_github(overwrite: bool = True):
                 string_ids.append(str(namecard_data["descTextMapHash"]))
 
             text_map_json_data = {}
-            async with client.stream("GET", text_map_url) as response:
+            async with get_client().stream("GET", text_map_url) as response:
                 async for line in response.aiter_lines():
                     splits = line.split(":")
                     string_id = splits[0].strip(' "')
@@ -142,6 +143,7 @@ async def update_metadata_from_github(overwrite: bool = True):
             async with async_open(path, mode="w", encoding="utf-8") as file:
                 data = jsonlib.dumps(data, ensure_ascii=False, indent=4)
                 await file.write(data)
+            reload_metadata()
             return data
         except RemoteProtocolError as exc:
             logger.warning("在从 %s 下载元数据的过程中遇到了错误: %s", host, str(exc))
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import functools
-from typing import List
+from typing import Dict, List
 
 __all__ = [
     "roles",
@@ -171,20 +171,37 @@ def elementToName(elem: str) -> str | None:
     return elements[elem][0] if elem in elements else None
 
 
+def _build_alias_index(table: Dict[int, List[str]]) -> Dict[str, int]:
+    index = {}
+    for key, value in table.items():
+        for name in value:
+            index.setdefault(str.casefold(name), key)  # 别名重复时以先出现的为准
+    return index
+
+
+def _build_tag_index(table: Dict[int, List[str]]) -> Dict[str, List[str]]:
+    index = {}
+    for value in table.values():
+        index.setdefault(value[0], value)
+    return index
+
+
+_role_alias_index = _build_alias_index(roles)
+_role_tag_index = _build_tag_index(roles)
+_weapon_alias_index = _build_alias_index(weapons)
+
+
 # noinspection PyPep8Naming
-@functools.lru_cache()
 def roleToName(shortname: str) -> str:
     """将角色昵称转为正式名"""
     shortname = str.casefold(shortname)  # 忽略大小写
-    return next((value[0] for value in roles.values() for name in value if name == shortname), shortname)
+    return roles[cid][0] if (cid := _role_alias_index.get(shortname)) is not None else shortname
 
 
 # noinspection PyPep8Naming
-@functools.lru_cache()
 def roleToId(name: str) -> int | None:
     """获取角色ID"""
-    name = str.casefold(name)
-    return next((key for key, value in roles.items() for n in value if n == name), None)
+    return _role_alias_index.get(str.casefold(name))
 
 
 # noinspection PyPep8Naming
@@ -195,24 +212,20 @@ def idToName(cid: int) -> str | None:
 
 
 # noinspection PyPep8Naming
-@functools.lru_cache()
 def weaponToName(shortname: str) -> str:
     """将武器昵称转为正式名"""
     shortname = str.casefold(shortname)  # 忽略大小写
-    return next((value[0] for value in weapons.values() for name in value if name == shortname), shortname)
+    return weapons[wid][0] if (wid := _weapon_alias_index.get(shortname)) is not None else shortname
 
 
 # noinspection PyPep8Naming
-@functools.lru_cache()
 def weaponToId(name: str) -> int | None:
     """获取武器ID"""
-    name = str.casefold(name)
-    return next((key for key, value in weapons.items() for n in value if n == name), None)
+    return _weapon_alias_index.get(str.casefold(name))
 
 
 # noinspection PyPep8Naming
-@functools.lru_cache()
 def roleToTag(role_name: str) -> List[str]:
     """通过角色名获取TAG"""
     role_name = str.casefold(role_name)
-    return next((value for value in roles.values() if value[0] == role_name), [role_name])
+    return _role_tag_index.get(role_name, [role_name])
@@ -2,8 +2,6 @@ from types import TracebackType
 from typing import Optional, Type, List
 from urllib.parse import unquote
 
-import httpx
-
 from modules.apihelper.models.genshin.akasha import (
     AkashaRank,
     AkashaLeaderboardCategory,
@@ -11,6 +9,7 @@ from modules.apihelper.models.genshin.akasha import (
     AkashaSubStat,
     AkashaArtifact,
 )
+from utils.httpclient import get_client
 
 BASE_URL = "https://akasha.cv/api"
 MAIN_API = BASE_URL + "/filters/accounts/"
@@ -59,7 +58,7 @@ class Akasha:
     }
 
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=60)
+        self.client = get_client("akasha", timeout=60)
         self.session_id = None
 
     async def get_session_id(self) -> Optional[str]:
@@ -133,6 +132,5 @@ class Akasha:
     async def __aexit__(
         self, exc_type: Optional[Type[BaseException]], exc_val: Optional[BaseException], exc_tb: Optional[TracebackType]
     ):
-        if self.client.is_closed:
-            return
-        await self.client.aclose()
+        # 客户端由注册表共用，在 Bot 关闭时统一关闭
+        return
@@ -2,14 +2,13 @@ import re
 from datetime import datetime, timedelta
 from typing import List, Tuple, Optional, Dict, Union, TYPE_CHECKING
 
-from httpx import AsyncClient
-
 from core.dependence.assets import AssetsCouldNotFound
 from metadata.genshin import AVATAR_DATA
 from metadata.shortname import roleToId
 from modules.apihelper.client.components.remote import Remote
 from modules.apihelper.models.genshin.calendar import Date, FinalAct, ActEnum, ActDetail, ActTime, BirthChar
 from modules.wiki.character import Character
+from utils.httpclient import get_client
 from utils.log import logger
 
 if TYPE_CHECKING:
@@ -46,7 +45,7 @@ class Calendar:
     FULL_TIME_RE = re.compile(r"(魔神任务)")
 
     def __init__(self):
-        self.client = AsyncClient()
+        self.client = get_client()
 
     @staticmethod
     async def async_gen_birthday_list() -> Dict[str, List[str]]:
@@ -0,0 +1,46 @@
+"""角色详细信息的存储格式
+
+Redis 与数据库使用同一格式：``CD`` + 版本号(u8) + zlib 压缩的 JSON。
+读取时直接从 JSON 字节校验为模型，只解析与校验一次。
+"""
+
+import zlib
+
+from kuronet.models.mc.chronicle.role import MCRoleDetail
+
+__all__ = ("SCHEMA_VERSION", "encode_detail", "decode_detail")
+
+MAGIC = b"CD"
+# 模型字段发生不兼容的变化时需要修改，旧版本的数据在读取时视为不存在
+SCHEMA_VERSION = 1
+_HEADER_SIZE = len(MAGIC) + 1
+
+
+def encode_detail(detail: MCRoleDetail) -> bytes:
+    """编码角色详细信息
+    :param detail: 角色详细信息
+    :return: 编码后的数据
+    """
+    raw = detail.model_dump_json(by_alias=True).encode("utf-8")
+    return MAGIC + bytes((SCHEMA_VERSION,)) + zlib.compress(raw, 6)
+
+
+def decode_detail(data: bytes) -> MCRoleDetail:
+    """解码角色详细信息，兼容旧版本保存的未压缩 JSON
+    :param data: 编码后的数据
+    :return: 角色详细信息
+    :raise ValueError: 数据无法解析或版本不一致
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if data[:1] == b"{":
+        return MCRoleDetail.model_validate_json(data)
+    if data[: len(MAGIC)] != MAGIC or len(data) <= _HEADER_SIZE:
+        raise ValueError("Invalid character detail data")
+    if data[len(MAGIC)] != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported character detail version {data[len(MAGIC)]}")
+    try:
+        raw = zlib.decompress(data[_HEADER_SIZE:])
+    except zlib.error as exc:
+        raise ValueError("Invalid character detail data") from exc
+    return MCRoleDetail.model_validate_json(raw)
@@ -0,0 +1,175 @@
+"""自动便签提醒的请求调度
+
+根据上次请求到的结晶波片数据预计下次可能触发提醒的时间，只在需要时请求便签。
+"""
+
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, field_validator
+
+__all__ = (
+    "RESIN_ONE_TIME",
+    "TaskDataBase",
+    "ResinData",
+    "DailyData",
+    "NoteSnapshot",
+    "NoteScheduler",
+    "need_request",
+    "next_request_time",
+)
+
+RESIN_ONE_TIME = timedelta(minutes=6)
+
+
+class TaskDataBase(BaseModel):
+    noticed: Optional[bool] = False
+
+
+class ResinData(TaskDataBase):
+    notice_num: Optional[int] = 140
+
+    @field_validator("notice_num")
+    @classmethod
+    def notice_num_validator(cls, v):
+        if v < 100 or v > 240:
+            raise ValueError("开拓力提醒数值必须在 100 ~ 240 之间")
+        return v
+
+
+class DailyData(TaskDataBase):
+    notice_hour: Optional[int] = 22
+
+    @field_validator("notice_hour")
+    @classmethod
+    def notice_hour_validator(cls, v):
+        if v < 0 or v > 23:
+            raise ValueError("每日任务提醒时间必须在 0 ~ 23 之间")
+        return v
+
+
+class NoteSnapshot:
+    """上次请求到的结晶波片数据"""
+
+    __slots__ = ("time", "current_stamina", "max_stamina")
+
+    def __init__(self, time_: datetime, current_stamina: int, max_stamina: int):
+        self.time = time_
+        self.current_stamina = current_stamina
+        self.max_stamina = max_stamina
+
+    def stamina_at(self, now: datetime) -> int:
+        """预计某一时刻的结晶波片上限，期间使用过结晶波片时实际值只会更低"""
+        if now <= self.time or self.current_stamina >= self.max_stamina:
+            return self.current_stamina
+        recovered = int((now - self.time) / RESIN_ONE_TIME)
+        return min(self.max_stamina, self.current_stamina + recovered)
+
+
+class NoteScheduler:
+    """按下次请求时间排序的提醒队列
+
+    不在队列中的用户视为需要立即请求。重新安排或移除用户时不修改堆，出堆时跳过已失效的记录。
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, Tuple[int, int]]] = []
+        self._due: Dict[Tuple[int, int], float] = {}
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        return key in self._due
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, key: Tuple[int, int], due: datetime):
+        timestamp = due.timestamp()
+        self._due[key] = timestamp
+        heapq.heappush(self._heap, (timestamp, key))
+
+    def remove(self, key: Tuple[int, int]):
+        self._due.pop(key, None)
+
+    def retain(self, keys: Set[Tuple[int, int]]):
+        """移除不在 keys 中的用户"""
+        self._due = {k: v for k, v in self._due.items() if k in keys}
+        if len(self._heap) > 2 * len(self._due):
+            self._heap = [(v, k) for k, v in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def pop_due(self, now: datetime) -> List[Tuple[int, int]]:
+        """取出所有已到请求时间的用户"""
+        timestamp = now.timestamp()
+        result = []
+        while self._heap and self._heap[0][0] <= timestamp:
+            due, key = heapq.heappop(self._heap)
+            if self._due.get(key) == due:
+                del self._due[key]
+                result.append(key)
+        return result
+
+
+def need_request(
+    resin: Optional[ResinData],
+    daily: Optional[DailyData],
+    snapshot: Optional[NoteSnapshot],
+    now: datetime,
+    max_skip: timedelta,
+) -> bool:
+    """判断本次是否需要请求便签
+    :param resin: 结晶波片提醒设置
+    :param daily: 每日任务提醒设置
+    :param snapshot: 上次请求到的数据
+    :param now: 当前时间
+    :param max_skip: 最长跳过时间
+    :return: 结晶波片可能达到提醒数值、需要重置提醒状态或到达每日任务提醒时间时返回 True
+    """
+    if snapshot is None or now - snapshot.time >= max_skip:
+        return True
+    if resin and (resin.noticed or snapshot.stamina_at(now) >= resin.notice_num):
+        return True
+    if daily and now.hour == daily.notice_hour and not daily.noticed:
+        return True
+    return False
+
+
+def next_request_time(
+    resin: Optional[ResinData],
+    daily: Optional[DailyData],
+    snapshot: Optional[NoteSnapshot],
+    now: datetime,
+    max_skip: timedelta,
+    retry: timedelta,
+) -> datetime:
+    """根据上次请求到的数据计算下次需要请求便签的时间
+    :param resin: 结晶波片提醒设置
+    :param daily: 每日任务提醒设置
+    :param snapshot: 上次请求到的数据
+    :param now: 当前时间
+    :param max_skip: 最长跳过时间
+    :param retry: 结晶波片已提醒或请求失败后再次请求的间隔
+    :return: 下次请求时间
+    """
+    if snapshot is None:
+        return now + retry
+    candidates = [snapshot.time + max_skip]
+    if resin:
+        if resin.noticed:
+            # 需要确认结晶波片被使用后才能再次提醒
+            candidates.append(now + retry)
+        elif snapshot.max_stamina >= resin.notice_num:
+            resin_need = max(resin.notice_num - snapshot.current_stamina, 0)
+            candidates.append(snapshot.time + RESIN_ONE_TIME * resin_need)
+    if daily:
+        notice_time = now.replace(hour=daily.notice_hour, minute=0, second=0, microsecond=0)
+        if now.hour == daily.notice_hour:
+            # 已提醒时在提醒时间结束后重置提醒状态
+            candidates.append(notice_time + timedelta(hours=1) if daily.noticed else now)
+        elif daily.noticed:
+            candidates.append(now)
+        else:
+            candidates.append(notice_time if notice_time > now else notice_time + timedelta(days=1))
+    due = min(candidates)
+    # 已经到期说明本次请求失败或提醒状态只需在本地重置，等待一段时间后再请求
+    return due if due > now else now + retry
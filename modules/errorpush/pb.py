@@ -1,7 +1,6 @@
 from typing import Optional
 
-import httpx
-
+from utils.httpclient import get_client
 from utils.log import logger
 
 __all__ = ["PbClient", "PbClientException"]
@@ -18,7 +17,7 @@ class PbClient:
         :param pb_sunset: 自动销毁时间 单位为秒
         :param pb_max_lines:
         """
-        self.client = httpx.AsyncClient()
+        self.client = get_client()
         self.PB_API = pb_url
         self.sunset: int = pb_sunset
         self.private: bool = True
@@ -0,0 +1,152 @@
+"""抽卡记录统计计算
+
+将一个卡池的记录一次性转换为数组，保底间隔、卡池时间段分桶与出现次数统计均在数组上完成。
+安装了 numpy 时使用向量化计算，否则退回纯 Python 实现，两者结果一致。
+"""
+
+import datetime
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from modules.gacha_log.models import BannerSummary, FiveStarItem, FourStarItem, GachaItem, Pool
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__all__ = ("PoolAnalytics", "most_common")
+
+FIVE_STAR_CHARACTER_POOLS = {"角色祈愿", "常驻祈愿", "新手祈愿"}
+FIVE_STAR_WEAPON_POOLS = {"武器祈愿", "常驻武器祈愿", "新手祈愿"}
+_EPOCH = datetime.datetime(1970, 1, 1)
+_ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def _to_timestamp(time: datetime.datetime) -> int:
+    return (time.replace(tzinfo=None) - _EPOCH) // _ONE_MICROSECOND
+
+
+def most_common(names: Sequence[str]) -> Tuple[str, int]:
+    """出现次数最多的名称，次数相同时取最先出现的
+    :param names: 名称列表
+    :return: 名称与出现次数
+    """
+    if not names:
+        return "", 0
+    if np is not None and len(names) > 64:
+        unique, first, counts = np.unique(np.asarray(names, dtype=object), return_index=True, return_counts=True)
+        best = np.lexsort((first, -counts))[0]
+        return unique[best], int(counts[best])
+    return Counter(names).most_common(1)[0]
+
+
+class PoolAnalytics:
+    """单个卡池的记录统计，记录需按时间升序排列"""
+
+    def __init__(self, data: List[GachaItem]):
+        self.data = data
+        self.total = len(data)
+        ranks = [int(i.rank_type) for i in data]
+        times = [_to_timestamp(i.time) for i in data]
+        if np is not None:
+            self.ranks = np.asarray(ranks, dtype=np.int8)
+            self.times = np.asarray(times, dtype=np.int64)
+        else:
+            self.ranks = ranks
+            self.times = times
+
+    def _star_indexes(self, rank: int) -> List[int]:
+        if np is not None:
+            return np.flatnonzero(self.ranks == rank).tolist()
+        return [idx for idx, value in enumerate(self.ranks) if value == rank]
+
+    def _star_runs(self, rank: int) -> Tuple[List[int], List[int], int]:
+        """保底间隔
+        :return: 该星级记录的下标、每次出货所用抽数、最后一次出货后的抽数
+        """
+        indexes = self._star_indexes(rank)
+        if not indexes:
+            return [], [], self.total
+        if np is not None:
+            counts = np.diff(np.asarray(indexes), prepend=-1).tolist()
+        else:
+            counts = [idx - prev for prev, idx in zip([-1] + indexes, indexes)]
+        return indexes, counts, self.total - 1 - indexes[-1]
+
+    def five_star_items(
+        self, pool_name: str, check_up: Callable[[str, datetime.datetime], bool]
+    ) -> Tuple[List[FiveStarItem], int]:
+        """所有五星记录，按时间倒序
+        :param pool_name: 卡池名称
+        :param check_up: 判断五星是否为 UP 的函数
+        :return: 五星记录与未出五星的抽数
+        """
+        indexes, counts, no_five_star = self._star_runs(5)
+        is_character_pool = pool_name == "角色祈愿"
+        result = []
+        for idx, count in zip(indexes, counts):
+            item = self.data[idx]
+            if item.item_type == "角色" and pool_name in FIVE_STAR_CHARACTER_POOLS:
+                result.append(
+                    FiveStarItem.model_construct(
+                        name=item.name,
+                        icon="",
+                        count=count,
+                        type="角色",
+                        isUp=check_up(item.name, item.time) if is_character_pool else False,
+                        isBig=(not result[-1].isUp) if result and is_character_pool else False,
+                        time=item.time,
+                    )
+                )
+            elif item.item_type == "武器" and pool_name in FIVE_STAR_WEAPON_POOLS:
+                result.append(
+                    FiveStarItem.model_construct(
+                        name=item.name, icon="", count=count, type="武器", isUp=False, isBig=False, time=item.time
+                    )
+                )
+        result.reverse()
+        return result, no_five_star
+
+    def four_star_items(self) -> Tuple[List[FourStarItem], int]:
+        """所有四星记录，按时间倒序
+        :return: 四星记录与未出四星的抽数
+        """
+        indexes, counts, no_four_star = self._star_runs(4)
+        result = [
+            FourStarItem.model_construct(
+                name=self.data[idx].name,
+                icon="",
+                count=count,
+                type=self.data[idx].item_type,
+                time=self.data[idx].time,
+            )
+            for idx, count in zip(indexes, counts)
+        ]
+        result.reverse()
+        return result, no_four_star
+
+    def banner_windows(self, pools: Iterable[Dict]) -> List[BannerSummary]:
+        """统计每个卡池开放时间段内的抽数
+        :param pools: 卡池元数据
+        :return: 每个卡池时间段内的抽数、第一抽与最后一抽的时间
+        """
+        up_pools = [Pool(**i) for i in pools]
+        starts = [_to_timestamp(i.from_time) for i in up_pools]
+        ends = [_to_timestamp(i.to_time) for i in up_pools]
+        if np is not None:
+            lo = np.searchsorted(self.times, starts, side="left").tolist()
+            hi = np.searchsorted(self.times, ends, side="right").tolist()
+        else:
+            lo = [bisect_left(self.times, i) for i in starts]
+            hi = [bisect_right(self.times, i) for i in ends]
+        result = []
+        for left, right in zip(lo, hi):
+            if right > left:
+                result.append(
+                    BannerSummary(count=right - left, start=self.data[left].time, end=self.data[right - 1].time)
+                )
+            else:
+                result.append(BannerSummary())
+        return result
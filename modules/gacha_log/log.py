@@ -5,7 +5,7 @@ import json
 from concurrent.futures import ThreadPoolExecutor
 from os import PathLike
 from pathlib import Path
-from typing import Dict, IO, List, Optional, Tuple, Union, TYPE_CHECKING
+from typing import Awaitable, Callable, Dict, IO, List, Optional, Set, Tuple, Union, TYPE_CHECKING
 
 import aiofiles
 from kuronet import MCClient, Game
@@ -17,6 +17,7 @@ from openpyxl import load_workbook
 from gram_core.services.gacha_log_rank.services import GachaLogRankService
 from metadata.pool.pool import get_pool_by_id
 from metadata.shortname import roleToId, weaponToId
+from modules.gacha_log.analytics import PoolAnalytics, most_common
 from modules.gacha_log.const import GACHA_TYPE_LIST, PAIMONMOE_VERSION
 from modules.gacha_log.error import (
     GachaLogAccountNotFound,
@@ -33,6 +34,7 @@ from modules.gacha_log.models import (
     FourStarItem,
     GachaItem,
     GachaLogInfo,
+    GachaLogSummary,
     ImportType,
     ItemType,
     Pool,
@@ -43,31 +45,43 @@ from modules.gacha_log.models import (
 )
 from modules.gacha_log.online_view import GachaLogOnlineView
 from modules.gacha_log.ranks import GachaLogRanks
+from modules.gacha_log.storage import GachaLogStorage, get_gacha_log_storage
+from modules.gacha_log.stream import UIGFStreamReader
+from modules.gacha_log.summary import GachaLogSummaries
 from utils.const import PROJECT_ROOT
+from utils.log import logger
 from utils.uid import mask_number
 
 if TYPE_CHECKING:
     from core.dependence.assets import AssetsService
+    from core.dependence.database import Database
 
 
 GACHA_LOG_PATH = PROJECT_ROOT.joinpath("data", "apihelper", "summon_log")
 GACHA_LOG_PATH.mkdir(parents=True, exist_ok=True)
 
 
-class GachaLog(GachaLogOnlineView, GachaLogRanks):
+class GachaLog(GachaLogOnlineView, GachaLogSummaries, GachaLogRanks):
+    IMPORT_CHUNK_SIZE = 500
+    # 所有导入共用的线程池，避免每次导入都创建新的线程池
+    import_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gacha_log_import")
+
     def __init__(
         self,
         gacha_log_path: Path = GACHA_LOG_PATH,
         gacha_log_rank_service: GachaLogRankService = None,
+        storage: Optional[GachaLogStorage] = None,
+        database: "Database" = None,
     ):
         GachaLogOnlineView.__init__(self)
-        GachaLogRanks.__init__(self, gacha_log_rank_service)
+        GachaLogRanks.__init__(self, gacha_log_rank_service, database)
         self.gacha_log_path = gacha_log_path
+        self.storage = storage or get_gacha_log_storage(gacha_log_path)
+        self.save_hooks: List[Callable[[str, str], Awaitable[None]]] = []
 
-    @staticmethod
-    async def load_json(path):
-        async with aiofiles.open(path, "r", encoding="utf-8") as f:
-            return json.loads(await f.read())
+    def add_save_hook(self, hook: Callable[[str, str], Awaitable[None]]):
+        """添加抽卡记录保存后执行的回调，参数为 user_id 与 uid，可用于清除缓存"""
+        self.save_hooks.append(hook)
 
     @staticmethod
     async def save_json(path, data):
@@ -85,15 +99,12 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         :param only_status: 是否只读取状态
         :return: 抽卡记录数据
         """
-        file_path = self.gacha_log_path / f"{user_id}-{uid}.json"
         if only_status:
-            return None, file_path.exists()
-        if not file_path.exists():
-            return GachaLogInfo(user_id=user_id, uid=uid, update_time=datetime.datetime.now()), False
-        try:
-            return GachaLogInfo.parse_obj(await self.load_json(file_path)), True
-        except json.decoder.JSONDecodeError:
+            return None, self.storage.exists(user_id, uid)
+        info = await self.storage.load(user_id, uid)
+        if info is None:
             return GachaLogInfo(user_id=user_id, uid=uid, update_time=datetime.datetime.now()), False
+        return info, True
 
     async def remove_history_info(self, user_id: str, uid: str) -> bool:
         """删除历史抽卡记录数据
@@ -101,20 +112,11 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         :param uid: 原神uid
         :return: 是否删除成功
         """
-        file_path = self.gacha_log_path / f"{user_id}-{uid}.json"
-        file_bak_path = self.gacha_log_path / f"{user_id}-{uid}.json.bak"
         file_export_path = self.gacha_log_path / f"{user_id}-{uid}-uigf.json"
-        with contextlib.suppress(Exception):
-            file_bak_path.unlink(missing_ok=True)
         with contextlib.suppress(Exception):
             file_export_path.unlink(missing_ok=True)
-        if file_path.exists():
-            try:
-                file_path.unlink()
-            except PermissionError:
-                return False
-            return True
-        return False
+        self.remove_summary(user_id, uid)
+        return self.storage.remove(user_id, uid)
 
     async def move_history_info(self, user_id: str, uid: str, new_user_id: str) -> bool:
         """移动历史抽卡记录数据
@@ -123,15 +125,8 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         :param new_user_id: 新用户id
         :return: 是否移动成功
         """
-        old_file_path = self.gacha_log_path / f"{user_id}-{uid}.json"
-        new_file_path = self.gacha_log_path / f"{new_user_id}-{uid}.json"
-        if (not old_file_path.exists()) or new_file_path.exists():
-            return False
-        try:
-            old_file_path.rename(new_file_path)
-            return True
-        except PermissionError:
-            return False
+        self.remove_summary(user_id, uid)
+        return self.storage.move(user_id, uid, new_user_id)
 
     async def save_gacha_log_info(self, user_id: str, uid: str, info: GachaLogInfo):
         """保存抽卡记录数据
@@ -139,16 +134,13 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         :param uid: 玩家uid
         :param info: 抽卡记录数据
         """
-        save_path = self.gacha_log_path / f"{user_id}-{uid}.json"
-        save_path_bak = self.gacha_log_path / f"{user_id}-{uid}.json.bak"
-        # 将旧数据备份一次
-        with contextlib.suppress(PermissionError):
-            if save_path.exists():
-                if save_path_bak.exists():
-                    save_path_bak.unlink()
-                save_path.rename(save_path.parent / f"{save_path.name}.bak")
-        # 写入数据
-        await self.save_json(save_path, info.json())
+        await self.storage.save(user_id, uid, info)
+        await self.update_summary(user_id, uid, info)
+        for hook in self.save_hooks:
+            try:
+                await hook(user_id, uid)
+            except Exception as exc:  # pylint: disable=W0703
+                logger.error("抽卡记录保存回调执行失败 user_id[%s] uid[%s]", user_id, uid, exc_info=exc)
 
     async def gacha_log_to_uigf(self, user_id: str, uid: str) -> Optional[Path]:
         """抽卡日记转换为 UIGF 格式
@@ -179,71 +171,128 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         return save_path
 
     @staticmethod
-    async def verify_data(data: List[GachaItem]) -> bool:
+    def verify_star_count(total: int, five_star: int, four_star: int):
+        """检查五星与四星数量是否合理"""
+        if total > 50:
+            if total <= five_star * 15:
+                raise GachaLogFileError(
+                    "检测到您将要导入的抽卡记录中五星数量过多，可能是由于文件错误导致的，请检查后重新导入。"
+                )
+            if four_star < five_star:
+                raise GachaLogFileError(
+                    "检测到您将要导入的抽卡记录中五星数量过多，可能是由于文件错误导致的，请检查后重新导入。"
+                )
+
+    async def verify_data(self, data: List[GachaItem]) -> bool:
         try:
-            total = len(data)
             five_star = len([i for i in data if i.rank_type == "5"])
             four_star = len([i for i in data if i.rank_type == "4"])
-            if total > 50:
-                if total <= five_star * 15:
-                    raise GachaLogFileError(
-                        "检测到您将要导入的抽卡记录中五星数量过多，可能是由于文件错误导致的，请检查后重新导入。"
-                    )
-                if four_star < five_star:
-                    raise GachaLogFileError(
-                        "检测到您将要导入的抽卡记录中五星数量过多，可能是由于文件错误导致的，请检查后重新导入。"
-                    )
+            self.verify_star_count(len(data), five_star, four_star)
             return True
         except Exception as exc:  # pylint: disable=W0703
             raise GachaLogFileError from exc
 
     @staticmethod
-    def import_data_backend(all_items: List[GachaItem], gacha_log: GachaLogInfo, temp_id_data: Dict) -> int:
+    def get_temp_id_data(gacha_log: GachaLogInfo) -> Dict[str, Set[str]]:
+        """将唯一 id 放入临时数据中，加快查找速度"""
+        return {pool_name: {i.id for i in pool_data} for pool_name, pool_data in gacha_log.item_list.items()}
+
+    @staticmethod
+    def get_high_water_marks(gacha_log: GachaLogInfo) -> Dict[str, datetime.datetime]:
+        """获取每个卡池类型已有记录的最新时间
+        :param gacha_log: 抽卡记录
+        :return: gacha_type -> 最新时间
+        """
+        marks = {}
+        for pool_data in gacha_log.item_list.values():
+            for item in pool_data:
+                mark = marks.get(item.gacha_type)
+                if mark is None or item.time > mark:
+                    marks[item.gacha_type] = item.time
+        return marks
+
+    @staticmethod
+    def import_data_backend(
+        all_items: List[GachaItem], gacha_log: GachaLogInfo, temp_id_data: Dict[str, Set[str]]
+    ) -> int:
         new_num = 0
         for item_info in all_items:
             pool_name = GACHA_TYPE_LIST[MCBannerType(int(item_info.gacha_type))]
             if pool_name not in temp_id_data:
-                temp_id_data[pool_name] = []
+                temp_id_data[pool_name] = set()
             if pool_name not in gacha_log.item_list:
                 gacha_log.item_list[pool_name] = []
             if item_info.id not in temp_id_data[pool_name]:
                 gacha_log.item_list[pool_name].append(item_info)
-                temp_id_data[pool_name].append(item_info.id)
+                temp_id_data[pool_name].add(item_info.id)
                 new_num += 1
         return new_num
 
+    def import_list_backend(
+        self, data: dict, gacha_log: GachaLogInfo, temp_id_data: Dict[str, Set[str]]
+    ) -> Tuple[int, Optional[Dict]]:
+        """导入已解析的 UIGF 数据
+        :return: 新增数量与 info
+        """
+        all_items = [GachaItem(**i) for i in data["list"]]
+        five_star = len([i for i in all_items if i.rank_type == "5"])
+        four_star = len([i for i in all_items if i.rank_type == "4"])
+        self.verify_star_count(len(all_items), five_star, four_star)
+        return self.import_data_backend(all_items, gacha_log, temp_id_data), data["info"]
+
+    def import_stream_backend(
+        self, file: IO[bytes], gacha_log: GachaLogInfo, temp_id_data: Dict[str, Set[str]]
+    ) -> Tuple[int, Optional[Dict]]:
+        """流式解析 UIGF 文件并分块导入，已存在的记录解析后立即丢弃
+        :return: 新增数量与 info
+        """
+        reader = UIGFStreamReader(file)
+        new_num = total = five_star = four_star = 0
+        for chunk in reader.iter_items(self.IMPORT_CHUNK_SIZE):
+            items = [GachaItem(**i) for i in chunk]
+            total += len(items)
+            five_star += len([i for i in items if i.rank_type == "5"])
+            four_star += len([i for i in items if i.rank_type == "4"])
+            new_num += self.import_data_backend(items, gacha_log, temp_id_data)
+        self.verify_star_count(total, five_star, four_star)
+        return new_num, reader.info
+
     async def import_gacha_log_data(self, user_id: int, player_id: int, data: dict, verify_uid: bool = True) -> int:
-        new_num = 0
+        return await self._import_gacha_log(user_id, player_id, verify_uid, self.import_list_backend, data)
+
+    async def import_gacha_log_file(
+        self, user_id: int, player_id: int, file: IO[bytes], verify_uid: bool = True
+    ) -> int:
+        """从 UIGF 文件导入抽卡记录，文件在线程池中流式解析
+        :param user_id: 用户id
+        :param player_id: 玩家id
+        :param file: 文件
+        :param verify_uid: 是否检查文件中的 uid
+        :return: 新增数量
+        """
+        return await self._import_gacha_log(user_id, player_id, verify_uid, self.import_stream_backend, file)
+
+    async def _import_gacha_log(self, user_id: int, player_id: int, verify_uid: bool, backend, source) -> int:
         try:
-            uid = data["info"]["uid"]
-            if not verify_uid:
-                uid = player_id
-            elif int(uid) != player_id:
+            uid = str(player_id)
+            gacha_log, status = await self.load_history_info(str(user_id), uid)
+            temp_id_data = self.get_temp_id_data(gacha_log)
+            # 在共用的线程池中解析与合并，避免堵塞主线程
+            loop = asyncio.get_running_loop()
+            new_num, info = await loop.run_in_executor(self.import_executor, backend, source, gacha_log, temp_id_data)
+            if not isinstance(info, dict):
+                raise GachaLogFileError("缺少 info 字段")
+            if verify_uid and int(info["uid"]) != player_id:
                 raise GachaLogAccountNotFound
             try:
-                import_type = ImportType(data["info"]["export_app"])
+                import_type = ImportType(info["export_app"])
             except ValueError:
                 import_type = ImportType.UNKNOWN
-            # 检查导入数据是否合法
-            all_items = [GachaItem(**i) for i in data["list"]]
-            await self.verify_data(all_items)
-            gacha_log, status = await self.load_history_info(str(user_id), uid)
             if import_type == ImportType.PAIMONMOE:
                 if status and gacha_log.get_import_type != ImportType.PAIMONMOE:
                     raise GachaLogMixedProvider
             elif status and gacha_log.get_import_type == ImportType.PAIMONMOE:
                 raise GachaLogMixedProvider
-            # 将唯一 id 放入临时数据中，加快查找速度
-            temp_id_data = {
-                pool_name: [i.id for i in pool_data] for pool_name, pool_data in gacha_log.item_list.items()
-            }
-            # 使用新线程进行遍历，避免堵塞主线程
-            loop = asyncio.get_event_loop()
-            # 可以使用with语句来确保线程执行完成后及时被清理
-            with ThreadPoolExecutor() as executor:
-                new_num = await loop.run_in_executor(
-                    executor, self.import_data_backend, all_items, gacha_log, temp_id_data
-                )
             for i in gacha_log.item_list.values():
                 # 检查导入后的数据是否合法
                 await self.verify_data(i)
@@ -264,47 +313,54 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
     def get_game_client(player_id: int) -> MCClient:
         return MCClient(player_id=player_id, region=recognize_region(player_id, Game.MC), lang="zh-hans")
 
-    async def get_gacha_log_data(self, user_id: int, player_id: int, authkey: str) -> int:
+    async def get_gacha_log_data(self, user_id: int, player_id: int, authkey: str, incremental: bool = True) -> int:
         """使用authkey获取抽卡记录数据，并合并旧数据
         :param user_id: 用户id
         :param player_id: 玩家id
         :param authkey: authkey
+        :param incremental: 是否增量更新，遇到已有的记录时停止处理该卡池剩余的记录
         :return: 更新结果
         """
         new_num = 0
         gacha_log, _ = await self.load_history_info(str(user_id), str(player_id))
         if gacha_log.get_import_type == ImportType.PAIMONMOE:
             raise GachaLogMixedProvider
-        # 将唯一 id 放入临时数据中，加快查找速度
-        temp_id_data = {pool_name: [i.id for i in pool_data] for pool_name, pool_data in gacha_log.item_list.items()}
+        temp_id_data = self.get_temp_id_data(gacha_log)
+        marks = self.get_high_water_marks(gacha_log) if incremental else {}
         client = self.get_game_client(player_id)
         try:
             for pool_id, pool_name in GACHA_TYPE_LIST.items():
                 wish_history = await client.wish_history(authkey, pool_id.value, player_id=player_id)
+                known_ids = temp_id_data.get(pool_name, set())
+                mark = marks.get(str(pool_id.value))
+                # 记录按时间倒序返回，早于已有最新记录的数据均已导入过
                 for data in wish_history:
+                    time = datetime.datetime(
+                        data.time.year,
+                        data.time.month,
+                        data.time.day,
+                        data.time.hour,
+                        data.time.minute,
+                        data.time.second,
+                    )
+                    if incremental and (str(data.id) in known_ids or (mark is not None and time < mark)):
+                        break
                     item = GachaItem(
                         id=str(data.id),
                         name=data.name,
                         gacha_type=str(data.banner_type.value),
                         item_type=data.type,
                         rank_type=str(data.rarity),
-                        time=datetime.datetime(
-                            data.time.year,
-                            data.time.month,
-                            data.time.day,
-                            data.time.hour,
-                            data.time.minute,
-                            data.time.second,
-                        ),
+                        time=time,
                     )
 
                     if pool_name not in temp_id_data:
-                        temp_id_data[pool_name] = []
+                        temp_id_data[pool_name] = known_ids
                     if pool_name not in gacha_log.item_list:
                         gacha_log.item_list[pool_name] = []
-                    if item.id not in temp_id_data[pool_name]:
+                    if item.id not in known_ids:
                         gacha_log.item_list[pool_name].append(item)
-                        temp_id_data[pool_name].append(item.id)
+                        known_ids.add(item.id)
                         new_num += 1
         except AuthkeyTimeout as exc:
             raise GachaLogAuthkeyTimeout from exc
@@ -334,71 +390,18 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         :param pool_name: 池子名称
         :return: 5星角色列表
         """
-        count = 0
-        result = []
-        for item in data:
-            count += 1
-            if item.rank_type == "5":
-                if item.item_type == "角色" and pool_name in {"角色祈愿", "常驻祈愿", "新手祈愿"}:
-                    data = {
-                        "name": item.name,
-                        "icon": (assets.avatar.normal(roleToId(item.name))).as_uri() if assets else "",
-                        "count": count,
-                        "type": "角色",
-                        "isUp": self.check_avatar_up(item.name, item.time) if pool_name == "角色祈愿" else False,
-                        "isBig": (not result[-1].isUp) if result and pool_name == "角色祈愿" else False,
-                        "time": item.time,
-                    }
-                    result.append(FiveStarItem.construct(**data))
-                elif item.item_type == "武器" and pool_name in {"武器祈愿", "常驻武器祈愿", "新手祈愿"}:
-                    data = {
-                        "name": item.name,
-                        "icon": (assets.weapon.icon(weaponToId(item.name))).as_uri() if assets else "",
-                        "count": count,
-                        "type": "武器",
-                        "isUp": False,
-                        "isBig": False,
-                        "time": item.time,
-                    }
-                    result.append(FiveStarItem.construct(**data))
-                count = 0
-        result.reverse()
-        return result, count
+        result, count = PoolAnalytics(data).five_star_items(pool_name, self.check_avatar_up)
+        return self.fill_icon(result, assets), count
 
-    @staticmethod
-    async def get_all_4_star_items(data: List[GachaItem], assets: "AssetsService"):
+    async def get_all_4_star_items(self, data: List[GachaItem], assets: "AssetsService"):
         """
         获取 no_fout_star
         :param data: 抽卡记录
         :param assets: 资源服务
         :return: no_fout_star
         """
-        count = 0
-        result = []
-        for item in data:
-            count += 1
-            if item.rank_type == "4":
-                if item.item_type == "角色":
-                    data = {
-                        "name": item.name,
-                        "icon": (assets.avatar.normal(roleToId(item.name))).as_uri() if assets else "",
-                        "count": count,
-                        "type": "角色",
-                        "time": item.time,
-                    }
-                    result.append(FourStarItem.construct(**data))
-                elif item.item_type == "武器":
-                    data = {
-                        "name": item.name,
-                        "icon": (assets.weapon.icon(weaponToId(item.name))).as_uri() if assets else "",
-                        "count": count,
-                        "type": "武器",
-                        "time": item.time,
-                    }
-                    result.append(FourStarItem.construct(**data))
-                count = 0
-        result.reverse()
-        return result, count
+        result, count = PoolAnalytics(data).four_star_items()
+        return self.fill_icon(result, assets), count
 
     @staticmethod
     def get_301_pool_data(total: int, all_five: List[FiveStarItem], no_five_star: int, no_four_star: int):
@@ -454,8 +457,7 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         four_star_avg = round((total - no_four_star) / four_star, 2) if four_star != 0 else 0
         # 四星最多
         four_star_name_list = [i.name for i in all_four]
-        four_star_max = max(four_star_name_list, key=four_star_name_list.count) if four_star_name_list else ""
-        four_star_max_count = four_star_name_list.count(four_star_max)
+        four_star_max, four_star_max_count = most_common(four_star_name_list)
         return [
             [
                 {"num": no_five_star, "unit": "抽", "lable": "未出五星"},
@@ -485,8 +487,7 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         four_star_avg = round((total - no_four_star) / four_star, 2) if four_star != 0 else 0
         # 四星最多
         four_star_name_list = [i.name for i in all_four]
-        four_star_max = max(four_star_name_list, key=four_star_name_list.count) if four_star_name_list else ""
-        four_star_max_count = four_star_name_list.count(four_star_max)
+        four_star_max, four_star_max_count = most_common(four_star_name_list)
         return [
             [
                 {"num": no_five_star, "unit": "抽", "lable": "未出五星"},
@@ -516,8 +517,7 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         four_star_avg = round((total - no_four_star) / four_star, 2) if four_star != 0 else 0
         # 四星最多
         four_star_name_list = [i.name for i in all_four]
-        four_star_max = max(four_star_name_list, key=four_star_name_list.count) if four_star_name_list else ""
-        four_star_max_count = four_star_name_list.count(four_star_max)
+        four_star_max, four_star_max_count = most_common(four_star_name_list)
         return [
             [
                 {"num": no_five_star, "unit": "抽", "lable": "未出五星"},
@@ -565,10 +565,10 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         :param assets: 资源服务
         :return: 分析数据
         """
-        gacha_log, status = await self.load_history_info(str(user_id), str(player_id))
-        if not status:
+        summary = await self.get_summary(str(user_id), str(player_id))
+        if summary is None:
             raise GachaLogNotFound
-        return await self.get_analysis_data(gacha_log, pool, assets)
+        return self.get_analysis_from_summary(summary, pool, assets)
 
     async def get_analysis_data(self, gacha_log: "GachaLogInfo", pool: MCBannerType, assets: Optional["AssetsService"]):
         """
@@ -578,31 +578,44 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         :param assets: 资源服务
         :return: 分析数据
         """
-        player_id = gacha_log.uid
+        summary = await self.build_summary(gacha_log)
+        return self.get_analysis_from_summary(summary, pool, assets)
+
+    def get_analysis_from_summary(
+        self, summary: "GachaLogSummary", pool: MCBannerType, assets: Optional["AssetsService"]
+    ) -> dict:
+        """
+        从统计数据中获取抽卡记录分析数据
+        :param summary: 抽卡记录统计
+        :param pool: 池子类型
+        :param assets: 资源服务
+        :return: 分析数据
+        """
+        player_id = summary.uid
         pool_name = GACHA_TYPE_LIST[pool]
-        if pool_name not in gacha_log.item_list:
+        if pool_name not in summary.pools:
             raise GachaLogNotFound
-        data = gacha_log.item_list[pool_name]
-        total = len(data)
+        data = summary.pools[pool_name]
+        total = data.total
         if total == 0:
             raise GachaLogNotFound
-        all_five, no_five_star = await self.get_all_5_star_items(data, assets, pool_name)
-        all_four, no_four_star = await self.get_all_4_star_items(data, assets)
+        all_five, no_five_star = self.fill_icon(data.five, assets), data.no_five_star
+        all_four, no_four_star = self.fill_icon(data.four[:36], assets), data.no_four_star
         summon_data = None
         if pool == MCBannerType.CHARACTER:
             summon_data = self.get_301_pool_data(total, all_five, no_five_star, no_four_star)
             pool_name = self.count_fortune(pool_name, summon_data)
         elif pool == MCBannerType.WEAPON:
-            summon_data = self.get_302_pool_data(total, all_five, all_four, no_five_star, no_four_star)
+            summon_data = self.get_302_pool_data(total, all_five, data.four, no_five_star, no_four_star)
             pool_name = self.count_fortune(pool_name, summon_data, True)
         elif pool in [MCBannerType.STANDARD, MCBannerType.STANDARD_WEAPON]:
-            summon_data = self.get_200_pool_data(total, all_five, all_four, no_five_star, no_four_star)
+            summon_data = self.get_200_pool_data(total, all_five, data.four, no_five_star, no_four_star)
             pool_name = self.count_fortune(pool_name, summon_data)
         elif pool == MCBannerType.TEMPORARY:
-            summon_data = self.get_500_pool_data(total, all_five, all_four, no_five_star, no_four_star)
+            summon_data = self.get_500_pool_data(total, all_five, data.four, no_five_star, no_four_star)
             pool_name = self.count_fortune(pool_name, summon_data)
-        last_time = data[0].time.strftime("%Y-%m-%d %H:%M")
-        first_time = data[-1].time.strftime("%Y-%m-%d %H:%M")
+        last_time = data.start_time.strftime("%Y-%m-%d %H:%M")
+        first_time = data.end_time.strftime("%Y-%m-%d %H:%M")
         return {
             "uid": mask_number(player_id),
             "allNum": total,
@@ -611,8 +624,8 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
             "line": summon_data,
             "firstTime": first_time,
             "lastTime": last_time,
-            "fiveLog": all_five,
-            "fourLog": all_four[:36],
+            "fiveLog": [i.to_render_data() for i in all_five],
+            "fourLog": [i.to_render_data() for i in all_four],
         }
 
     async def get_pool_analysis(
@@ -626,37 +639,35 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         :param group: 是否群组
         :return: 分析数据
         """
-        gacha_log, status = await self.load_history_info(str(user_id), str(player_id))
-        if not status:
+        summary = await self.get_summary(str(user_id), str(player_id))
+        if summary is None:
             raise GachaLogNotFound
         pool_name = GACHA_TYPE_LIST[pool]
-        if pool_name not in gacha_log.item_list:
+        if pool_name not in summary.pools:
             raise GachaLogNotFound
-        data = gacha_log.item_list[pool_name]
-        total = len(data)
-        if total == 0:
+        data = summary.pools[pool_name]
+        if data.total == 0:
             raise GachaLogNotFound
-        all_five, _ = await self.get_all_5_star_items(data, assets, pool_name)
-        all_four, _ = await self.get_all_4_star_items(data, assets)
+        all_five = self.fill_icon(data.five, assets)
+        all_four = self.fill_icon(data.four, assets)
         pool_data = []
         up_pool_data = [Pool(**i) for i in get_pool_by_id(pool.value)]
-        for up_pool in up_pool_data:
+        for up_pool, banner in zip(up_pool_data, data.banners):
+            if banner.count == 0:
+                continue
             for item in all_five:
                 up_pool.parse(item)
             for item in all_four:
                 up_pool.parse(item)
-            up_pool.count_item(data)
-        for up_pool in up_pool_data:
             pool_data.append(
                 {
-                    "count": up_pool.count,
+                    "count": banner.count,
                     "list": up_pool.to_list(),
                     "name": up_pool.name,
-                    "start": up_pool.start.strftime("%Y-%m-%d"),
-                    "end": up_pool.end.strftime("%Y-%m-%d"),
+                    "start": banner.start.strftime("%Y-%m-%d"),
+                    "end": banner.end.strftime("%Y-%m-%d"),
                 }
             )
-        pool_data = [i for i in pool_data if i["count"] > 0]
         return {
             "uid": player_id,
             "typeName": pool_name,
@@ -671,11 +682,11 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
         :param assets: 资源服务
         :return: 分析数据
         """
-        gacha_log, status = await self.load_history_info(str(user_id), str(player_id))
-        if not status:
+        summary = await self.get_summary(str(user_id), str(player_id))
+        if summary is None:
             raise GachaLogNotFound
         pools = []
-        for pool_name, items in gacha_log.item_list.items():
+        for pool_name, data in summary.pools.items():
             pool = Pool(
                 five=[pool_name],
                 four=[],
@@ -683,10 +694,10 @@ class GachaLog(GachaLogOnlineView, GachaLogRanks):
                 to=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 **{"from": "2020-09-28 00:00:00"},
             )
-            all_five, _ = await self.get_all_5_star_items(items, assets, pool_name)
-            for item in all_five:
+            for item in self.fill_icon(data.five, assets):
                 pool.parse(item)
-            pool.count_item(items)
+            if data.total:
+                pool.count, pool.start, pool.end = data.total, data.start_time, data.end_time
             pools.append(pool)
         pool_data = [
             {
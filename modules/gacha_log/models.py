@@ -1,6 +1,6 @@
 import datetime
 from enum import Enum
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
 from pydantic import field_validator, BaseModel
 
@@ -25,6 +25,10 @@ class FiveStarItem(BaseModel):
     isBig: bool
     time: datetime.datetime
 
+    def to_render_data(self) -> Dict[str, Any]:
+        """只保留模板中用到的字段"""
+        return {"icon": self.icon, "count": self.count, "isUp": self.isUp}
+
 
 class FourStarItem(BaseModel):
     name: str
@@ -33,6 +37,10 @@ class FourStarItem(BaseModel):
     type: str
     time: datetime.datetime
 
+    def to_render_data(self) -> Dict[str, Any]:
+        """只保留模板中用到的字段"""
+        return {"icon": self.icon, "count": self.count}
+
 
 class GachaItem(BaseModel):
     id: str
@@ -93,6 +101,40 @@ class GachaLogInfo(BaseModel):
             return ImportType.UNKNOWN
 
 
+class BannerSummary(BaseModel):
+    count: int = 0
+    start: Optional[datetime.datetime] = None
+    end: Optional[datetime.datetime] = None
+
+
+class PoolSummary(BaseModel):
+    total: int = 0
+    start_time: Optional[datetime.datetime] = None
+    end_time: Optional[datetime.datetime] = None
+    no_five_star: int = 0
+    no_four_star: int = 0
+    five: List[FiveStarItem] = []
+    four: List[FourStarItem] = []
+    banners: List[BannerSummary] = []
+
+
+class GachaLogSummary(BaseModel):
+    uid: str
+    hash: str
+    signature: str = ""
+    version: int = 0
+    pool_hash: str = ""
+    import_type: str = ""
+    pools: Dict[str, PoolSummary] = {}
+
+    @property
+    def get_import_type(self) -> ImportType:
+        try:
+            return ImportType(self.import_type)
+        except ValueError:
+            return ImportType.UNKNOWN
+
+
 class Pool:
     def __init__(self, five: List[str], four: List[str], name: str, to: str, **kwargs):
         self.five = five
@@ -1,7 +1,7 @@
+from io import BytesIO
 from pathlib import Path
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
-import httpx
 from httpx import URL
 from httpx import HTTPError
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
@@ -9,6 +9,10 @@ from telegram.helpers import create_deep_linked_url
 
 from gram_core.basemodel import Settings, SettingsConfigDict
 from modules.gacha_log.error import GachaLogWebNotConfigError, GachaLogWebUploadError, GachaLogNotFound
+from utils.httpclient import get_client
+
+if TYPE_CHECKING:
+    from modules.gacha_log.storage import GachaLogStorage
 
 
 class GachaLogWebConfig(Settings):
@@ -28,6 +32,7 @@ class GachaLogOnlineView:
     """抽卡记录在线查询"""
 
     gacha_log_path: Path
+    storage: "GachaLogStorage"
 
     @staticmethod
     def get_web_upload_button(bot_username: str):
@@ -46,36 +51,36 @@ class GachaLogOnlineView:
     async def web_upload(self, user_id: str, uid: str) -> str:
         if not gacha_log_web_config.url:
             raise GachaLogWebNotConfigError
-        file_path = self.gacha_log_path / f"{user_id}-{uid}.json"
-        if not file_path.exists():
+        data = await self.storage.export_json(user_id, uid)
+        if data is None:
             raise GachaLogNotFound
-        async with httpx.AsyncClient() as client:
-            with open(file_path, "rb") as file:
-                try:
-                    req = await client.post(
-                        URL(gacha_log_web_config.url).join("upload"),
-                        files={"file": file},
-                        data={
-                            "token": gacha_log_web_config.token,
-                            "uid": uid,
-                            "game": "mc",
-                        },
-                    )
-                    req.raise_for_status()
-                except HTTPError as e:
-                    raise GachaLogWebUploadError from e
-                account_id = req.json()["account_id"]
-                url = (
-                    URL(gacha_log_web_config.url)
-                    .join("gacha_log")
-                    .copy_merge_params(
-                        {
-                            "account_id": account_id,
-                            "banner_type": DEFAULT_POOL,
-                            "rarities": "3,4,5",
-                            "size": 100,
-                            "page": 1,
-                        }
-                    )
+        client = get_client()
+        with BytesIO(data) as file:
+            try:
+                req = await client.post(
+                    URL(gacha_log_web_config.url).join("upload"),
+                    files={"file": (f"{user_id}-{uid}.json", file)},
+                    data={
+                        "token": gacha_log_web_config.token,
+                        "uid": uid,
+                        "game": "mc",
+                    },
+                )
+                req.raise_for_status()
+            except HTTPError as e:
+                raise GachaLogWebUploadError from e
+            account_id = req.json()["account_id"]
+            url = (
+                URL(gacha_log_web_config.url)
+                .join("gacha_log")
+                .copy_merge_params(
+                    {
+                        "account_id": account_id,
+                        "banner_type": DEFAULT_POOL,
+                        "rarities": "3,4,5",
+                        "size": 100,
+                        "page": 1,
+                    }
                 )
-                return str(url)
+            )
+            return str(url)
@@ -1,6 +1,9 @@
 import asyncio
 import contextlib
+import multiprocessing
+import time
 from abc import abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import List, Optional, TYPE_CHECKING, Dict
 
@@ -9,11 +12,14 @@ from kuronet.models.mc.wish import MCBannerType
 from core.services.gacha_log_rank.services import GachaLogRankService
 from core.services.gacha_log_rank.models import GachaLogRank, GachaLogTypeEnum, GachaLogQueryTypeEnum
 from modules.gacha_log.error import GachaLogNotFound
-from modules.gacha_log.models import GachaLogInfo, ImportType
+from modules.gacha_log.models import GachaLogSummary, ImportType
+from modules.gacha_log.recount import GachaLogRecountConfig, RecountCheckpoint, bulk_upsert_ranks, recount_worker
 from utils.log import logger
 
 if TYPE_CHECKING:
     from core.dependence.assets import AssetsService
+    from core.dependence.database import Database
+    from modules.gacha_log.storage import GachaLogStorage
     from telegram import Message
 
 
@@ -25,6 +31,7 @@ class GachaLogRanks:
     """抽卡记录排行榜"""
 
     gacha_log_path: Path
+    storage: "GachaLogStorage"
     ITEM_LIST_MAP = {
         "角色祈愿": GachaLogTypeEnum.CHARACTER,
         "武器祈愿": GachaLogTypeEnum.WEAPON,
@@ -47,19 +54,36 @@ class GachaLogRanks:
     def __init__(
         self,
         gacha_log_rank_service: GachaLogRankService = None,
+        database: "Database" = None,
     ):
         self.gacha_log_rank_service = gacha_log_rank_service
+        self.database = database
 
-    @staticmethod
     @abstractmethod
-    async def load_json(path):
-        """加载json文件"""
+    async def get_summary(self, user_id: str, uid: str) -> Optional["GachaLogSummary"]:
+        """
+        获取抽卡记录统计
+        :param user_id: 用户id
+        :param uid: 玩家uid
+        :return: 统计数据
+        """
 
     @abstractmethod
-    async def get_analysis_data(self, gacha_log: "GachaLogInfo", pool: MCBannerType, assets: Optional["AssetsService"]):
+    async def read_summary(self, user_id: str, uid: str) -> Optional["GachaLogSummary"]:
         """
-        获取抽卡记录分析数据
-        :param gacha_log: 抽卡记录
+        只读地获取抽卡记录统计
+        :param user_id: 用户id
+        :param uid: 玩家uid
+        :return: 统计数据
+        """
+
+    @abstractmethod
+    def get_analysis_from_summary(
+        self, summary: "GachaLogSummary", pool: MCBannerType, assets: Optional["AssetsService"]
+    ) -> Dict:
+        """
+        从统计数据中获取抽卡记录分析数据
+        :param summary: 抽卡记录统计
         :param pool: 池子类型
         :param assets: 资源服务
         :return: 分析数据
@@ -78,20 +102,27 @@ class GachaLogRanks:
                     setattr(rank, gacha_log_type.value, value)
         return rank
 
-    async def recount_one_data(self, file_path: Path) -> List[GachaLogRank]:
-        """重新计算一个文件的数据"""
+    async def recount_one_data(self, user_id: str, uid: str, readonly: bool = False) -> List[GachaLogRank]:
+        """重新计算一个用户的数据
+        :param readonly: 是否只读，不保存统计也不迁移抽卡记录
+        """
         try:
-            gacha_log = GachaLogInfo.parse_obj(await self.load_json(file_path))
-            if gacha_log.get_import_type != ImportType.UIGF:
+            if readonly:
+                summary = await self.read_summary(user_id, uid)
+            else:
+                summary = await self.get_summary(user_id, uid)
+            if summary is None:
+                raise GachaLogError("抽卡记录不存在")
+            if summary.get_import_type != ImportType.UIGF:
                 raise GachaLogError("不支持的抽卡记录类型")
         except ValueError as e:
             raise GachaLogError from e
-        player_id = int(gacha_log.uid)
+        player_id = int(summary.uid)
         data = []
         for k, v in self.BANNER_TYPE_MAP.items():
             rank_type = self.ITEM_LIST_MAP[k]
             try:
-                gacha_log_data = await self.get_analysis_data(gacha_log, v, None)
+                gacha_log_data = self.get_analysis_from_summary(summary, v, None)
             except GachaLogNotFound:
                 continue
             rank = self.parse_analysis_data(player_id, rank_type, gacha_log_data)
@@ -99,18 +130,17 @@ class GachaLogRanks:
         return data
 
     async def recount_one_from_uid(self, user_id: int, uid: int):
-        save_path = self.gacha_log_path / f"{user_id}-{uid}.json"
-        await self.recount_one(save_path)
+        await self.recount_one(str(user_id), str(uid))
 
-    async def recount_one(self, file_path: Path):
-        if not file_path.exists():
+    async def recount_one(self, user_id: str, uid: str):
+        if not self.storage.exists(user_id, uid):
             return
         try:
-            ranks = await self.recount_one_data(file_path)
+            ranks = await self.recount_one_data(user_id, uid)
             if ranks:
                 await self.add_or_update(ranks)
         except GachaLogError:
-            logger.warning("更新抽卡排名失败 file[%s]", file_path)
+            logger.warning("更新抽卡排名失败 user_id[%s] uid[%s]", user_id, uid)
 
     async def add_or_update(self, ranks: List["GachaLogRank"]):
         """添加或更新用户数据"""
@@ -124,20 +154,74 @@ class GachaLogRanks:
             else:
                 await self.gacha_log_rank_service.add(rank)
 
+    def get_recount_checkpoint(self) -> RecountCheckpoint:
+        return RecountCheckpoint(self.gacha_log_path / "rank_recount.json")
+
+    async def save_recount_ranks(self, ranks: List["GachaLogRank"]):
+        """写入一批重新统计的数据"""
+        if self.database is not None:
+            await bulk_upsert_ranks(self.database.engine, ranks)
+            return
+        players: Dict[int, List["GachaLogRank"]] = {}
+        for rank in ranks:
+            players.setdefault(rank.player_id, []).append(rank)
+        for player_ranks in players.values():
+            await self.add_or_update(player_ranks)
+
     async def recount_all_data(self, message: "Message"):
-        """重新计算所有数据"""
+        """重新计算所有数据
+
+        抽卡记录在子进程中分批读取与分析，结果按批写入数据库并保存进度，中断后再次执行会从上次的进度继续。
+        """
         for key1 in GachaLogTypeEnum:
             for key2 in GachaLogQueryTypeEnum:
                 await self.gacha_log_rank_service.del_all_cache_by_type(key1, key2)  # noqa
-        files = [f for f in self.gacha_log_path.glob("*.json") if len(f.stem.split("-")) == 2]
-        tasks = []
-        for idx, f in enumerate(files):
-            tasks.append(self.recount_one(f))
-            if len(tasks) >= 10:
-                await asyncio.gather(*tasks)
-                tasks.clear()
-            if idx % 10 == 1:
-                with contextlib.suppress(Exception):
-                    await message.edit_text(f"已处理 {idx + 1}/{len(files)} 个文件")
-        if tasks:
-            await asyncio.gather(*tasks)
+        config = GachaLogRecountConfig()
+        checkpoint = self.get_recount_checkpoint()
+        if checkpoint.load():
+            logger.info("从上次的进度继续重新统计抽卡记录排行榜 已完成 %s 个文件", len(checkpoint.done))
+        files = sorted(self.storage.iter_keys())
+        todo = [key for key in files if not checkpoint.is_done(key)]
+        total, processed = len(files), 0
+        chunks = [todo[i : i + config.chunk_size] for i in range(0, len(todo), config.chunk_size)]
+        loop = asyncio.get_running_loop()
+        start_time = last_report = time.monotonic()
+        pending_keys, pending_ranks = [], []
+
+        async def flush():
+            if pending_keys:
+                await self.save_recount_ranks(pending_ranks)
+                checkpoint.update(pending_keys)
+                pending_keys.clear()
+                pending_ranks.clear()
+
+        # 使用 spawn 避免在已运行事件循环的进程中 fork
+        with ProcessPoolExecutor(config.max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [
+                loop.run_in_executor(executor, recount_worker, str(self.gacha_log_path), chunk) for chunk in chunks
+            ]
+            for future in asyncio.as_completed(futures):
+                for key, ranks in await future:
+                    pending_keys.append(key)
+                    pending_ranks.extend(GachaLogRank(**rank) for rank in ranks)
+                    processed += 1
+                if len(pending_keys) >= config.batch_size:
+                    await flush()
+                now = time.monotonic()
+                if now - last_report >= 5:
+                    last_report = now
+                    speed = processed / (now - start_time)
+                    with contextlib.suppress(Exception):
+                        await message.edit_text(
+                            f"已处理 {total - len(todo) + processed}/{total} 个文件，{speed:.1f} 个/秒"
+                        )
+        await flush()
+        checkpoint.remove()
+        elapsed = time.monotonic() - start_time
+        logger.success(
+            "重新统计抽卡记录排行榜完成 共 %s 个文件 本次处理 %s 个 耗时 %.1f 秒 %.1f 个/秒",
+            total,
+            processed,
+            elapsed,
+            processed / elapsed if elapsed else 0,
+        )
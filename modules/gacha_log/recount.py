@@ -0,0 +1,170 @@
+"""抽卡记录排行榜重新统计
+
+抽卡记录的读取与分析在子进程中完成，主进程只负责批量写入数据库与保存进度。
+子进程只读取文件，不保存统计也不迁移旧版记录，避免与主进程同时写入同一文件。
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+from pydantic_settings import SettingsConfigDict
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.services.gacha_log_rank.models import GachaLogRank
+from gram_core.basemodel import Settings
+
+try:
+    import ujson as jsonlib
+except ImportError:
+    import json as jsonlib
+
+__all__ = ("GachaLogRecountConfig", "RecountCheckpoint", "recount_worker", "get_upsert_statement", "bulk_upsert_ranks")
+
+RecountKey = Tuple[str, str]
+RecountResult = Tuple[RecountKey, List[Dict]]
+SCORE_FIELDS = tuple(name for name in GachaLogRank.model_fields if name.startswith("score_"))
+# 单条语句写入的最大行数，避免超出数据库的参数数量限制
+UPSERT_CHUNK_SIZE = 500
+
+
+class GachaLogRecountConfig(Settings):
+    """抽卡记录排行榜重新统计配置"""
+
+    workers: int = 0
+    """子进程数量，0 表示使用 CPU 核心数"""
+    chunk_size: int = 50
+    """每个子进程任务处理的文件数"""
+    batch_size: int = 1000
+    """每次写入数据库的玩家数"""
+
+    model_config = SettingsConfigDict(env_prefix="gacha_log_recount_")
+
+    @property
+    def max_workers(self) -> int:
+        return self.workers or min(os.cpu_count() or 1, 8)
+
+
+def recount_worker(gacha_log_path: str, keys: List[RecountKey]) -> List[RecountResult]:
+    """在子进程中只读地计算一批抽卡记录的排行榜数据
+    :param gacha_log_path: 抽卡记录目录
+    :param keys: (user_id, uid) 列表
+    :return: 每个 (user_id, uid) 对应的排行榜数据，无法统计的记录为空列表
+    """
+    from modules.gacha_log.log import GachaLog  # pylint: disable=C0415
+    from modules.gacha_log.ranks import GachaLogError  # pylint: disable=C0415
+
+    gacha_log = GachaLog(gacha_log_path=Path(gacha_log_path))
+
+    async def _run() -> List[RecountResult]:
+        result = []
+        for user_id, uid in keys:
+            try:
+                ranks = await gacha_log.recount_one_data(user_id, uid, readonly=True)
+            except GachaLogError:
+                ranks = []
+            result.append(((user_id, uid), [rank.model_dump(exclude_none=True) for rank in ranks]))
+        return result
+
+    return asyncio.run(_run())
+
+
+class RecountCheckpoint:
+    """重新统计进度，中断后再次执行时跳过已写入数据库的记录"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: Set[str] = set()
+
+    @staticmethod
+    def get_key(key: RecountKey) -> str:
+        return f"{key[0]}-{key[1]}"
+
+    def load(self) -> bool:
+        """读取进度
+        :return: 是否存在未完成的进度
+        """
+        if not self.path.exists():
+            return False
+        try:
+            data = jsonlib.loads(self.path.read_text(encoding="utf-8"))
+            self.done = set(data.get("done", []))
+        except (ValueError, AttributeError):
+            self.done = set()
+        return bool(self.done)
+
+    def is_done(self, key: RecountKey) -> bool:
+        return self.get_key(key) in self.done
+
+    def update(self, keys: Iterable[RecountKey]):
+        """记录已写入数据库的记录并保存"""
+        self.done.update(self.get_key(key) for key in keys)
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        tmp_path.write_text(jsonlib.dumps({"done": sorted(self.done)}), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    def remove(self):
+        self.done.clear()
+        self.path.unlink(missing_ok=True)
+
+
+def get_upsert_statement(dialect: str, rows: List[Dict]):
+    """根据数据库类型生成批量写入排行榜数据的语句，不支持的数据库返回 None
+    :param dialect: 数据库类型
+    :param rows: 排行榜数据，(player_id, type) 不能重复
+    """
+    table = GachaLogRank.__table__
+    if dialect == "mysql":
+        statement = mysql.insert(table).values(rows)
+        values = {name: statement.inserted[name] for name in SCORE_FIELDS}
+    elif dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert(table).values(rows)
+        values = {name: statement.excluded[name] for name in SCORE_FIELDS}
+    else:
+        return None
+    if "time_updated" in table.c:
+        values["time_updated"] = func.now()
+    if dialect == "mysql":
+        return statement.on_duplicate_key_update(values)
+    return statement.on_conflict_do_update(index_elements=[table.c.player_id, table.c.type], set_=values)
+
+
+async def bulk_upsert_ranks(engine, ranks: List[GachaLogRank]):
+    """批量写入排行榜数据，在同一个事务中使用 upsert 语句完成更新与插入
+    :param engine: 数据库引擎
+    :param ranks: 排行榜数据，(player_id, type) 重复时以后出现的为准
+    """
+    if not ranks:
+        return
+    ranks = list({(rank.player_id, rank.type): rank for rank in ranks}.values())
+    rows = [
+        {"player_id": rank.player_id, "type": rank.type, **{name: getattr(rank, name) for name in SCORE_FIELDS}}
+        for rank in ranks
+    ]
+    async with AsyncSession(engine) as session:
+        for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            statement = get_upsert_statement(engine.dialect.name, rows[i : i + UPSERT_CHUNK_SIZE])
+            if statement is None:
+                break
+            await session.exec(statement)
+        else:
+            await session.commit()
+            return
+        # 不支持 upsert 的数据库，一次查询已有数据后逐条更新或插入
+        player_ids = list({rank.player_id for rank in ranks})
+        statement = select(GachaLogRank).where(GachaLogRank.player_id.in_(player_ids))
+        results = await session.exec(statement)
+        old_ranks_map = {(r.player_id, r.type): r for r in results.all()}
+        for rank in ranks:
+            old_rank = old_ranks_map.get((rank.player_id, rank.type))
+            if old_rank:
+                old_rank.update_by_new(rank)
+                session.add(old_rank)
+            else:
+                session.add(rank)
+        await session.commit()
@@ -0,0 +1,535 @@
+"""抽卡记录存储后端
+
+默认使用紧凑的列式二进制格式 ``{user_id}-{uid}.mcgl``：
+
+    文件头   b"MCGL" + 版本号(u8)
+    数据块   类型(u8) + 长度(u32) + 内容
+
+    META  元信息 (json)
+    NAMES 追加到名称表的物品名称 (按 ``\\n`` 分隔)
+    ROWS  某个卡池新增的记录，按列存储：名称索引、卡池类型、物品类型、星级、时间 (微秒时间戳)、ID
+
+刷新记录时只会在文件末尾追加新增的数据块，只有旧记录发生变化（例如导入了更早的记录）时才会整体重写。
+旧版的 JSON 文件在第一次读取时会被自动迁移。
+"""
+
+import asyncio
+import contextlib
+import datetime
+import json
+import struct
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from weakref import WeakValueDictionary
+
+import aiofiles
+
+from gram_core.basemodel import Settings, SettingsConfigDict
+from modules.gacha_log.models import GachaItem, GachaLogInfo
+from utils.log import logger
+
+__all__ = (
+    "GachaLogStorageConfig",
+    "GachaLogStorage",
+    "JsonGachaLogStorage",
+    "ColumnarGachaLogStorage",
+    "STORAGE_BACKENDS",
+    "get_gacha_log_storage",
+)
+
+
+class GachaLogStorageConfig(Settings):
+    """抽卡记录存储配置"""
+
+    storage: str = "columnar"
+
+    model_config = SettingsConfigDict(env_prefix="gacha_log_")
+
+
+class GachaLogStorage(ABC):
+    """抽卡记录存储后端基类"""
+
+    suffix: str = ".json"
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def get_file_path(self, user_id: str, uid: str, bak: bool = False) -> Path:
+        """获取文件路径
+        :param user_id: 用户 ID
+        :param uid: UID
+        :param bak: 是否为备份文件
+        :return: 文件路径
+        """
+        return self.path / f"{user_id}-{uid}{self.suffix}{'.bak' if bak else ''}"
+
+    def exists(self, user_id: str, uid: str) -> bool:
+        return self.get_file_path(user_id, uid).exists()
+
+    def signature(self, user_id: str, uid: str) -> Optional[str]:
+        """获取文件签名，文件发生变化时签名随之变化
+        :return: 文件签名，文件不存在时返回 None
+        """
+        try:
+            stat = self.get_file_path(user_id, uid).stat()
+        except OSError:
+            return None
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    @abstractmethod
+    async def load(self, user_id: str, uid: str) -> Optional[GachaLogInfo]:
+        """读取抽卡记录，文件不存在或损坏时返回 None"""
+
+    async def read(self, user_id: str, uid: str) -> Optional[GachaLogInfo]:
+        """只读地读取抽卡记录，不会迁移或改写文件，可以在其他进程中调用"""
+        return await self.load(user_id, uid)
+
+    @abstractmethod
+    async def save(self, user_id: str, uid: str, info: GachaLogInfo) -> None:
+        """保存抽卡记录"""
+
+    def remove(self, user_id: str, uid: str) -> bool:
+        """删除抽卡记录
+        :return: 是否删除成功
+        """
+        with contextlib.suppress(Exception):
+            self.get_file_path(user_id, uid, bak=True).unlink(missing_ok=True)
+        file_path = self.get_file_path(user_id, uid)
+        if file_path.exists():
+            try:
+                file_path.unlink()
+            except PermissionError:
+                return False
+            return True
+        return False
+
+    def move(self, user_id: str, uid: str, new_user_id: str) -> bool:
+        """移动抽卡记录
+        :return: 是否移动成功
+        """
+        old_file_path = self.get_file_path(user_id, uid)
+        new_file_path = self.get_file_path(new_user_id, uid)
+        if (not old_file_path.exists()) or new_file_path.exists():
+            return False
+        try:
+            old_file_path.rename(new_file_path)
+            return True
+        except PermissionError:
+            return False
+
+    def iter_keys(self) -> Iterator[Tuple[str, str]]:
+        """遍历所有已保存的 (user_id, uid)"""
+        for f in self.path.glob(f"*{self.suffix}"):
+            data = f.name[: -len(self.suffix)].split("-")
+            if len(data) == 2:
+                yield data[0], data[1]
+
+    async def export_json(self, user_id: str, uid: str) -> Optional[bytes]:
+        """导出为 JSON 格式
+        :return: JSON 数据，记录不存在时返回 None
+        """
+        info = await self.load(user_id, uid)
+        if info is None:
+            return None
+        return info.model_dump_json().encode("utf-8")
+
+
+class JsonGachaLogStorage(GachaLogStorage):
+    """JSON 格式存储"""
+
+    suffix = ".json"
+
+    @staticmethod
+    async def load_json(path):
+        async with aiofiles.open(path, "r", encoding="utf-8") as f:
+            return json.loads(await f.read())
+
+    @staticmethod
+    async def save_json(path, data: str):
+        async with aiofiles.open(path, "w", encoding="utf-8") as f:
+            await f.write(data)
+
+    async def load(self, user_id: str, uid: str) -> Optional[GachaLogInfo]:
+        file_path = self.get_file_path(user_id, uid)
+        if not file_path.exists():
+            return None
+        try:
+            return GachaLogInfo.model_validate(await self.load_json(file_path))
+        except json.decoder.JSONDecodeError:
+            return None
+
+    async def save(self, user_id: str, uid: str, info: GachaLogInfo) -> None:
+        save_path = self.get_file_path(user_id, uid)
+        save_path_bak = self.get_file_path(user_id, uid, bak=True)
+        # 将旧数据备份一次
+        with contextlib.suppress(PermissionError):
+            if save_path.exists():
+                if save_path_bak.exists():
+                    save_path_bak.unlink()
+                save_path.rename(save_path_bak)
+        # 写入数据
+        await self.save_json(save_path, info.model_dump_json())
+
+    async def export_json(self, user_id: str, uid: str) -> Optional[bytes]:
+        file_path = self.get_file_path(user_id, uid)
+        if not file_path.exists():
+            return None
+        async with aiofiles.open(file_path, "rb") as f:
+            return await f.read()
+
+
+MAGIC = b"MCGL"
+VERSION = 1
+BLOCK_META = 1
+BLOCK_NAMES = 2
+BLOCK_ROWS = 3
+ID_INT = 0
+ID_STR = 1
+ITEM_TYPES = ("角色", "武器")
+# 追加的数据块超过该数量时整体重写一次，避免碎片化
+COMPACT_BLOCKS = 64
+
+_HEADER = MAGIC + bytes((VERSION,))
+_BLOCK_HEAD = struct.Struct("<BI")
+_ROWS_HEAD = struct.Struct("<HIB")
+_EPOCH = datetime.datetime(1970, 1, 1)
+_INT64_MAX = 2**63 - 1
+_DIGITS = tuple(str(i) for i in range(256))
+
+
+def _dump_array(arr: array) -> bytes:
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _load_array(typecode: str, data: memoryview, offset: int, n: int) -> Tuple[array, int]:
+    arr = array(typecode)
+    end = offset + arr.itemsize * n
+    arr.frombytes(data[offset:end])
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr, end
+
+
+def _to_timestamp(time: datetime.datetime) -> int:
+    delta = time.replace(tzinfo=None) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _from_timestamp(ts: int) -> datetime.datetime:
+    return _EPOCH + datetime.timedelta(microseconds=ts)
+
+
+def _item_key(item: GachaItem) -> Tuple[int, str]:
+    return _to_timestamp(item.time), item.id
+
+
+def _block(kind: int, payload: bytes) -> bytes:
+    return _BLOCK_HEAD.pack(kind, len(payload)) + payload
+
+
+class _FileState:
+    """已持久化到文件中的内容摘要，用于判断能否以追加的方式写入"""
+
+    def __init__(self):
+        self.size = 0
+        self.mtime_ns = 0
+        self.blocks = 0
+        self.names: Dict[str, int] = {}
+        self.pools: Dict[str, Tuple[int, Optional[Tuple[int, str]]]] = {}
+
+    def is_valid(self, path: Path) -> bool:
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    def touch(self, path: Path):
+        stat = path.stat()
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+
+
+class _Encoder:
+    """列式格式编码"""
+
+    def __init__(self, state: _FileState):
+        self.state = state
+        self.new_names: List[str] = []
+
+    def intern(self, name: str) -> int:
+        idx = self.state.names.get(name)
+        if idx is None:
+            idx = len(self.state.names)
+            self.state.names[name] = idx
+            self.new_names.append(name)
+        return idx
+
+    @staticmethod
+    def meta(info: GachaLogInfo) -> bytes:
+        data = {
+            "user_id": info.user_id,
+            "uid": info.uid,
+            "update_time": info.update_time.isoformat(),
+            "import_type": info.import_type,
+        }
+        return _block(BLOCK_META, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    def names(self) -> bytes:
+        if not self.new_names:
+            return b""
+        payload = "\n".join(self.new_names).encode("utf-8")
+        self.new_names = []
+        return _block(BLOCK_NAMES, payload)
+
+    def rows(self, pool_name: str, items: List[GachaItem]) -> bytes:
+        name_idx = array("I", (self.intern(i.name) for i in items))
+        gacha_type = array("B", (int(i.gacha_type) for i in items))
+        item_type = array("B", (ITEM_TYPES.index(i.item_type) for i in items))
+        rank_type = array("B", (int(i.rank_type) for i in items))
+        times = array("q", (_to_timestamp(i.time) for i in items))
+        ids = [i.id for i in items]
+        if all(i.isdigit() and str(int(i)) == i and int(i) <= _INT64_MAX for i in ids):
+            id_kind, id_data = ID_INT, _dump_array(array("q", (int(i) for i in ids)))
+        else:
+            id_data = "\n".join(ids).encode("utf-8")
+            id_kind, id_data = ID_STR, struct.pack("<I", len(id_data)) + id_data
+        pool = pool_name.encode("utf-8")
+        payload = b"".join(
+            (
+                _ROWS_HEAD.pack(len(pool), len(items), id_kind),
+                pool,
+                _dump_array(name_idx),
+                _dump_array(gacha_type),
+                _dump_array(item_type),
+                _dump_array(rank_type),
+                _dump_array(times),
+                id_data,
+            )
+        )
+        count, last = self.state.pools.get(pool_name, (0, None))
+        self.state.pools[pool_name] = (count + len(items), _item_key(items[-1]) if items else last)
+        # 名称表必须写在使用它的记录之前
+        return self.names() + _block(BLOCK_ROWS, payload)
+
+
+def _decode(data: bytes, state: _FileState) -> Optional[GachaLogInfo]:
+    """解码列式格式，文件末尾不完整的数据块会被忽略"""
+    if data[: len(_HEADER)] != _HEADER:
+        return None
+    view = memoryview(data)
+    offset = len(_HEADER)
+    names: List[str] = []
+    meta: Dict = {}
+    item_list: Dict[str, List[GachaItem]] = {}
+    while offset + _BLOCK_HEAD.size <= len(data):
+        kind, length = _BLOCK_HEAD.unpack_from(data, offset)
+        start = offset + _BLOCK_HEAD.size
+        end = start + length
+        if end > len(data):
+            break
+        if kind == BLOCK_META:
+            meta = json.loads(bytes(view[start:end]).decode("utf-8"))
+        elif kind == BLOCK_NAMES:
+            names.extend(bytes(view[start:end]).decode("utf-8").split("\n"))
+        elif kind == BLOCK_ROWS:
+            pool_len, n, id_kind = _ROWS_HEAD.unpack_from(data, start)
+            pos = start + _ROWS_HEAD.size
+            pool_name = bytes(view[pos : pos + pool_len]).decode("utf-8")
+            pos += pool_len
+            name_idx, pos = _load_array("I", view, pos, n)
+            gacha_type, pos = _load_array("B", view, pos, n)
+            item_type, pos = _load_array("B", view, pos, n)
+            rank_type, pos = _load_array("B", view, pos, n)
+            times, pos = _load_array("q", view, pos, n)
+            if id_kind == ID_INT:
+                ids = [str(i) for i in _load_array("q", view, pos, n)[0]]
+            else:
+                (id_len,) = struct.unpack_from("<I", data, pos)
+                ids = bytes(view[pos + 4 : pos + 4 + id_len]).decode("utf-8").split("\n") if n else []
+            items = item_list.setdefault(pool_name, [])
+            # 十连的记录时间相同，缓存转换结果
+            time_cache: Dict[int, datetime.datetime] = {}
+            for _id, _name, _gacha_type, _item_type, _rank_type, ts in zip(
+                ids, name_idx, gacha_type, item_type, rank_type, times
+            ):
+                time = time_cache.get(ts)
+                if time is None:
+                    time = time_cache[ts] = _from_timestamp(ts)
+                # 写入时已经校验过，读取时跳过校验
+                items.append(
+                    GachaItem.model_construct(
+                        id=_id,
+                        name=names[_name],
+                        gacha_type=_DIGITS[_gacha_type],
+                        item_type=ITEM_TYPES[_item_type],
+                        rank_type=_DIGITS[_rank_type],
+                        time=time,
+                    )
+                )
+            last = state.pools.get(pool_name, (0, None))[1]
+            state.pools[pool_name] = (len(items), (times[-1], ids[-1]) if n else last)
+        offset = end
+        state.blocks += 1
+    if not meta:
+        return None
+    state.names = {name: idx for idx, name in enumerate(names)}
+    if offset != len(data):
+        # 存在不完整的数据块，下次保存时需要整体重写
+        state.size = -1
+    return GachaLogInfo.model_construct(
+        user_id=meta["user_id"],
+        uid=meta["uid"],
+        update_time=datetime.datetime.fromisoformat(meta["update_time"]),
+        import_type=meta.get("import_type", ""),
+        item_list=item_list,
+    )
+
+
+class ColumnarGachaLogStorage(GachaLogStorage):
+    """列式二进制格式存储，兼容读取旧版 JSON 文件"""
+
+    suffix = ".mcgl"
+    # 每个文件一个锁，不同用户的保存互不等待；锁不再被使用时自动释放
+    _locks: "WeakValueDictionary[Path, asyncio.Lock]" = WeakValueDictionary()
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self.legacy = JsonGachaLogStorage(path)
+        self._states: Dict[Path, _FileState] = {}
+
+    def exists(self, user_id: str, uid: str) -> bool:
+        return super().exists(user_id, uid) or self.legacy.exists(user_id, uid)
+
+    def signature(self, user_id: str, uid: str) -> Optional[str]:
+        return super().signature(user_id, uid) or self.legacy.signature(user_id, uid)
+
+    async def load(self, user_id: str, uid: str, migrate: bool = True) -> Optional[GachaLogInfo]:
+        file_path = self.get_file_path(user_id, uid)
+        if not file_path.exists():
+            if not migrate:
+                return await self.legacy.load(user_id, uid)
+            return await self.migrate(user_id, uid)
+        async with aiofiles.open(file_path, "rb") as f:
+            data = await f.read()
+        state = _FileState()
+        info = _decode(data, state)
+        if info is None:
+            logger.warning("抽卡记录文件损坏 file[%s]", file_path)
+            self._states.pop(file_path, None)
+            return None
+        if state.size != -1:
+            state.size = len(data)
+            state.mtime_ns = file_path.stat().st_mtime_ns
+        self._states[file_path] = state
+        return info
+
+    async def read(self, user_id: str, uid: str) -> Optional[GachaLogInfo]:
+        return await self.load(user_id, uid, migrate=False)
+
+    async def migrate(self, user_id: str, uid: str) -> Optional[GachaLogInfo]:
+        """将旧版 JSON 文件转换为列式格式"""
+        info = await self.legacy.load(user_id, uid)
+        if info is None:
+            return None
+        await self.save(user_id, uid, info)
+        with contextlib.suppress(PermissionError):
+            legacy_path = self.legacy.get_file_path(user_id, uid)
+            legacy_path.replace(self.legacy.get_file_path(user_id, uid, bak=True))
+        return info
+
+    @classmethod
+    def get_lock(cls, file_path: Path) -> asyncio.Lock:
+        lock = cls._locks.get(file_path)
+        if lock is None:
+            lock = cls._locks[file_path] = asyncio.Lock()
+        return lock
+
+    async def save(self, user_id: str, uid: str, info: GachaLogInfo) -> None:
+        file_path = self.get_file_path(user_id, uid)
+        async with self.get_lock(file_path):
+            state = self._states.get(file_path)
+            data = None
+            if state is not None and state.blocks < COMPACT_BLOCKS and state.is_valid(file_path):
+                data = self._encode_append(info, state)
+            if data is not None:
+                async with aiofiles.open(file_path, "ab") as f:
+                    await f.write(data)
+            else:
+                state = _FileState()
+                data = self._encode_all(info, state)
+                tmp_path = file_path.with_name(f"{file_path.name}.tmp")
+                async with aiofiles.open(tmp_path, "wb") as f:
+                    await f.write(data)
+                with contextlib.suppress(PermissionError):
+                    if file_path.exists():
+                        file_path.replace(self.get_file_path(user_id, uid, bak=True))
+                tmp_path.replace(file_path)
+            state.touch(file_path)
+            self._states[file_path] = state
+
+    @staticmethod
+    def _encode_all(info: GachaLogInfo, state: _FileState) -> bytes:
+        encoder = _Encoder(state)
+        blocks = [_HEADER, encoder.meta(info)]
+        blocks.extend(encoder.rows(pool_name, items) for pool_name, items in info.item_list.items())
+        state.blocks = len(blocks) - 1
+        return b"".join(blocks)
+
+    @staticmethod
+    def _encode_append(info: GachaLogInfo, state: _FileState) -> Optional[bytes]:
+        """只编码新增的记录，无法追加时返回 None"""
+        if set(state.pools) - set(info.item_list):
+            return None
+        new_items: Dict[str, List[GachaItem]] = {}
+        for pool_name, items in info.item_list.items():
+            count, last = state.pools.get(pool_name, (0, None))
+            if len(items) < count:
+                return None
+            # 记录按 (time, id) 排序且 id 唯一，只需比较旧数据的最后一条即可确认旧数据未发生变化
+            if count and _item_key(items[count - 1]) != last:
+                return None
+            if pool_name not in state.pools or len(items) > count:
+                new_items[pool_name] = items[count:]
+        encoder = _Encoder(state)
+        blocks = [encoder.meta(info)]
+        blocks.extend(encoder.rows(pool_name, items) for pool_name, items in new_items.items())
+        state.blocks += len(blocks)
+        return b"".join(blocks)
+
+    def remove(self, user_id: str, uid: str) -> bool:
+        self._states.pop(self.get_file_path(user_id, uid), None)
+        legacy = self.legacy.remove(user_id, uid)
+        return super().remove(user_id, uid) or legacy
+
+    def move(self, user_id: str, uid: str, new_user_id: str) -> bool:
+        self._states.pop(self.get_file_path(user_id, uid), None)
+        if super().exists(user_id, uid):
+            return super().move(user_id, uid, new_user_id)
+        return self.legacy.move(user_id, uid, new_user_id)
+
+    def iter_keys(self) -> Iterator[Tuple[str, str]]:
+        keys: Set[Tuple[str, str]] = set(super().iter_keys())
+        keys.update(self.legacy.iter_keys())
+        yield from keys
+
+
+STORAGE_BACKENDS = {
+    "json": JsonGachaLogStorage,
+    "columnar": ColumnarGachaLogStorage,
+}
+
+
+def get_gacha_log_storage(path: Path) -> GachaLogStorage:
+    """根据配置获取存储后端"""
+    storage = GachaLogStorageConfig().storage
+    if storage not in STORAGE_BACKENDS:
+        logger.warning("未知的抽卡记录存储后端 %s ，使用默认存储", storage)
+        storage = "columnar"
+    return STORAGE_BACKENDS[storage](path)
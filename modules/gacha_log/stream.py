@@ -0,0 +1,136 @@
+"""UIGF/UIMF 文件流式解析
+
+按块读取文件，逐条解析 ``list`` 数组中的记录，内存占用只与单条记录的大小有关，与文件大小无关。
+"""
+
+import codecs
+import json
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+__all__ = ("UIGFStreamReader",)
+
+_WHITESPACE = " \t\n\r"
+
+
+class UIGFStreamReader:
+    """UIGF/UIMF 文件流式解析器
+
+    ``info`` 等字段完整解析，``list`` 数组中的记录按块返回。
+    """
+
+    def __init__(self, file: IO[bytes], read_size: int = 64 * 1024):
+        self.file = file
+        self.read_size = read_size
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.fields: Dict[str, Any] = {}
+
+    def _fill(self) -> bool:
+        """读取更多数据
+        :return: 是否读取到了新数据
+        """
+        if self.eof:
+            return False
+        chunk = self.file.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            self.buffer = self.buffer[self.pos :] + self.decoder.decode(b"", final=True)
+            self.pos = 0
+            return False
+        self.buffer = self.buffer[self.pos :] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """跳过空白字符并返回下一个字符，文件结束时返回空字符串"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Expecting '{char}' at position {self.pos}")
+        self.pos += 1
+
+    def _value(self) -> Any:
+        """解析一个完整的 JSON 值，数据不完整时继续读取"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # 数字可能被截断在块的末尾
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _items(self) -> Iterator[Dict[str, Any]]:
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            char = self._peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Expecting ',' delimiter at position {self.pos - 1}")
+
+    def iter_items(self, chunk_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """按块返回 ``list`` 数组中的记录，其他字段解析后保存在 ``fields`` 中
+        :param chunk_size: 每块的记录数
+        :return: 记录块
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expecting property name at position {self.pos}")
+            self._expect(":")
+            if key == "list" and self._peek() == "[":
+                chunk = []
+                for item in self._items():
+                    chunk.append(item)
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = []
+                if chunk:
+                    yield chunk
+                self.fields[key] = None
+            else:
+                self.fields[key] = self._value()
+            char = self._peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(f"Expecting ',' delimiter at position {self.pos - 1}")
+
+    @property
+    def info(self) -> Optional[Dict[str, Any]]:
+        return self.fields.get("info")
+
+    def read_all(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """解析整个文件
+        :return: info 与所有记录
+        """
+        items = []
+        for chunk in self.iter_items():
+            items.extend(chunk)
+        return self.info, items
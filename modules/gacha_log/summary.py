@@ -0,0 +1,178 @@
+import contextlib
+import datetime
+import hashlib
+import json
+from abc import abstractmethod
+from pathlib import Path
+from typing import List, Optional, TypeVar, TYPE_CHECKING
+
+import aiofiles
+from pydantic import ValidationError
+
+from metadata.pool.pool import get_pool_by_id
+from metadata.shortname import roleToId, weaponToId
+from modules.gacha_log.analytics import PoolAnalytics
+from modules.gacha_log.const import GACHA_TYPE_LIST_REVERSE
+from modules.gacha_log.models import FiveStarItem, FourStarItem, GachaLogInfo, GachaLogSummary, PoolSummary
+from utils.log import logger
+
+if TYPE_CHECKING:
+    from core.dependence.assets import AssetsService
+    from modules.gacha_log.storage import GachaLogStorage
+
+# 统计逻辑发生变化时需要修改，使旧的统计缓存失效
+SUMMARY_VERSION = 1
+StarItem = TypeVar("StarItem", FiveStarItem, FourStarItem)
+
+
+def _get_pool_metadata_hash() -> str:
+    data = {k: get_pool_by_id(v.value) for k, v in GACHA_TYPE_LIST_REVERSE.items()}
+    return hashlib.sha1(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class GachaLogSummaries:
+    """抽卡记录统计缓存
+
+    导入记录时预先计算各卡池的五星、四星、保底与卡池统计，保存在抽卡记录旁，分析时直接读取。
+    """
+
+    gacha_log_path: Path
+    storage: "GachaLogStorage"
+    POOL_METADATA_HASH = _get_pool_metadata_hash()
+
+    @staticmethod
+    @abstractmethod
+    def check_avatar_up(name: str, __: datetime.datetime) -> bool:
+        """判断五星角色是否为 UP"""
+
+    def get_summary_path(self, user_id: str, uid: str) -> Path:
+        return self.gacha_log_path / f"{user_id}-{uid}-summary.json"
+
+    def get_content_hash(self, gacha_log: GachaLogInfo) -> str:
+        """计算抽卡记录内容的哈希值"""
+        sha1 = hashlib.sha1(f"{SUMMARY_VERSION}|{self.POOL_METADATA_HASH}".encode("utf-8"))
+        for pool_name, items in gacha_log.item_list.items():
+            sha1.update(f"|{pool_name}|{len(items)}".encode("utf-8"))
+            sha1.update(
+                "".join(
+                    f"{i.id},{i.name},{i.gacha_type},{i.item_type},{i.rank_type},{i.time.isoformat()};" for i in items
+                ).encode("utf-8")
+            )
+        return sha1.hexdigest()
+
+    async def build_summary(self, gacha_log: GachaLogInfo, content_hash: str = "") -> GachaLogSummary:
+        """计算抽卡记录统计
+        :param gacha_log: 抽卡记录
+        :param content_hash: 抽卡记录内容的哈希值
+        :return: 统计数据
+        """
+        summary = GachaLogSummary(
+            uid=gacha_log.uid,
+            hash=content_hash or self.get_content_hash(gacha_log),
+            version=SUMMARY_VERSION,
+            pool_hash=self.POOL_METADATA_HASH,
+            import_type=gacha_log.import_type,
+        )
+        for pool_name, data in gacha_log.item_list.items():
+            if not data:
+                summary.pools[pool_name] = PoolSummary()
+                continue
+            analytics = PoolAnalytics(data)
+            all_five, no_five_star = analytics.five_star_items(pool_name, self.check_avatar_up)
+            all_four, no_four_star = analytics.four_star_items()
+            banners = []
+            if pool_type := GACHA_TYPE_LIST_REVERSE.get(pool_name):
+                banners = analytics.banner_windows(get_pool_by_id(pool_type.value))
+            summary.pools[pool_name] = PoolSummary.model_construct(
+                total=len(data),
+                start_time=data[0].time,
+                end_time=data[-1].time,
+                no_five_star=no_five_star,
+                no_four_star=no_four_star,
+                five=all_five,
+                four=all_four,
+                banners=banners,
+            )
+        return summary
+
+    def is_current(self, summary: GachaLogSummary) -> bool:
+        """统计是否由当前版本的统计逻辑与卡池数据计算"""
+        return summary.version == SUMMARY_VERSION and summary.pool_hash == self.POOL_METADATA_HASH
+
+    async def load_summary(self, user_id: str, uid: str) -> Optional[GachaLogSummary]:
+        path = self.get_summary_path(user_id, uid)
+        if not path.exists():
+            return None
+        try:
+            async with aiofiles.open(path, "r", encoding="utf-8") as f:
+                return GachaLogSummary.model_validate_json(await f.read())
+        except (ValidationError, ValueError):
+            return None
+
+    async def save_summary(self, user_id: str, uid: str, summary: GachaLogSummary):
+        summary.signature = self.storage.signature(user_id, uid) or ""
+        async with aiofiles.open(self.get_summary_path(user_id, uid), "w", encoding="utf-8") as f:
+            await f.write(summary.model_dump_json())
+
+    def remove_summary(self, user_id: str, uid: str):
+        with contextlib.suppress(Exception):
+            self.get_summary_path(user_id, uid).unlink(missing_ok=True)
+
+    async def update_summary(self, user_id: str, uid: str, gacha_log: GachaLogInfo) -> GachaLogSummary:
+        """抽卡记录保存后重新计算统计"""
+        summary = await self.build_summary(gacha_log)
+        await self.save_summary(user_id, uid, summary)
+        return summary
+
+    async def get_summary(self, user_id: str, uid: str) -> Optional[GachaLogSummary]:
+        """获取抽卡记录统计，抽卡记录发生变化时重新计算
+        :param user_id: 用户id
+        :param uid: 玩家uid
+        :return: 统计数据，抽卡记录不存在时返回 None
+        """
+        signature = self.storage.signature(user_id, uid)
+        if signature is None:
+            return None
+        summary = await self.load_summary(user_id, uid)
+        if summary is not None and summary.signature == signature and self.is_current(summary):
+            return summary
+        gacha_log = await self.storage.load(user_id, uid)
+        if gacha_log is None:
+            return None
+        content_hash = self.get_content_hash(gacha_log)
+        if summary is None or summary.hash != content_hash:
+            logger.debug("重新计算抽卡记录统计 user_id[%s] uid[%s]", user_id, uid)
+            summary = await self.build_summary(gacha_log, content_hash)
+        await self.save_summary(user_id, uid, summary)
+        return summary
+
+    async def read_summary(self, user_id: str, uid: str) -> Optional[GachaLogSummary]:
+        """只读地获取抽卡记录统计，缓存过期时在内存中重新计算，不会保存统计或迁移抽卡记录，可以在其他进程中调用
+        :param user_id: 用户id
+        :param uid: 玩家uid
+        :return: 统计数据，抽卡记录不存在时返回 None
+        """
+        signature = self.storage.signature(user_id, uid)
+        if signature is None:
+            return None
+        summary = await self.load_summary(user_id, uid)
+        if summary is not None and summary.signature == signature and self.is_current(summary):
+            return summary
+        gacha_log = await self.storage.read(user_id, uid)
+        if gacha_log is None:
+            return None
+        return await self.build_summary(gacha_log)
+
+    @staticmethod
+    def fill_icon(items: List[StarItem], assets: Optional["AssetsService"]) -> List[StarItem]:
+        """为统计中的物品补充图标"""
+        if not assets:
+            return items
+        result = []
+        for item in items:
+            if item.type == "角色":
+                icon = assets.avatar.normal(roleToId(item.name)).as_uri()
+            else:
+                icon = assets.weapon.icon(weaponToId(item.name)).as_uri()
+            result.append(item.model_copy(update={"icon": icon}))
+        return result
@@ -3,7 +3,8 @@ from typing import List, Dict
 
 import aiofiles
 import ujson as jsonlib
-from httpx import AsyncClient
+
+from utils.httpclient import get_client
 
 
 class WikiModel:
@@ -12,7 +13,7 @@ class WikiModel:
     BASE_PATH.mkdir(parents=True, exist_ok=True)
 
     def __init__(self):
-        self.client = AsyncClient(timeout=120.0)
+        self.client = get_client("wiki", timeout=120.0)
 
     async def remote_get(self, url: str):
         return await self.client.get(url)
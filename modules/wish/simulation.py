@@ -0,0 +1,179 @@
+"""抽卡模拟
+
+按 ``GachaBanner`` 的五星权重曲线计算每次出五星所用抽数的分布，
+再按 UP 概率与大保底组合出获得 N 个 UP 五星所需的总抽数，所有样本一次性计算。
+安装了 numpy 时使用向量化计算，否则退回纯 Python 实现并减少样本数。
+"""
+
+import random
+import re
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from modules.wish.banner import GachaBanner
+from modules.wish.error import GachaIllegalArgument
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__all__ = ("CHARACTER_BANNER", "WEAPON_BANNER", "PullSimulationResult", "PullSimulator", "parse_simulate_args")
+
+# 五星基础概率 0.8%，66 抽起概率提升，80 抽必出
+_WEIGHT5 = ((1, 80), (65, 80), (80, 10000))
+CHARACTER_BANNER = GachaBanner(title="角色活动唤取", weight5=_WEIGHT5, event_chance5=50)
+WEAPON_BANNER = GachaBanner(title="武器活动唤取", weight5=_WEIGHT5, event_chance5=100)
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+# 没有 numpy 时的最大样本数
+PURE_PYTHON_MAX_SAMPLES = 20000
+
+
+class PullSimulationResult(BaseModel):
+    copies: int
+    samples: int
+    mean: float
+    min: int
+    max: int
+    percentiles: Dict[int, int]
+    """百分位 -> 所需抽数"""
+
+
+class PullSimulator:
+    """抽卡模拟器"""
+
+    def __init__(self, banner: GachaBanner):
+        self.banner = banner
+        hazard = []
+        pity = 0
+        while not hazard or hazard[-1] < 1:
+            pity += 1
+            if pity > 1000:
+                raise GachaIllegalArgument("Banner has no hard pity")
+            hazard.append(min(banner.get_weight(5, pity), 10000) / 10000)
+        self.hard_pity = pity
+        # survival[k] 为前 k 抽都未出五星的概率
+        survival = [1.0]
+        for value in hazard:
+            survival.append(survival[-1] * (1 - value))
+        self._survival = survival
+        self._cdf_cache = {}
+
+    def get_cdf(self, pity: int) -> List[float]:
+        """已垫 pity 抽时，下一个五星所用抽数的累计分布，下标 j 对应 j + 1 抽
+        :param pity: 已垫抽数
+        :return: 累计分布
+        """
+        pity = max(0, min(pity, self.hard_pity - 1))
+        cdf = self._cdf_cache.get(pity)
+        if cdf is None:
+            base = self._survival[pity]
+            cdf = [1 - value / base for value in self._survival[pity + 1 :]]
+            cdf[-1] = 1.0
+            self._cdf_cache[pity] = cdf
+        return cdf
+
+    def simulate(
+        self,
+        copies: int,
+        pity: int = 0,
+        guaranteed: bool = False,
+        samples: int = 100000,
+        seed: Optional[int] = None,
+    ) -> Sequence[int]:
+        """模拟获得 copies 个 UP 五星所需的抽数
+        :param copies: UP 五星个数
+        :param pity: 已垫抽数
+        :param guaranteed: 下一个五星是否必定为 UP
+        :param samples: 样本数
+        :param seed: 随机数种子
+        :return: 每个样本所需的抽数
+        """
+        if copies < 1 or samples < 1:
+            raise GachaIllegalArgument
+        chance = self.banner.get_event_chance(5) / 100
+        # 每个 UP 最多需要两个五星
+        rolls = copies * 2
+        if np is not None:
+            return self._simulate_numpy(copies, rolls, pity, guaranteed, chance, samples, seed)
+        return self._simulate_python(
+            copies, rolls, pity, guaranteed, chance, min(samples, PURE_PYTHON_MAX_SAMPLES), seed
+        )
+
+    def _simulate_numpy(
+        self, copies: int, rolls: int, pity: int, guaranteed: bool, chance: float, samples: int, seed: Optional[int]
+    ) -> "np.ndarray":
+        rng = np.random.default_rng(seed)
+        first_cdf = np.asarray(self.get_cdf(pity))
+        cdf = np.asarray(self.get_cdf(0))
+        gaps = np.empty((samples, rolls), dtype=np.int32)
+        gaps[:, 0] = np.searchsorted(first_cdf, rng.random(samples)) + 1
+        gaps[:, 1:] = np.searchsorted(cdf, rng.random((samples, rolls - 1))) + 1
+        totals = np.cumsum(gaps, axis=1)
+        # 每个 UP 所用的五星数：大保底时为 1，否则歪了为 2
+        lost = rng.random((samples, copies)) >= chance
+        if guaranteed:
+            lost[:, 0] = False
+        used = np.cumsum(lost + 1, axis=1)[:, -1]
+        return totals[np.arange(samples), used - 1]
+
+    def _simulate_python(
+        self, copies: int, rolls: int, pity: int, guaranteed: bool, chance: float, samples: int, seed: Optional[int]
+    ) -> List[int]:
+        rng = random.Random(seed)  # nosec
+        first_cdf = self.get_cdf(pity)
+        cdf = self.get_cdf(0)
+        result = []
+        for _ in range(samples):
+            gaps = [bisect_left(first_cdf, rng.random()) + 1]
+            gaps.extend(bisect_left(cdf, rng.random()) + 1 for _ in range(rolls - 1))
+            used = sum(1 if (guaranteed and idx == 0) or rng.random() < chance else 2 for idx in range(copies))
+            result.append(list(accumulate(gaps))[used - 1])
+        return result
+
+    def run(
+        self,
+        copies: int,
+        pity: int = 0,
+        guaranteed: bool = False,
+        samples: int = 100000,
+        seed: Optional[int] = None,
+    ) -> PullSimulationResult:
+        """模拟并统计获得 copies 个 UP 五星所需抽数的分布，参数与 simulate 相同"""
+        totals = self.simulate(copies, pity, guaranteed, samples, seed)
+        if np is not None:
+            values = np.percentile(totals, PERCENTILES, method="higher")
+            return PullSimulationResult(
+                copies=copies,
+                samples=len(totals),
+                mean=float(np.mean(totals)),
+                min=int(np.min(totals)),
+                max=int(np.max(totals)),
+                percentiles={p: int(v) for p, v in zip(PERCENTILES, values)},
+            )
+        ordered = sorted(totals)
+        return PullSimulationResult(
+            copies=copies,
+            samples=len(ordered),
+            mean=sum(ordered) / len(ordered),
+            min=ordered[0],
+            max=ordered[-1],
+            percentiles={p: ordered[-(-(len(ordered) - 1) * p // 100)] for p in PERCENTILES},
+        )
+
+
+def parse_simulate_args(text: str, max_copies: int) -> Tuple[bool, int]:
+    """解析唤取模拟的参数，支持 ``/summon_simulate 武器 3`` 与 ``唤取模拟武器 3``
+    :param text: 消息内容
+    :param max_copies: UP 五星个数上限
+    :return: 是否为武器卡池与 UP 五星个数
+    """
+    if text.startswith("/"):
+        # 去掉命令本身，避免 bot 用户名中的数字被当作个数
+        text = text.partition(" ")[2]
+    match = re.search(r"\d+", text)
+    copies = int(match.group()) if match else 1
+    return "武器" in text, max(1, min(copies, max_copies))
@@ -29,6 +29,7 @@ class SetCommandPlugin(Plugin):
             BotCommand("summon_log_online_view", "调频记录在线浏览"),
             BotCommand("summon_log_rank", "抽卡排行榜"),
             BotCommand("summon_waiting_list", "未复刻列表"),
+            BotCommand("summon_simulate", "模拟获得 UP 五星所需抽数"),
             # BotCommand("pay_log", "查看充值记录"),
             # BotCommand("pay_log_import", "导入充值记录"),
             # BotCommand("pay_log_export", "导出充值记录"),
@@ -13,7 +13,8 @@ class NotesJob(Plugin):
     def __init__(self, daily_note_system: DailyNoteSystem):
         self.daily_note_system = daily_note_system
 
-    @job.run_repeating(interval=datetime.timedelta(minutes=20), name="NotesJob")
+    # 每个用户的请求时间由 DailyNoteSystem 预先计算，任务只取出已到时间的用户
+    @job.run_repeating(interval=datetime.timedelta(minutes=5), name="NotesJob")
     async def card(self, context: "ContextTypes.DEFAULT_TYPE"):
         logger.info("正在执行自动便签提醒")
         await self.daily_note_system.do_get_notes_job(context)
@@ -15,8 +15,9 @@ from core.plugin import Plugin, handler
 from core.services.cookies import CookiesService
 from core.services.players import PlayersService
 from core.services.players.services import PlayerInfoService
+from core.services.render_cache.queue import RenderPriority
+from core.services.render_cache.services import RenderCacheService
 from core.services.template.models import FileType
-from core.services.template.services import TemplateService
 from gram_core.services.template.models import RenderGroupResult
 from metadata.shortname import traveler_roles
 from plugins.tools.genshin import CharacterDetails, GenshinHelper
@@ -55,6 +56,28 @@ class AvatarData(BaseModel):
             total_level += skill_data.skill.level
         return total_level
 
+    def to_render_data(self) -> Dict[str, Any]:
+        """只保留模板中用到的字段，同时作为渲染缓存的键"""
+        return {
+            "avatar": {
+                "roleName": self.avatar.roleName,
+                "level": self.avatar.level,
+                "starLevel": self.avatar.starLevel,
+            },
+            "icon": self.icon,
+            "constellation": self.constellation,
+            "skills": [{"skill": {"level": i.skill.level}, "buffed": i.buffed} for i in self.skills],
+            "weapon": {
+                "level": self.weapon.level,
+                "resonLevel": self.weapon.resonLevel,
+                "weapon": {
+                    "weaponName": self.weapon.weapon.weaponName,
+                    "weaponStarLevel": self.weapon.weapon.weaponStarLevel,
+                },
+            },
+            "weapon_icon": self.weapon_icon,
+        }
+
 
 class AvatarListPlugin(Plugin):
     """练度统计"""
@@ -64,7 +87,7 @@ class AvatarListPlugin(Plugin):
         player_service: PlayersService = None,
         cookies_service: CookiesService = None,
         assets_service: AssetsService = None,
-        template_service: TemplateService = None,
+        render_cache: RenderCacheService = None,
         helper: GenshinHelper = None,
         character_details: CharacterDetails = None,
         player_info_service: PlayerInfoService = None,
@@ -72,7 +95,7 @@ class AvatarListPlugin(Plugin):
     ) -> None:
         self.cookies_service = cookies_service
         self.assets_service = assets_service
-        self.template_service = template_service
+        self.render_cache = render_cache
         self.helper = helper
         self.character_details = character_details
         self.player_service = player_service
@@ -82,6 +105,9 @@ class AvatarListPlugin(Plugin):
 
     async def get_avatar_data(self, character: MCRole, client: "MCClient") -> Optional["AvatarData"]:
         detail = await self.character_details.get_character_details(client, character)
+        return self.build_avatar_data(character, detail)
+
+    def build_avatar_data(self, character: MCRole, detail: Optional[MCRoleDetail]) -> Optional["AvatarData"]:
         if detail is None:
             return None
         talents = [t for t in detail.skillList if t.skill.type in self.show_talents]
@@ -101,10 +127,8 @@ class AvatarListPlugin(Plugin):
     async def get_avatars_data(
         self, characters: Sequence[MCRole], client: "MCClient", max_length: int = None
     ) -> List["AvatarData"]:
-        async def _task(c):
-            return await self.get_avatar_data(c, client)
-
-        task_results = await asyncio.gather(*[_task(character) for character in characters])
+        details = await self.character_details.get_characters_details(client, characters)
+        task_results = [self.build_avatar_data(character, details[character.roleId]) for character in characters]
 
         return sorted(
             list(filter(lambda x: x, task_results)),
@@ -121,14 +145,17 @@ class AvatarListPlugin(Plugin):
         base_render_data: Dict,
         avatar_datas: List[AvatarData],
         only_one_page: bool,
+        chat_id: Optional[int] = None,
     ) -> Union[Tuple[Any], List["RenderResult"], None]:
-        def render_task(start_id: int, c: List[AvatarData]):
+        render_datas = [i.to_render_data() for i in avatar_datas]
+
+        def render_task(start_id: int, c: List[Dict[str, Any]]):
             _render_data = {
                 "avatar_datas": c,  # 角色数据
                 "start_id": start_id,  # 开始序号
             }
             _render_data.update(base_render_data)
-            return self.template_service.render(
+            return self.render_cache.render(
                 "mc/avatar_list/main.jinja2",
                 _render_data,
                 viewport={"width": 1040, "height": 500},
@@ -136,12 +163,15 @@ class AvatarListPlugin(Plugin):
                 query_selector=".container",
                 file_type=FileType.PHOTO,
                 ttl=30 * 24 * 60 * 60,
+                chat_id=chat_id,
+                # 全部角色需要渲染多页，排在其他命令之后
+                priority=RenderPriority.INTERACTIVE if only_one_page else RenderPriority.BATCH,
             )
 
         if only_one_page:
-            return [await render_task(0, avatar_datas)]
+            return [await render_task(0, render_datas)]
         avatar_datas_group = [
-            avatar_datas[i : i + MAX_AVATAR_COUNT] for i in range(0, len(avatar_datas), MAX_AVATAR_COUNT)
+            render_datas[i : i + MAX_AVATAR_COUNT] for i in range(0, len(render_datas), MAX_AVATAR_COUNT)
         ]
         tasks = [render_task(i * MAX_AVATAR_COUNT, c) for i, c in enumerate(avatar_datas_group)]
         return await asyncio.gather(*tasks)
@@ -194,7 +224,7 @@ class AvatarListPlugin(Plugin):
             "has_more": len(characters.roleList) != len(avatar_datas),  # 是否显示了全部角色
         }
 
-        images = await self.avatar_list_render(base_render_data, avatar_datas, not all_avatars)
+        images = await self.avatar_list_render(base_render_data, avatar_datas, not all_avatars, message.chat_id)
         self.add_delete_message_job(notice, delay=5)
 
         for group in ArkoWrapper(images).group(10):  # 每 10 张图片分一个组
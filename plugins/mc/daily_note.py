@@ -10,7 +10,7 @@ from telegram.helpers import create_deep_linked_url
 
 from core.plugin import Plugin, handler
 from core.services.template.models import RenderResult
-from core.services.template.services import TemplateService
+from core.services.render_cache.services import RenderCacheService
 from plugins.tools.genshin import GenshinHelper
 from utils.log import logger
 from utils.uid import mask_number
@@ -27,14 +27,14 @@ class DailyNotePlugin(Plugin):
 
     def __init__(
         self,
-        template: TemplateService,
+        render_cache: RenderCacheService,
         helper: GenshinHelper,
     ):
-        self.template_service = template
+        self.render_cache = render_cache
         self.helper = helper
 
-    async def _get_daily_note(self, client: "MCClient") -> RenderResult:
-        daily_info = await client.get_mc_notes_widget(client.player_id)
+    async def _get_daily_note(self, client: "MCClient", chat_id: Optional[int] = None) -> RenderResult:
+        daily_info = await client.get_mc_notes_widget()
 
         day = datetime.now().strftime("%m-%d %H:%M") + " 星期" + "一二三四五六日"[datetime.now().weekday()]
         resin_need = daily_info.energyData.total - daily_info.energyData.cur
@@ -56,13 +56,14 @@ class DailyNotePlugin(Plugin):
             "max_train_score": max_train_score,
             "battle_pass_data": daily_info.battlePassData,
         }
-        render_result = await self.template_service.render(
+        render_result = await self.render_cache.render(
             "mc/daily_note/daily_note.jinja2",
             render_data,
             {"width": 600, "height": 530},
             query_selector=".container",
             full_page=False,
             ttl=8 * 60,
+            chat_id=chat_id,
         )
         return render_result
 
@@ -82,7 +83,7 @@ class DailyNotePlugin(Plugin):
 
         try:
             async with self.helper.genshin(user_id, player_id=uid, offset=offset) as client:
-                render_result = await self._get_daily_note(client)
+                render_result = await self._get_daily_note(client, message.chat_id)
         except DataNotPublic:
             reply_message = await message.reply_text(
                 "查询失败惹，可能是便签功能被禁用了？请尝试通过库街区获取一次便签信息后重试。"
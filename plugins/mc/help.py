@@ -3,17 +3,18 @@ from telegram.constants import ChatAction
 from telegram.ext import CallbackContext, filters
 
 from core.plugin import Plugin, handler
-from core.services.template.services import TemplateService
+from core.services.render_cache.services import RenderCacheService
 from utils.log import logger
+from utils.resource_bundle import get_asset
 
 __all__ = ("HelpPlugin",)
 
 
 class HelpPlugin(Plugin):
-    def __init__(self, template_service: TemplateService = None):
-        if template_service is None:
+    def __init__(self, render_cache: RenderCacheService = None):
+        if render_cache is None:
             raise ModuleNotFoundError
-        self.template_service = template_service
+        self.render_cache = render_cache
 
     @handler.command(command="help", block=False)
     @handler.command(command="start", filters=filters.Regex("inline_message$"), block=False)
@@ -21,11 +22,15 @@ class HelpPlugin(Plugin):
         message = update.effective_message
         self.log_user(update, logger.info, "发出help命令")
         await message.reply_chat_action(ChatAction.TYPING)
-        render_result = await self.template_service.render(
+        render_result = await self.render_cache.render(
             "bot/help/help.jinja2",
-            {"bot_username": self.application.bot.username},
+            {
+                "bot_username": self.application.bot.username,
+                "background": "../../" + get_asset("bot/help/background/2020021114213984258.png"),
+            },
             {"width": 1280, "height": 900},
             ttl=30 * 24 * 60 * 60,
+            chat_id=message.chat_id,
         )
         await message.reply_chat_action(ChatAction.UPLOAD_PHOTO)
         await render_result.reply_photo(message, filename="help.png")
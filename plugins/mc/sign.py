@@ -32,8 +32,8 @@ class Sign(Plugin):
 
     async def _process_auto_sign(self, user_id: int, player_id: int, offset: int, chat_id: int, method: str) -> str:
         try:
-            c = await self.genshin_helper.get_genshin_client(user_id, player_id=player_id, offset=offset)
-            player_id = c.player_id
+            async with self.genshin_helper.genshin(user_id, player_id=player_id, offset=offset) as client:
+                player_id = client.player_id
         except (PlayerNotFoundError, CookiesNotFoundError):
             return config.notice.user_not_found
         user: SignUser = await self.sign_service.get_by_user_id(user_id, player_id)
@@ -82,9 +82,9 @@ class Sign(Plugin):
         self.log_user(update, logger.info, "每日签到命令请求")
         if filters.ChatType.GROUPS.filter(message):
             self.add_delete_message_job(message)
-        client = await self.genshin_helper.get_genshin_client(user_id, player_id=uid, offset=offset)
-        await message.reply_chat_action(ChatAction.TYPING)
-        sign_text = await self.sign_system.start_sign(client)
+        async with self.genshin_helper.genshin(user_id, player_id=uid, offset=offset) as client:
+            await message.reply_chat_action(ChatAction.TYPING)
+            sign_text = await self.sign_system.start_sign(client)
         reply_message = await message.reply_text(sign_text)
         if filters.ChatType.GROUPS.filter(reply_message):
             self.add_delete_message_job(reply_message)
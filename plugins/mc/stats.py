@@ -4,10 +4,12 @@ from telegram.ext import filters
 
 from core.plugin import Plugin, handler
 from core.services.cookies.error import TooManyRequestPublicCookies
+from core.services.render_cache.services import RenderCacheService
 from core.services.template.models import RenderResult
 from core.services.template.services import TemplateService
 from plugins.tools.genshin import GenshinHelper
 from utils.log import logger
+from utils.resource_bundle import get_asset
 from utils.uid import mask_number
 
 if TYPE_CHECKING:
@@ -21,9 +23,10 @@ __all__ = ("PlayerStatsPlugins",)
 class PlayerStatsPlugins(Plugin):
     """玩家统计查询"""
 
-    def __init__(self, template: TemplateService, helper: GenshinHelper):
+    def __init__(self, template: TemplateService, helper: GenshinHelper, render_cache: RenderCacheService):
         self.template_service = template
         self.helper = helper
+        self.render_cache = render_cache
 
     @handler.command("stats", player=True, block=False)
     @handler.message(filters.Regex("^玩家统计查询(.*)"), player=True, block=False)
@@ -36,7 +39,7 @@ class PlayerStatsPlugins(Plugin):
             async with self.helper.genshin_or_public(user_id, uid=uid, offset=offset) as client:
                 client: "MCClient"
                 await client.refresh_data(client.player_id)
-                render_result = await self.render(client, uid)
+                render_result = await self.render(client, uid, message.chat_id)
         except TooManyRequestPublicCookies:
             await message.reply_text("用户查询次数过多 请稍后重试")
             return
@@ -52,7 +55,9 @@ class PlayerStatsPlugins(Plugin):
         await message.reply_chat_action(ChatAction.UPLOAD_PHOTO)
         await render_result.reply_photo(message, filename=f"{client.player_id}.png")
 
-    async def render(self, client: "MCClient", uid: Optional[int] = None) -> RenderResult:
+    async def render(
+        self, client: "MCClient", uid: Optional[int] = None, chat_id: Optional[int] = None
+    ) -> RenderResult:
         if uid is None:
             uid = client.player_id
 
@@ -74,11 +79,13 @@ class PlayerStatsPlugins(Plugin):
             ],
             "area": explor.exploreList[0].areaInfoList,
             "style": "huanglong",  # nosec
+            "background": "../../" + get_asset("mc/stats/background/liyue.png"),
         }
 
-        return await self.template_service.render(
+        return await self.render_cache.render(
             "mc/stats/stats.jinja2",
             data,
             {"width": 650, "height": 800},
             full_page=True,
+            chat_id=chat_id,
         )
@@ -1,6 +1,7 @@
+import asyncio
 from datetime import datetime
-from io import BytesIO
-from typing import Optional, TYPE_CHECKING, List, Union, Tuple, Dict
+from tempfile import SpooledTemporaryFile
+from typing import IO, Optional, TYPE_CHECKING, List, Union, Tuple, Dict
 
 from kuronet import Game, Region
 from kuronet.models.mc.wish import MCBannerType
@@ -21,17 +22,19 @@ from telegram.ext import CallbackContext, ConversationHandler, filters
 from telegram.helpers import create_deep_linked_url
 
 from core.dependence.assets import AssetsService
+from core.dependence.database import Database
 from core.plugin import Plugin, conversation, handler
 from core.services.cookies import CookiesService
 from core.services.players import PlayersService
 from core.services.players.services import PlayerInfoService
+from core.services.render_cache.services import RenderCacheService
 from core.services.template.models import FileType
 from core.services.template.services import TemplateService
 from gram_core.basemodel import RegionEnum
 from gram_core.config import config
 from gram_core.services.gacha_log_rank.services import GachaLogRankService
 from core.services.players.models import PlayersDataBase as Player, PlayerInfoSQLModel
-from modules.gacha_log.const import UIMF_VERSION, GACHA_TYPE_LIST_REVERSE
+from modules.gacha_log.const import UIMF_VERSION, GACHA_TYPE_LIST, GACHA_TYPE_LIST_REVERSE
 from modules.gacha_log.error import (
     GachaLogAccountNotFound,
     GachaLogAuthkeyTimeout,
@@ -44,16 +47,11 @@ from modules.gacha_log.error import (
 from modules.gacha_log.helpers import from_url_get_authkey, from_url_get_player_id
 from modules.gacha_log.log import GachaLog
 from modules.gacha_log.migrate import GachaLogMigrate
-from modules.gacha_log.models import GachaLogInfo
+from modules.gacha_log.models import GachaLogSummary
+from modules.wish.simulation import CHARACTER_BANNER, WEAPON_BANNER, PullSimulator, parse_simulate_args
 from plugins.tools.genshin import PlayerNotFoundError
 from utils.log import logger
-
-try:
-    import ujson as jsonlib
-
-except ImportError:
-    import json as jsonlib
-
+from utils.resource_bundle import get_asset
 
 if TYPE_CHECKING:
     from telegram import Update, Message, User, Document
@@ -63,6 +61,7 @@ if TYPE_CHECKING:
 INPUT_URL, INPUT_FILE, CONFIRM_DELETE = range(10100, 10103)
 WAITING = f"小{config.notice.bot_name}正在从服务器获取数据，请稍后"
 WISHLOG_NOT_FOUND = f"{config.notice.bot_name}没有找到你的唤取记录，快来私聊{config.notice.bot_name}导入吧~"
+MAX_SIMULATE_COPIES = 7
 WISHLOG_WEB = """<b>唤取记录详细信息查询</b>
 
 已为您创建一枚令牌，点击下方按钮可直接进行查询。
@@ -78,6 +77,7 @@ class WishLogPlugin(Plugin.Conversation):
         f"> 你还可以向凌阳发送从其他工具导出的 UIMF {UIMF_VERSION} 标准的记录文件\n"
         "<b>注意：导入的数据将会与旧数据进行合并。</b>"
     )
+    FULL_REFRESH_ARGS = ("全量", "full")
 
     def __init__(
         self,
@@ -87,14 +87,37 @@ class WishLogPlugin(Plugin.Conversation):
         cookie_service: CookiesService,
         player_info_service: PlayerInfoService = None,
         gacha_log_rank: GachaLogRankService = None,
+        database: Database = None,
+        render_cache: RenderCacheService = None,
     ):
         self.template_service = template_service
+        self.render_cache = render_cache
         self.players_service = players_service
         self.player_info_service = player_info_service
         self.assets_service = assets
         self.cookie_service = cookie_service
-        self.gacha_log = GachaLog(gacha_log_rank_service=gacha_log_rank)
+        self.gacha_log = GachaLog(gacha_log_rank_service=gacha_log_rank, database=database)
+        if self.render_cache is not None:
+            self.gacha_log.add_save_hook(self.invalidate_render_cache)
         self.wish_photo = None
+        self.character_simulator = PullSimulator(CHARACTER_BANNER)
+        self.weapon_simulator = PullSimulator(WEAPON_BANNER)
+
+    @staticmethod
+    def get_render_cache_tag(user_id: Union[int, str], player_id: Union[int, str]) -> str:
+        return f"gacha_log:{user_id}:{player_id}"
+
+    async def invalidate_render_cache(self, user_id: str, player_id: str):
+        await self.render_cache.invalidate(self.get_render_cache_tag(user_id, player_id))
+
+    async def render(
+        self, user_id: int, player_id: int, template_name: str, data: Dict, chat_id: Optional[int] = None, **kwargs
+    ) -> "RenderResult":
+        """渲染抽卡记录相关的图片，相同的数据直接返回缓存的 file_id，抽卡记录更新时清除缓存"""
+        if self.render_cache is None:
+            return await self.template_service.render(template_name, data, **kwargs)
+        tags = [self.get_render_cache_tag(user_id, player_id)]
+        return await self.render_cache.render(template_name, data, tags=tags, chat_id=chat_id, **kwargs)
 
     async def get_player_id(self, user_id: int, player_id: Optional[int], offset: Optional[int]) -> int:
         """获取绑定的游戏ID"""
@@ -146,11 +169,15 @@ class WishLogPlugin(Plugin.Conversation):
         authkey: str = None,
         verify_uid: bool = True,
         player_id: int = 0,
+        file: IO[bytes] = None,
+        incremental: bool = True,
     ) -> str:
         """刷新用户数据
         :param user: 用户
         :param data: 数据
         :param authkey: 认证密钥
+        :param file: UIGF 文件
+        :param incremental: 使用认证密钥时是否增量更新，为 False 时重新获取全部记录
         :return: 返回信息
         """
         try:
@@ -166,13 +193,16 @@ class WishLogPlugin(Plugin.Conversation):
                 if not _player_id:
                     raise e
             if authkey:
-                new_num = await self.gacha_log.get_gacha_log_data(user.id, _player_id, authkey)
+                new_num = await self.gacha_log.get_gacha_log_data(user.id, _player_id, authkey, incremental=incremental)
                 if need_add_user:
                     await self.add_player(user.id, player_id)
                 return "更新完成，本次没有新增数据" if new_num == 0 else f"更新完成，本次共新增{new_num}条唤取记录"
             if data:
                 new_num = await self.gacha_log.import_gacha_log_data(user.id, _player_id, data, verify_uid)
                 return "更新完成，本次没有新增数据" if new_num == 0 else f"更新完成，本次共新增{new_num}条唤取记录"
+            if file:
+                new_num = await self.gacha_log.import_gacha_log_file(user.id, _player_id, file, verify_uid)
+                return "更新完成，本次没有新增数据" if new_num == 0 else f"更新完成，本次共新增{new_num}条唤取记录"
         except GachaLogNotFound:
             return WISHLOG_NOT_FOUND
         except GachaLogAccountNotFound:
@@ -201,50 +231,46 @@ class WishLogPlugin(Plugin.Conversation):
         if document.file_size > 5 * 1024 * 1024:
             await message.reply_text("文件过大，请发送小于 5 MB 的文件")
             return
-        try:
-            out = BytesIO()
-            await (await document.get_file()).download_to_memory(out=out)
-            if file_type == "json":
-                # bytesio to json
-                data = jsonlib.loads(out.getvalue().decode("utf-8"))
-            else:
-                await message.reply_text("文件解析失败，请检查文件")
+        # 文件先写入临时文件，导入时流式解析，避免整个文件与解析结果同时驻留内存
+        with SpooledTemporaryFile(max_size=512 * 1024) as out:
+            try:
+                await (await document.get_file()).download_to_memory(out=out)
+                out.seek(0)
+            except Exception as exc:
+                logger.error("文件下载失败 %s", repr(exc))
+                await message.reply_text("文件下载失败，请重新发送文件")
                 return
-        except GachaLogFileError:
-            await message.reply_text("文件解析失败，请检查文件是否符合 UIMF 标准")
-            return
-        except (KeyError, IndexError, ValueError):
-            await message.reply_text("文件解析失败，请检查文件编码是否正确或符合 UIMF 标准")
-            return
-        except Exception as exc:
-            logger.error("文件解析失败 %s", repr(exc))
-            await message.reply_text("文件解析失败，请检查文件是否符合 UIMF 标准")
-            return
-        await message.reply_chat_action(ChatAction.TYPING)
-        reply = await message.reply_text("文件解析成功，正在导入数据")
-        await message.reply_chat_action(ChatAction.TYPING)
-        try:
-            text = await self._refresh_user_data(user, data=data, verify_uid=file_type == "json")
-        except Exception as exc:  # pylint: disable=W0703
-            logger.error("文件解析失败 %s", repr(exc))
-            text = "文件解析失败，请检查文件是否符合 UIMF 标准"
+            await message.reply_chat_action(ChatAction.TYPING)
+            reply = await message.reply_text("文件接收成功，正在导入数据")
+            await message.reply_chat_action(ChatAction.TYPING)
+            try:
+                text = await self._refresh_user_data(user, file=out, verify_uid=file_type == "json")
+            except Exception as exc:  # pylint: disable=W0703
+                logger.error("文件解析失败 %s", repr(exc))
+                text = "文件解析失败，请检查文件是否符合 UIMF 标准"
         await reply.edit_text(text)
 
     @conversation.entry_point
     @handler.command(command="summon_log_import", filters=filters.ChatType.PRIVATE, block=False)
     @handler.message(filters=filters.Regex("^导入唤取记录(.*)") & filters.ChatType.PRIVATE, block=False)
     @handler.command(command="start", filters=filters.Regex("summon_log_import$"), block=False)
-    async def command_start(self, update: "Update", _: "ContextTypes.DEFAULT_TYPE") -> int:
+    async def command_start(self, update: "Update", context: "ContextTypes.DEFAULT_TYPE") -> int:
         message = update.effective_message
         user = update.effective_user
-        logger.info("用户 %s[%s] 导入唤取记录命令请求", user.full_name, user.id)
+        # 带上 全量/full 参数时不在已有记录处停止，重新获取全部记录以补全缺失的数据
+        full_refresh = any(i.strip() in self.FULL_REFRESH_ARGS for i in self.get_args(context))
+        context.chat_data["summon_log_full_refresh"] = full_refresh
+        logger.info("用户 %s[%s] 导入唤取记录命令请求 full_refresh[%s]", user.full_name, user.id, full_refresh)
         keyboard = ReplyKeyboardMarkup([["退出"]], one_time_keyboard=True)
-        await message.reply_text(self.IMPORT_HINT, parse_mode="html", reply_markup=keyboard)
+        text = self.IMPORT_HINT
+        if full_refresh:
+            text += "\n<b>本次将重新获取全部唤取记录，耗时较长。</b>"
+        await message.reply_text(text, parse_mode="html", reply_markup=keyboard)
         return INPUT_URL
 
     @conversation.state(state=INPUT_URL)
     @handler.message(filters=~filters.COMMAND, block=False)
-    async def import_data_from_message(self, update: Update, _: CallbackContext) -> int:
+    async def import_data_from_message(self, update: Update, context: CallbackContext) -> int:
         message = update.effective_message
         user = update.effective_user
         if message.document:
@@ -253,6 +279,7 @@ class WishLogPlugin(Plugin.Conversation):
         if not message.text:
             await message.reply_text("请发送文件或链接")
             return INPUT_URL
+        full_refresh = context.chat_data.pop("summon_log_full_refresh", False)
         if message.text == "退出":
             await message.reply_text("取消导入抽卡记录", reply_markup=ReplyKeyboardRemove())
             return ConversationHandler.END
@@ -261,7 +288,7 @@ class WishLogPlugin(Plugin.Conversation):
             player_id = from_url_get_player_id(message.text)
         reply = await message.reply_text(WAITING, reply_markup=ReplyKeyboardRemove())
         await message.reply_chat_action(ChatAction.TYPING)
-        text = await self._refresh_user_data(user, authkey=authkey, player_id=player_id)
+        text = await self._refresh_user_data(user, authkey=authkey, player_id=player_id, incremental=not full_refresh)
         try:
             await reply.delete()
         except BadRequest:
@@ -363,30 +390,32 @@ class WishLogPlugin(Plugin.Conversation):
             await message.reply_text(config.notice.user_not_found)
 
     async def rander_wish_log_analysis(
-        self, user_id: int, player_id: int, pool_type: MCBannerType
+        self, user_id: int, player_id: int, pool_type: MCBannerType, chat_id: Optional[int] = None
     ) -> Union[str, "RenderResult"]:
         data = await self.gacha_log.get_analysis(user_id, player_id, pool_type, self.assets_service)
         if isinstance(data, str):
             return data
         await self.add_theme_data(data, player_id)
-        png_data = await self.template_service.render(
+        png_data = await self.render(
+            user_id,
+            player_id,
             "mc/gacha_log/gacha_log.html",
             data,
             full_page=True,
-            file_type=FileType.DOCUMENT if len(data.get("fiveLog")) > 300 else FileType.PHOTO,
             query_selector=".body_box",
+            chat_id=chat_id,
         )
         return png_data
 
     @staticmethod
-    def gen_button(user_id: int, uid: int, info: "GachaLogInfo") -> List[List[InlineKeyboardButton]]:
+    def gen_button(user_id: int, uid: int, info: "GachaLogSummary") -> List[List[InlineKeyboardButton]]:
         buttons = []
         pools = []
         skip_pools = []
-        for k, v in info.item_list.items():
+        for k, v in info.pools.items():
             if k in skip_pools:
                 continue
-            if not v:
+            if not v.total:
                 continue
             pools.append(k)
         # 2 个一组
@@ -406,10 +435,10 @@ class WishLogPlugin(Plugin.Conversation):
 
     async def wish_log_pool_choose(self, user_id: int, player_id: int, message: "Message"):
         await message.reply_chat_action(ChatAction.TYPING)
-        gacha_log, status = await self.gacha_log.load_history_info(str(user_id), str(player_id))
-        if not status:
+        summary = await self.gacha_log.get_summary(str(user_id), str(player_id))
+        if summary is None:
             raise GachaLogNotFound
-        buttons = self.gen_button(user_id, player_id, gacha_log)
+        buttons = self.gen_button(user_id, player_id, summary)
         if isinstance(self.wish_photo, str):
             photo = self.wish_photo
         else:
@@ -427,7 +456,7 @@ class WishLogPlugin(Plugin.Conversation):
         self, user_id: int, uid: int, pool_type: "MCBannerType", message: "Message", bot_username: str
     ):
         await message.reply_chat_action(ChatAction.TYPING)
-        png_data = await self.rander_wish_log_analysis(user_id, uid, pool_type)
+        png_data = await self.rander_wish_log_analysis(user_id, uid, pool_type, message.chat_id)
         if isinstance(png_data, str):
             reply = await message.reply_text(png_data)
             if filters.ChatType.GROUPS.filter(message):
@@ -525,7 +554,7 @@ class WishLogPlugin(Plugin.Conversation):
         pool_type = GACHA_TYPE_LIST_REVERSE.get(pool)
         await message.reply_chat_action(ChatAction.TYPING)
         try:
-            png_data = await self.rander_wish_log_analysis(user_id, uid, pool_type)
+            png_data = await self.rander_wish_log_analysis(user_id, uid, pool_type, message.chat_id)
         except GachaLogNotFound:
             png_data = "未找到抽卡记录"
         if isinstance(png_data, str):
@@ -574,15 +603,18 @@ class WishLogPlugin(Plugin.Conversation):
                 document = True
                 png_data["hasMore"] = False
             await message.reply_chat_action(ChatAction.UPLOAD_DOCUMENT if document else ChatAction.UPLOAD_PHOTO)
-            png = await self.template_service.render(
+            png = await self.render(
+                user_id,
+                uid,
                 "mc/gacha_count/gacha_count.html",
                 png_data,
                 full_page=True,
                 query_selector=".body_box",
                 file_type=FileType.DOCUMENT if document else FileType.PHOTO,
+                chat_id=message.chat_id,
             )
             await message.reply_chat_action(ChatAction.UPLOAD_PHOTO)
-            if document:
+            if png.file_type == FileType.DOCUMENT:
                 await png.reply_document(
                     message,
                     filename="抽卡统计.png",
@@ -594,7 +626,7 @@ class WishLogPlugin(Plugin.Conversation):
 
     async def add_theme_data(self, data: Dict, _: int):
         data["avatar"] = self.assets_service.avatar.normal(1501).as_uri()
-        data["background"] = "../gacha_log/img/mc.png"
+        data["background"] = "../../" + get_asset("mc/gacha_log/img/mc.png")
         return data
 
     @handler.command(command="summon_log_online_view", block=False)
@@ -622,6 +654,68 @@ class WishLogPlugin(Plugin.Conversation):
             logger.error("申请在线查看唤取记录失败", exc_info=e)
             await message.reply_text("申请在线查看唤取记录失败，请联系管理员")
 
+    def get_simulation_text(self, summary: "GachaLogSummary", pool_type: "MCBannerType", copies: int) -> str:
+        """根据当前保底情况模拟获得 UP 五星所需的抽数
+        :param summary: 抽卡记录统计
+        :param pool_type: 卡池类型
+        :param copies: UP 五星个数
+        :return: 模拟结果
+        """
+        pool_name = GACHA_TYPE_LIST[pool_type]
+        data = summary.pools.get(pool_name)
+        pity = data.no_five_star if data else 0
+        if pool_type == MCBannerType.WEAPON:
+            simulator, guaranteed = self.weapon_simulator, False
+            guarantee_text = ""
+        else:
+            simulator = self.character_simulator
+            # 最近一次五星不是 UP 时为大保底
+            guaranteed = bool(data and data.five and not data.five[0].isUp)
+            guarantee_text = "，当前为大保底" if guaranteed else "，当前为小保底"
+        result = simulator.run(copies, pity, guaranteed)
+        percentiles = "\n".join(f"{p}% 的概率在 {v} 抽内获得" for p, v in result.percentiles.items() if p >= 25)
+        return (
+            f"{pool_name}已垫 {pity} 抽{guarantee_text}\n"
+            f"获得 {copies} 个 UP 五星平均需要 {result.mean:.1f} 抽\n"
+            f"{percentiles}\n"
+            f"最少 {result.min} 抽，最多 {result.max} 抽（模拟 {result.samples} 次）"
+        )
+
+    @handler.command(command="summon_simulate", block=False)
+    @handler.message(filters=filters.Regex(r"^唤取模拟(角色|武器)?\s*(\d+)?$"), block=False)
+    async def command_start_simulate(self, update: "Update", context: "ContextTypes.DEFAULT_TYPE") -> None:
+        user_id = await self.get_real_user_id(update)
+        uid, offset = self.get_real_uid_or_offset(update)
+        message = update.effective_message
+        # 正则触发时 get_args 只返回第一个分组，直接解析消息内容
+        weapon, copies = parse_simulate_args(message.text or "", MAX_SIMULATE_COPIES)
+        pool_type = MCBannerType.WEAPON if weapon else MCBannerType.CHARACTER
+        self.log_user(update, logger.info, "唤取模拟命令请求 || 卡池 %s 个数 %s", pool_type.name, copies)
+        try:
+            player_id = await self.get_player_id(user_id, uid, offset)
+            summary = await self.gacha_log.get_summary(str(user_id), str(player_id))
+            if summary is None:
+                raise GachaLogNotFound
+        except GachaLogNotFound:
+            self.log_user(update, logger.info, "未找到唤取记录")
+            buttons = [
+                [
+                    InlineKeyboardButton(
+                        "点我导入", url=create_deep_linked_url(context.bot.username, "summon_log_import")
+                    )
+                ]
+            ]
+            await message.reply_text(WISHLOG_NOT_FOUND, reply_markup=InlineKeyboardMarkup(buttons))
+            return
+        await message.reply_chat_action(ChatAction.TYPING)
+        text = await asyncio.get_running_loop().run_in_executor(
+            None, self.get_simulation_text, summary, pool_type, copies
+        )
+        reply = await message.reply_text(text)
+        if filters.ChatType.GROUPS.filter(message):
+            self.add_delete_message_job(reply)
+            self.add_delete_message_job(message)
+
     @handler.command(command="summon_log_rank_recount", block=False, admin=True)
     async def wish_log_rank_recount(self, update: "Update", _: "ContextTypes.DEFAULT_TYPE") -> None:
         user = update.effective_user
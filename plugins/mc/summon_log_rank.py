@@ -8,6 +8,7 @@ from telegram.ext import filters
 
 from core.dependence.assets import AssetsService
 from core.plugin import Plugin, handler
+from core.services.render_cache.services import RenderCacheService
 from core.services.template.models import FileType
 from core.services.template.services import TemplateService
 from gram_core.config import config
@@ -69,9 +70,11 @@ class WishLogRankPlugin(Plugin):
         redis: RedisDB = None,
         player_info: PlayerInfoSystem = None,
         gacha_log_rank_service: GachaLogRankService = None,
+        render_cache: RenderCacheService = None,
     ) -> None:
         self.assets_service = assets_service
         self.template_service = template_service
+        self.render_cache = render_cache
         self.player_service = player_service
         self.redis = redis.client
         self.player_info = player_info
@@ -301,7 +304,7 @@ class WishLogRankPlugin(Plugin):
             await callback_query.answer(text="正在渲染图片中 请稍等 请不要重复点击按钮", show_alert=False)
         except BadRequest:
             pass
-        png_data = await self.template_service.render(
+        png_data = await self.render_cache.render(
             "genshin/wish_log_rank/rank.jinja2",
             render_data,
             viewport={"width": 1040, "height": 500},
@@ -309,6 +312,7 @@ class WishLogRankPlugin(Plugin):
             query_selector=".container",
             file_type=FileType.PHOTO,
             ttl=1 * 60 * 60,
+            chat_id=message.chat_id,
         )
         await png_data.edit_media(message)
 
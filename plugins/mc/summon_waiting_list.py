@@ -11,14 +11,15 @@ from telegram.constants import ChatAction
 from telegram.ext import filters
 
 from core.dependence.assets import AssetsService, AssetsCouldNotFound
+from core.services.render_cache.services import RenderCacheService
 from gram_core.config import config
 from gram_core.plugin import Plugin, handler
 from gram_core.plugin.methods.inline_use_data import IInlineUseData
-from gram_core.services.template.services import TemplateService
 
 from metadata.pool.pool import POOL_1 as CHARACTER_POOL, POOL_2 as WEAPON_POOL
 from plugins.tools.player_info import PlayerInfoSystem
 from utils.log import logger
+from utils.resource_bundle import get_asset
 
 if TYPE_CHECKING:
     from telegram import Update
@@ -48,11 +49,11 @@ class WishWaitingListPlugin(Plugin):
     def __init__(
         self,
         assets: AssetsService,
-        template_service: TemplateService,
+        render_cache: RenderCacheService,
         player_info: PlayerInfoSystem,
     ):
         self.assets_service = assets
-        self.template_service = template_service
+        self.render_cache = render_cache
         self.player_info = player_info
         self.waiting_list = {}
 
@@ -151,11 +152,11 @@ class WishWaitingListPlugin(Plugin):
                 is_avatar = False
         self.log_user(update, logger.info, "查询未复刻列表 is_avatar[%s]", is_avatar)
         await message.reply_chat_action(ChatAction.TYPING)
-        image = await self.render(user_id, is_avatar)
+        image = await self.render(user_id, is_avatar, message.chat_id)
         await message.reply_chat_action(ChatAction.UPLOAD_PHOTO)
         await image.reply_photo(message, reply_markup=await self.get_wish_waiting_list_button(user_id, is_avatar))
 
-    async def render(self, user_id: int, is_avatar: bool) -> "RenderResult":
+    async def render(self, user_id: int, is_avatar: bool, chat_id: Optional[int] = None) -> "RenderResult":
         await self.init_data()
         _data = self.waiting_list["avatar" if is_avatar else "weapon"]
         data = {
@@ -163,13 +164,14 @@ class WishWaitingListPlugin(Plugin):
             "fiveData": _data[0],
             "fourLog": _data[3],
             "fourData": _data[2],
-            "background": "../gacha_log/img/mc.png",
+            "background": "../../" + get_asset("mc/gacha_log/img/mc.png"),
         }
-        return await self.template_service.render(
+        return await self.render_cache.render(
             "mc/gacha_log/wish_waiting_list.jinja2",
             data,
             full_page=True,
             query_selector=".body_box",
+            chat_id=chat_id,
         )
 
     @staticmethod
@@ -226,7 +228,8 @@ class WishWaitingListPlugin(Plugin):
         user = callback_query.from_user
         user_id = user.id
 
-        image = await self.render(user_id, is_avatar)
+        chat_id = update.effective_chat.id if update.effective_chat else None
+        image = await self.render(user_id, is_avatar, chat_id)
         reply_markup = await self.get_wish_waiting_list_button(user_id, is_avatar)
         if callback_query.message:
             await image.edit_media(callback_query.message, reply_markup=reply_markup)
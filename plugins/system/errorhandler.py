@@ -26,6 +26,7 @@ from telegram.helpers import create_deep_linked_url
 
 from core.config import config
 from core.plugin import Plugin, error_handler
+from core.services.render_cache.queue import RenderQueueFull
 from gram_core.services.cookies.error import CookieServiceError as TooManyRequestPublicCookies
 from gram_core.services.players.error import PlayerNotFoundError
 from modules.apihelper.error import APIHelperException, APIHelperTimedOut, ResponseException, ReturnCodeError
@@ -290,6 +291,15 @@ class ErrorHandler(Plugin):
             self.create_notice_task(update, context, notice)
             raise ApplicationHandlerStop
 
+    @error_handler()
+    async def process_render_queue_full(self, update: object, context: CallbackContext):
+        if not isinstance(context.error, RenderQueueFull) or not isinstance(update, Update):
+            return
+        notice = self.ERROR_MSG_PREFIX + " 渲染任务太多啦 ~ 请稍后再试"
+        logger.warning("渲染队列已满")
+        self.create_notice_task(update, context, notice)
+        raise ApplicationHandlerStop
+
     @error_handler(block=False)
     async def process_z_error(self, update: object, context: CallbackContext) -> None:
         # 必须 `process_` 加上 `z` 保证该函数最后一个注册
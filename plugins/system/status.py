@@ -12,6 +12,7 @@ from git import Repo
 from git.exc import GitCommandError, InvalidGitRepositoryError, NoSuchPathError
 
 from core.plugin import Plugin, handler
+from core.services.render_cache.services import RenderCacheService
 from utils.log import logger
 
 if TYPE_CHECKING:
@@ -39,7 +40,8 @@ class StatisticsHandler(BaseHandler):
 
 
 class Status(Plugin):
-    def __init__(self):
+    def __init__(self, render_cache: RenderCacheService = None):
+        self.render_cache = render_cache
         self.pid = os.getpid()
         self.time_form = "%m/%d %H:%M"
         self.type_handler = None
@@ -98,6 +100,13 @@ class Status(Plugin):
             f"运行时间: `{self.get_bot_uptime(start_time)}` \n"
             f"收发消息: ⬇️ {self.recv_num} ⬆️ {self.send_num} \n"
         )
+        if self.render_cache is not None:
+            metrics = self.render_cache.queue.get_metrics()
+            text += (
+                f"渲染队列: `{metrics['running']}/{metrics['queued']}` "
+                f"等待: `{metrics['avg_wait']:.2f}s/{metrics['max_wait']:.2f}s` "
+                f"拒绝: `{metrics['rejected']}` \n"
+            )
         await message.reply_markdown_v2(text)
 
     def get_bot_uptime(self, start_time: float) -> str:
@@ -1,18 +1,35 @@
+import asyncio
 import base64
+import time
 from datetime import datetime, timedelta
-from typing import TYPE_CHECKING, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
 
-from pydantic import field_validator, BaseModel
+from pydantic import BaseModel
+from kuronet import Game
 from kuronet.errors import BadRequest as SimnetBadRequest, InvalidCookies, TimedOut as SimnetTimedOut
+from kuronet.utils.player import recognize_region
 from sqlalchemy.orm.exc import StaleDataError
 from telegram.constants import ParseMode
 from telegram.error import BadRequest, Forbidden
 
+from core.dependence.database import Database
 from core.plugin import Plugin
+from core.services.task.batch import update_batch
 from core.services.task.models import Task as TaskUser, TaskStatusEnum
 from core.services.task.services import TaskResinServices, TaskDailyServices
+from gram_core.basemodel import Settings, SettingsConfigDict
 from gram_core.plugin.methods.migrate_data import IMigrateData, MigrateDataException
+from modules.daily_note.schedule import (
+    DailyData,
+    NoteScheduler,
+    NoteSnapshot,
+    ResinData,
+    TaskDataBase,
+    need_request,
+    next_request_time,
+)
 from plugins.tools.genshin import GenshinHelper, PlayerNotFoundError, CookiesNotFoundError
+from utils.limiter import KeyedTokenBucket, TokenBucket
 from utils.log import logger
 
 if TYPE_CHECKING:
@@ -22,30 +39,26 @@ if TYPE_CHECKING:
     from gram_core.services.task.services import TaskServices
 
 
-class TaskDataBase(BaseModel):
-    noticed: Optional[bool] = False
+NotesResult = Union[str, List[Optional[str]]]
 
 
-class ResinData(TaskDataBase):
-    notice_num: Optional[int] = 140
-
-    @field_validator("notice_num")
-    @classmethod
-    def notice_num_validator(cls, v):
-        if v < 100 or v > 240:
-            raise ValueError("开拓力提醒数值必须在 100 ~ 240 之间")
-        return v
+class NotesJobConfig(Settings):
+    """自动便签提醒任务配置"""
 
+    workers: int = 8
+    """同时请求便签的协程数"""
+    region_rate: float = 5.0
+    """每个服务器每秒最多发起的便签请求数"""
+    message_rate: float = 20.0
+    """每秒最多发送的消息数"""
+    batch_size: int = 100
+    """每次写入数据库的用户数"""
+    max_skip_minutes: int = 120
+    """上次请求超过该时间后，即使预计不会触发提醒也重新请求"""
+    retry_minutes: int = 20
+    """结晶波片已提醒或请求失败后再次请求的间隔"""
 
-class DailyData(TaskDataBase):
-    notice_hour: Optional[int] = 22
-
-    @field_validator("notice_hour")
-    @classmethod
-    def notice_hour_validator(cls, v):
-        if v < 0 or v > 23:
-            raise ValueError("每日任务提醒时间必须在 0 ~ 23 之间")
-        return v
+    model_config = SettingsConfigDict(env_prefix="notes_job_")
 
 
 class WebAppData(BaseModel):
@@ -110,6 +123,31 @@ class DailyNoteTaskUser:
             ).encode()
         ).decode()
 
+    @property
+    def notice_settings(self) -> Tuple[Optional[ResinData], Optional[DailyData]]:
+        """仍在数据库中的提醒设置"""
+        return self.resin if self.resin_db else None, self.daily if self.daily_db else None
+
+    def need_request(self, snapshot: Optional[NoteSnapshot], now: datetime, max_skip: timedelta) -> bool:
+        """判断本次是否需要请求便签，参见 need_request"""
+        return need_request(*self.notice_settings, snapshot, now, max_skip)
+
+    def next_request_time(
+        self, snapshot: Optional[NoteSnapshot], now: datetime, max_skip: timedelta, retry: timedelta
+    ) -> datetime:
+        """计算下次需要请求便签的时间，参见 next_request_time"""
+        return next_request_time(*self.notice_settings, snapshot, now, max_skip, retry)
+
+    def reset_daily_noticed(self, now: datetime) -> bool:
+        """不在每日任务提醒时间时重置提醒状态，与 get_daily_notice 一致
+        :return: 数据是否发生变化
+        """
+        if self.daily_db and self.daily.noticed and now.hour != self.daily.notice_hour:
+            self.daily.noticed = False
+            self.save()
+            return True
+        return False
+
     def save(self):
         if self.resin_db:
             self.resin_db.data = self.resin.dict()
@@ -123,10 +161,14 @@ class DailyNoteSystem(Plugin):
         genshin_helper: GenshinHelper,
         resin_service: TaskResinServices,
         daily_service: TaskDailyServices,
+        database: Database = None,
     ):
         self.genshin_helper = genshin_helper
         self.resin_service = resin_service
         self.daily_service = daily_service
+        self.database = database
+        self.note_snapshots: Dict[Tuple[int, int], NoteSnapshot] = {}
+        self.scheduler = NoteScheduler()
 
     async def get_single_task_user(self, user_id: int, player_id: int) -> DailyNoteTaskUser:
         resin_db = await self.resin_service.get_by_user_id(user_id, player_id)
@@ -174,6 +216,15 @@ class DailyNoteSystem(Plugin):
                 user.daily.noticed = False
         return notice
 
+    @staticmethod
+    def get_notices(user: DailyNoteTaskUser, notes: "MCNoteWidget") -> List[Optional[str]]:
+        notices = [
+            DailyNoteSystem.get_resin_notice(user, notes),
+            DailyNoteSystem.get_daily_notice(user, notes),
+        ]
+        user.save()
+        return notices
+
     @staticmethod
     async def start_get_notes(
         client: "MCClient",
@@ -182,27 +233,21 @@ class DailyNoteSystem(Plugin):
         notes = await client.get_mc_notes_widget()
         if not user:
             return []
-        notices = [
-            DailyNoteSystem.get_resin_notice(user, notes),
-            DailyNoteSystem.get_daily_notice(user, notes),
-        ]
-        user.save()
-        return notices
+        return DailyNoteSystem.get_notices(user, notes)
 
     async def get_all_task_users(self) -> List[DailyNoteTaskUser]:
         resin_list = await self.resin_service.get_all()
         daily_list = await self.daily_service.get_all()
-        user_list = set()
-        for i in resin_list + daily_list:
-            user_list.add((i.user_id, i.player_id))
+        resin_map = {(i.user_id, i.player_id): i for i in resin_list}
+        daily_map = {(i.user_id, i.player_id): i for i in daily_list}
         return [
             DailyNoteTaskUser(
-                user_id=i,
-                player_id=p,
-                resin_db=next((x for x in resin_list if x.user_id == i and x.player_id == p), None),
-                daily_db=next((x for x in daily_list if x.user_id == i and x.player_id == p), None),
+                user_id=user_id,
+                player_id=player_id,
+                resin_db=resin_map.get((user_id, player_id)),
+                daily_db=daily_map.get((user_id, player_id)),
             )
-            for i, p in user_list
+            for user_id, player_id in dict.fromkeys([*resin_map, *daily_map])
         ]
 
     async def remove_task_user(self, user: DailyNoteTaskUser):
@@ -223,6 +268,24 @@ class DailyNoteSystem(Plugin):
             except StaleDataError:
                 logger.warning("用户 user_id[%s] 自动便签提醒 - 每日任务数据过期，跳过更新数据", user.user_id)
 
+    async def update_task_user_batch(self, user_list: List[DailyNoteTaskUser]):
+        """批量写入提醒数据，已过期的数据跳过，不影响其余数据"""
+        if not user_list:
+            return
+        if self.database is None:
+            for user in user_list:
+                await self.update_task_user(user)
+            return
+        rows = [(user, i) for user in user_list for i in (user.resin_db, user.daily_db) if i is not None]
+        for index in await update_batch(self.database.engine, [i for _, i in rows]):
+            user, row = rows[index]
+            if row is user.resin_db:
+                user.resin_db = None
+                logger.warning("用户 user_id[%s] 自动便签提醒 - 结晶波片数据过期，跳过更新数据", user.user_id)
+            else:
+                user.daily_db = None
+                logger.warning("用户 user_id[%s] 自动便签提醒 - 每日任务数据过期，跳过更新数据", user.user_id)
+
     @staticmethod
     async def check_need_note(web_config: WebAppData) -> bool:
         need_verify = False
@@ -284,67 +347,170 @@ class DailyNoteSystem(Plugin):
             await self.import_web_config_daily(user, web_config)
         user.save()
         await self.update_task_user(user)
+        # 提醒设置发生变化，下次任务时重新请求
+        self.scheduler.remove((user_id, player_id))
+
+    async def get_one_notes(self, task_db: DailyNoteTaskUser) -> Optional[NotesResult]:
+        """为一个用户请求便签并更新状态
+        :return: 需要发送的提醒，用户已被移除或请求超时时返回 None
+        """
+        user_id = task_db.user_id
+        player_id = task_db.player_id
+        logger.debug("自动便签提醒 - 请求便签信息 user_id[%s] player_id[%s]", user_id, player_id)
+        try:
+            async with self.genshin_helper.genshin(user_id, player_id=player_id) as client:
+                notes = await client.get_mc_notes_widget()
+        except InvalidCookies:
+            text = "自动便签提醒执行失败，Cookie无效"
+            task_db.status = TaskStatusEnum.INVALID_COOKIES
+        except SimnetBadRequest as exc:
+            text = f"自动便签提醒执行失败，API返回信息为 {str(exc)}"
+            task_db.status = TaskStatusEnum.GENSHIN_EXCEPTION
+        except SimnetTimedOut:
+            logger.info("用户 user_id[%s] 请求便签超时", user_id)
+            return None
+        except PlayerNotFoundError:
+            logger.info("用户 user_id[%s] 玩家不存在 关闭并移除自动便签提醒", user_id)
+            await self.remove_task_user(task_db)
+            return None
+        except CookiesNotFoundError:
+            logger.info("用户 user_id[%s] cookie 不存在 关闭并移除自动便签提醒", user_id)
+            await self.remove_task_user(task_db)
+            return None
+        except Exception as exc:
+            logger.error("执行自动便签提醒时发生错误 user_id[%s]", user_id, exc_info=exc)
+            text = "获取便签失败了呜呜呜 ~ 执行自动便签提醒时发生错误"
+        else:
+            self.note_snapshots[(user_id, player_id)] = NoteSnapshot(
+                datetime.now(), notes.current_stamina, notes.max_stamina
+            )
+            text = self.get_notices(task_db, notes)
+            task_db.status = TaskStatusEnum.STATUS_SUCCESS
+        return text
+
+    @staticmethod
+    async def send_notes_result(context: "ContextTypes.DEFAULT_TYPE", task_db: DailyNoteTaskUser, text: NotesResult):
+        """发送提醒并更新状态"""
+        user_id = task_db.user_id
+        for idx, task_user_db in enumerate([task_db.resin_db, task_db.daily_db]):
+            if task_user_db is None:
+                continue
+            notice_text = text[idx] if isinstance(text, list) else text
+            if not notice_text:
+                continue
+            if task_user_db.chat_id < 0:
+                notice_text = (
+                    f'<a href="tg://user?id={task_user_db.user_id}">'
+                    f"NOTICE {task_user_db.user_id}</a>\n\n{notice_text}"
+                )
+            try:
+                await context.bot.send_message(task_user_db.chat_id, notice_text, parse_mode=ParseMode.HTML)
+            except BadRequest as exc:
+                logger.error("执行自动便签提醒时发生错误 user_id[%s] Message[%s]", user_id, exc.message)
+                task_user_db.status = TaskStatusEnum.BAD_REQUEST
+            except Forbidden as exc:
+                logger.error("执行自动便签提醒时发生错误 user_id[%s] message[%s]", user_id, exc.message)
+                task_user_db.status = TaskStatusEnum.FORBIDDEN
+            except Exception as exc:
+                logger.error("执行自动便签提醒时发生错误 user_id[%s]", user_id, exc_info=exc)
+                continue
 
     async def do_get_notes_job(self, context: "ContextTypes.DEFAULT_TYPE"):
         include_status: List[TaskStatusEnum] = [
             TaskStatusEnum.STATUS_SUCCESS,
             TaskStatusEnum.TIMEOUT_ERROR,
         ]
+        job_config = NotesJobConfig()
+        max_skip = timedelta(minutes=job_config.max_skip_minutes)
+        retry = timedelta(minutes=job_config.retry_minutes)
+        start_time = time.monotonic()
+        now = datetime.now()
         task_list = await self.get_all_task_users()
+        # 已取消提醒的用户不再保留上次请求的数据
+        task_keys = {(i.user_id, i.player_id) for i in task_list}
+        self.note_snapshots = {k: v for k, v in self.note_snapshots.items() if k in task_keys}
+        self.scheduler.retain(task_keys)
+        self.scheduler.pop_due(now)
+        note_queue: "asyncio.Queue[DailyNoteTaskUser]" = asyncio.Queue()
+        # 提醒交给单独的发送协程，请求便签不会被 Telegram 的发送速度拖慢
+        message_queue: "asyncio.Queue[Optional[Tuple[DailyNoteTaskUser, Optional[NotesResult]]]]" = asyncio.Queue()
+        skip_count = 0
+
+        def schedule(task_db: DailyNoteTaskUser):
+            key = (task_db.user_id, task_db.player_id)
+            snapshot = self.note_snapshots.get(key)
+            self.scheduler.schedule(key, task_db.next_request_time(snapshot, datetime.now(), max_skip, retry))
+
         for task_db in task_list:
             if task_db.status not in include_status:
                 continue
-            user_id = task_db.user_id
-            player_id = task_db.player_id
-            logger.debug("自动便签提醒 - 请求便签信息 user_id[%s] player_id[%s]", user_id, player_id)
-            try:
-                async with self.genshin_helper.genshin(user_id, player_id=player_id) as client:
-                    text = await self.start_get_notes(client, task_db)
-            except InvalidCookies:
-                text = "自动便签提醒执行失败，Cookie无效"
-                task_db.status = TaskStatusEnum.INVALID_COOKIES
-            except SimnetBadRequest as exc:
-                text = f"自动便签提醒执行失败，API返回信息为 {str(exc)}"
-                task_db.status = TaskStatusEnum.GENSHIN_EXCEPTION
-            except SimnetTimedOut:
-                logger.info("用户 user_id[%s] 请求便签超时", user_id)
-                continue
-            except PlayerNotFoundError:
-                logger.info("用户 user_id[%s] 玩家不存在 关闭并移除自动便签提醒", user_id)
-                await self.remove_task_user(task_db)
+            if (task_db.user_id, task_db.player_id) in self.scheduler:
+                skip_count += 1
                 continue
-            except CookiesNotFoundError:
-                logger.info("用户 user_id[%s] cookie 不存在 关闭并移除自动便签提醒", user_id)
-                await self.remove_task_user(task_db)
+            snapshot = self.note_snapshots.get((task_db.user_id, task_db.player_id))
+            if task_db.need_request(snapshot, now, max_skip):
+                note_queue.put_nowait(task_db)
                 continue
-            except Exception as exc:
-                logger.error("执行自动便签提醒时发生错误 user_id[%s]", user_id, exc_info=exc)
-                text = "获取便签失败了呜呜呜 ~ 执行自动便签提醒时发生错误"
-            else:
-                task_db.status = TaskStatusEnum.STATUS_SUCCESS
-            for idx, task_user_db in enumerate([task_db.resin_db, task_db.daily_db]):
-                if task_user_db is None:
-                    continue
-                notice_text = text[idx] if isinstance(text, list) else text
-                if not notice_text:
-                    continue
-                if task_user_db.chat_id < 0:
-                    notice_text = (
-                        f'<a href="tg://user?id={task_user_db.user_id}">'
-                        f"NOTICE {task_user_db.user_id}</a>\n\n{notice_text}"
-                    )
+            skip_count += 1
+            if task_db.reset_daily_noticed(now):
+                message_queue.put_nowait((task_db, None))
+            schedule(task_db)
+        region_limiter = KeyedTokenBucket(job_config.region_rate)
+        message_limiter = TokenBucket(job_config.message_rate)
+
+        async def note_worker():
+            while True:
+                try:
+                    task_db = note_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
                 try:
-                    await context.bot.send_message(task_user_db.chat_id, notice_text, parse_mode=ParseMode.HTML)
-                except BadRequest as exc:
-                    logger.error("执行自动便签提醒时发生错误 user_id[%s] Message[%s]", user_id, exc.message)
-                    task_user_db.status = TaskStatusEnum.BAD_REQUEST
-                except Forbidden as exc:
-                    logger.error("执行自动便签提醒时发生错误 user_id[%s] message[%s]", user_id, exc.message)
-                    task_user_db.status = TaskStatusEnum.FORBIDDEN
-                except Exception as exc:
-                    logger.error("执行自动便签提醒时发生错误 user_id[%s]", user_id, exc_info=exc)
+                    await region_limiter.acquire(recognize_region(task_db.player_id, Game.MC))
+                    text = await self.get_one_notes(task_db)
+                except Exception as exc:  # pylint: disable=W0703
+                    logger.error("执行自动便签提醒时发生错误 user_id[%s]", task_db.user_id, exc_info=exc)
                     continue
-            await self.update_task_user(task_db)
+                finally:
+                    schedule(task_db)
+                if text is not None:
+                    await message_queue.put((task_db, text))
+
+        async def flush(pending: List[DailyNoteTaskUser]):
+            # 写入失败只影响这一批数据，不能结束发送协程，否则之后的提醒都不会被发送
+            try:
+                await self.update_task_user_batch(pending)
+            except Exception as exc:  # pylint: disable=W0703
+                logger.error("批量写入自动便签提醒数据时发生错误 共 %s 个用户", len(pending), exc_info=exc)
+
+        async def message_worker():
+            pending = []
+            while (item := await message_queue.get()) is not None:
+                task_db, text = item
+                try:
+                    if isinstance(text, str) or any(text or []):
+                        await message_limiter.acquire()
+                        await self.send_notes_result(context, task_db, text)
+                except Exception as exc:  # pylint: disable=W0703
+                    logger.error("发送自动便签提醒时发生错误 user_id[%s]", task_db.user_id, exc_info=exc)
+                pending.append(task_db)
+                if len(pending) >= job_config.batch_size:
+                    await flush(pending)
+                    pending = []
+            await flush(pending)
+
+        request_count = note_queue.qsize()
+        message_task = asyncio.create_task(message_worker())
+        try:
+            await asyncio.gather(*(note_worker() for _ in range(max(job_config.workers, 1))))
+        finally:
+            await message_queue.put(None)
+            await message_task
+        logger.info(
+            "自动便签提醒完成 请求 %s 个用户 跳过 %s 个用户 耗时 %.1f 秒",
+            request_count,
+            skip_count,
+            time.monotonic() - start_time,
+        )
 
     async def get_migrate_data(self, old_user_id: int, new_user_id: int, _) -> Optional["TaskMigrate"]:
         return await TaskMigrate.create(
@@ -1,20 +1,22 @@
 import asyncio
+import functools
+import inspect
 import random
 from contextlib import asynccontextmanager
 from datetime import datetime, time, timedelta
-from typing import Optional
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
 from typing import TYPE_CHECKING, Union
 
 from kuronet.models.mc.character import MCRole
 from kuronet.models.mc.chronicle.role import MCRoleDetail
 from kuronet.utils.player import recognize_server
-from pydantic import ValidationError
 from kuronet import MCClient, Region
 from kuronet.errors import BadRequest as SimnetBadRequest, InvalidCookies
 
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm.exc import StaleDataError
-from sqlmodel import BigInteger, Column, DateTime, Field, Index, Integer, SQLModel, String, delete, func, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlmodel import BigInteger, Column, DateTime, Field, Index, Integer, LargeBinary, SQLModel, delete, func, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from telegram.ext import ContextTypes
 
@@ -27,8 +29,12 @@ from core.services.cookies.services import CookiesService, PublicCookiesService
 from core.services.devices import DevicesService
 from core.services.players.services import PlayersService
 from core.services.users.services import UserService
+from gram_core.basemodel import Settings, SettingsConfigDict
 from gram_core.services.cookies.models import CookiesStatusEnum
+from modules.character_details.codec import decode_detail, encode_detail
+from utils.client_pool import ClientPool
 from utils.log import logger
+from utils.singleflight import SingleFlight, get_call_key
 
 if TYPE_CHECKING:
     from sqlalchemy import Table
@@ -37,19 +43,23 @@ __all__ = ("GenshinHelper", "PlayerNotFoundError", "CookiesNotFoundError", "Char
 
 
 class CharacterDetailsSQLModel(SQLModel, table=True):
-    __tablename__ = "character_details"
+    # 数据格式见 modules.character_details.codec，旧的 character_details 表不再使用
+    __tablename__ = "character_details_v2"
     __table_args__ = (
-        Index("index_player_character", "player_id", "character_id", unique=True),
+        Index("index_player_character_v2", "player_id", "character_id", unique=True),
         dict(mysql_charset="utf8mb4", mysql_collate="utf8mb4_general_ci"),
     )
     id: Optional[int] = Field(default=None, sa_column=Column(Integer, primary_key=True, autoincrement=True))
     player_id: int = Field(sa_column=Column(BigInteger()))
     character_id: int = Field(sa_column=Column(BigInteger()))
-    data: Optional[str] = Field(sa_column=Column(String(length=4096)))
+    data: Optional[bytes] = Field(sa_column=Column(LargeBinary()))
     time_updated: Optional[datetime] = Field(sa_column=Column(DateTime, onupdate=func.now()))  # pylint: disable=E1102
 
 
 class CharacterDetails(Plugin):
+    FETCH_CONCURRENCY = 8
+    """批量获取角色详细信息时同时发起的请求数"""
+
     def __init__(
         self,
         database: Database,
@@ -60,10 +70,12 @@ class CharacterDetails(Plugin):
         self.expire = 60 * 60
 
     async def initialize(self) -> None:
+        table_name = CharacterDetailsSQLModel.__tablename__
+
         def fetch_and_update_objects(connection):
-            if not self.database.engine.dialect.has_table(connection, table_name="character_details"):
+            if not self.database.engine.dialect.has_table(connection, table_name=table_name):
                 logger.info("正在创建角色详细信息表")
-                table: "Table" = SQLModel.metadata.tables["character_details"]
+                table: "Table" = SQLModel.metadata.tables[table_name]
                 table.create(connection)
                 logger.success("创建角色详细信息表成功")
 
@@ -79,6 +91,7 @@ class CharacterDetails(Plugin):
         statement = delete(CharacterDetailsSQLModel).where(CharacterDetailsSQLModel.time_updated <= expire_time)
         async with AsyncSession(self.database.engine) as session:
             await session.execute(statement)
+            await session.commit()
 
     @staticmethod
     def get_qname(uid: int, character: int):
@@ -89,104 +102,187 @@ class CharacterDetails(Plugin):
         uid: int,
         character_id: int,
     ) -> Optional["MCRoleDetail"]:
-        name = self.get_qname(uid, character_id)
-        data = await self.redis.get(name)
-        if data is None:
-            return None
-        json_data = str(data, encoding="utf-8")
-        return MCRoleDetail.parse_raw(json_data)
-
-    async def set_character_details(self, player_id: int, character_id: int, data: str):
-        randint = random.randint(1, 30)  # nosec
-        await self.redis.set(
-            self.get_qname(player_id, character_id), data, ex=self.expire + randint * 60
-        )  # 使用随机数防止缓存雪崩
+        details = await self.get_characters_details_for_redis(uid, [character_id])
+        return details.get(character_id)
+
+    async def get_characters_details_for_redis(
+        self,
+        uid: int,
+        character_ids: List[int],
+    ) -> Dict[int, "MCRoleDetail"]:
+        """使用一次 MGET 读取多个角色的缓存
+        :return: 角色 ID 与详细信息，没有缓存或无法解析的角色不会出现在结果中
+        """
+        if not character_ids:
+            return {}
+        values = await self.redis.mget([self.get_qname(uid, i) for i in character_ids])
+        result = {}
+        for character_id, data in zip(character_ids, values):
+            if data is None:
+                continue
+            try:
+                result[character_id] = decode_detail(data)
+            except ValueError as exc:
+                logger.warning("解析角色详细信息缓存失败 uid[%s] character_id[%s] %s", uid, character_id, repr(exc))
+        return result
+
+    def get_upsert_statement(self, rows: List[Dict]):
+        """根据数据库类型生成批量写入语句，不支持的数据库返回 None"""
+        table = CharacterDetailsSQLModel.__table__
+        dialect = self.database.engine.dialect.name
+        if dialect == "mysql":
+            statement = mysql.insert(table).values(rows)
+            return statement.on_duplicate_key_update(
+                data=statement.inserted.data, time_updated=statement.inserted.time_updated
+            )
+        if dialect in ("postgresql", "sqlite"):
+            insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            statement = insert(table).values(rows)
+            return statement.on_conflict_do_update(
+                index_elements=[table.c.player_id, table.c.character_id],
+                set_={"data": statement.excluded.data, "time_updated": statement.excluded.time_updated},
+            )
+        return None
+
+    async def set_characters_details(self, player_id: int, details: Dict[int, bytes]):
+        """使用一个 Redis pipeline 与一条数据库语句写入多个角色的数据
+        :param player_id: 玩家 ID
+        :param details: 角色 ID 与 encode_detail 编码后的详细信息
+        """
+        if not details:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for character_id, data in details.items():
+                randint = random.randint(1, 30)  # nosec
+                # 使用随机数防止缓存雪崩
+                pipe.set(self.get_qname(player_id, character_id), data, ex=self.expire + randint * 60)
+            await pipe.execute()
+        now = datetime.now()
+        rows = [
+            {"player_id": player_id, "character_id": character_id, "data": data, "time_updated": now}
+            for character_id, data in details.items()
+        ]
         async with AsyncSession(self.database.engine) as session:
+            statement = self.get_upsert_statement(rows)
+            if statement is not None:
+                await session.execute(statement)
+                await session.commit()
+                return
             statement = (
                 select(CharacterDetailsSQLModel)
                 .where(CharacterDetailsSQLModel.player_id == player_id)
-                .where(CharacterDetailsSQLModel.character_id == character_id)
+                .where(CharacterDetailsSQLModel.character_id.in_(list(details)))
             )
             results = await session.exec(statement)
-            sql_data = results.first()
-        if sql_data is None:
-            sql_data = CharacterDetailsSQLModel(
-                player_id=player_id, character_id=character_id, data=data, time_updated=datetime.now()
-            )
-            async with AsyncSession(self.database.engine) as session:
+            old_data = {i.character_id: i for i in results.all()}
+            for row in rows:
+                sql_data = old_data.get(row["character_id"])
+                if sql_data is None:
+                    sql_data = CharacterDetailsSQLModel(**row)
+                else:
+                    sql_data.data = row["data"]
+                    sql_data.time_updated = now
                 session.add(sql_data)
-                await session.commit()
-        else:
-            sql_data.data = data
-            sql_data.time_updated = datetime.now()
-            async with AsyncSession(self.database.engine) as session:
-                session.add(sql_data)
-                await session.commit()
+            await session.commit()
 
-    async def set_character_details_task(self, player_id: int, character_id: int, data: str):
+    async def set_characters_details_task(self, player_id: int, details: Dict[int, bytes]):
         try:
-            await self.set_character_details(player_id, character_id, data)
+            await self.set_characters_details(player_id, details)
         except SQLAlchemyError as exc:
             logger.error("写入到数据库失败 code[%s]", exc.code)
             logger.debug("写入到数据库失败", exc_info=exc)
         except Exception as exc:
-            logger.error("set_character_details 执行失败", exc_info=exc)
+            logger.error("set_characters_details 执行失败", exc_info=exc)
+
+    async def set_character_details(self, player_id: int, character_id: int, data: bytes):
+        await self.set_characters_details(player_id, {character_id: data})
+
+    async def set_character_details_task(self, player_id: int, character_id: int, data: bytes):
+        await self.set_characters_details_task(player_id, {character_id: data})
 
     async def get_character_details_for_mysql(
         self,
         uid: int,
         character_id: int,
     ) -> Optional["MCRoleDetail"]:
+        details = await self.get_characters_details_for_mysql(uid, [character_id])
+        return details.get(character_id)
+
+    async def get_characters_details_for_mysql(
+        self,
+        uid: int,
+        character_ids: List[int],
+    ) -> Dict[int, "MCRoleDetail"]:
+        """一次查询读取多个角色保存在数据库中的数据，无法解析的数据会被删除"""
+        if not character_ids:
+            return {}
+        result = {}
         async with AsyncSession(self.database.engine) as session:
             statement = (
                 select(CharacterDetailsSQLModel)
                 .where(CharacterDetailsSQLModel.player_id == uid)
-                .where(CharacterDetailsSQLModel.character_id == character_id)
+                .where(CharacterDetailsSQLModel.character_id.in_(character_ids))
             )
             results = await session.exec(statement)
-            data = results.first()
-            if data is not None:
+            invalid = False
+            for data in results.all():
                 try:
-                    return MCRoleDetail.parse_raw(data.data)
-                except ValidationError as exc:
-                    logger.error("解析数据出现异常 ValidationError", exc_info=exc)
-                    await session.delete(data)
-                    await session.commit()
+                    result[data.character_id] = decode_detail(data.data)
                 except ValueError as exc:
-                    logger.error("解析数据出现异常 ValueError", exc_info=exc)
+                    logger.error("解析数据出现异常 %s", exc.__class__.__name__, exc_info=exc)
                     await session.delete(data)
-                    await session.commit()
-        return None
+                    invalid = True
+            if invalid:
+                await session.commit()
+        return result
+
+    async def get_characters_details(
+        self, client: "MCClient", characters: "Sequence[Union[int, MCRole]]"
+    ) -> Dict[int, Optional["MCRoleDetail"]]:
+        """批量获取角色详细信息，缓存读写均为批量操作，只请求没有缓存的角色
+        :param client: 客户端
+        :param characters: 角色或角色 ID
+        :return: 角色 ID 与详细信息，获取失败的角色为 None
+        """
+        uid = client.player_id
+        character_ids = [i.roleId if isinstance(i, MCRole) else i for i in characters]
+        result: Dict[int, Optional["MCRoleDetail"]] = dict.fromkeys(character_ids)
+        if uid is not None:
+            result.update(await self.get_characters_details_for_redis(uid, character_ids))
+        semaphore = asyncio.Semaphore(self.FETCH_CONCURRENCY)
+        limited: List[int] = []
+        fetched: Dict[int, bytes] = {}
+
+        async def fetch(character_id: int):
+            async with semaphore:
+                try:
+                    detail = await client.get_mc_role_detail(role_id=character_id)
+                except SimnetBadRequest as exc:
+                    if "Too Many Requests" in exc.message:
+                        limited.append(character_id)
+                        return
+                    raise exc
+            result[character_id] = detail
+            fetched[character_id] = encode_detail(detail)
+
+        await asyncio.gather(*[fetch(i) for i, detail in result.items() if detail is None])
+        if uid is None:
+            if limited:
+                logger.warning("Too Many Requests")
+            return result
+        if limited:
+            result.update(await self.get_characters_details_for_mysql(uid, limited))
+        if fetched:
+            asyncio.create_task(self.set_characters_details_task(uid, fetched))
+        return result
 
     async def get_character_details(
         self, client: "MCClient", character: "Union[int, MCRole]"
     ) -> Optional["MCRoleDetail"]:
         """缓存 character_details 并定时对其进行数据存储 当遇到 Too Many Requests 可以获取以前的数据"""
-        uid = client.player_id
-        if isinstance(character, MCRole):
-            character_id = character.roleId
-        else:
-            character_id = character
-        if uid is not None:
-            detail = await self.get_character_details_for_redis(uid, character_id)
-            if detail is not None:
-                return detail
-            try:
-                detail = await client.get_mc_role_detail(role_id=character_id)
-            except SimnetBadRequest as exc:
-                if "Too Many Requests" in exc.message:
-                    return await self.get_character_details_for_mysql(uid, character_id)
-                raise exc
-            asyncio.create_task(self.set_character_details(uid, character_id, detail.json(by_alias=True)))
-            return detail
-        try:
-            return await client.get_mc_role_detail(role_id=character_id)
-        except SimnetBadRequest as exc:
-            if "Too Many Requests" in exc.message:
-                logger.warning("Too Many Requests")
-            else:
-                raise exc
-        return None
+        character_id = character.roleId if isinstance(character, MCRole) else character
+        details = await self.get_characters_details(client, [character_id])
+        return details[character_id]
 
 
 class PlayerNotFoundError(Exception):
@@ -201,6 +297,33 @@ class CookiesNotFoundError(Exception):
         super().__init__(f"{user_id} cookies not found")
 
 
+class MCClientPoolConfig(Settings):
+    """MCClient 客户端池配置"""
+
+    ttl: int = 300
+    """客户端最长空闲时间，单位秒"""
+    max_size: int = 1024
+    """最多保留的客户端数"""
+    cache_ttl: float = 0
+    """相同查询请求结果的缓存时间，单位秒，0 表示只合并正在进行的请求"""
+
+    model_config = SettingsConfigDict(env_prefix="mc_client_pool_")
+
+
+# 合并相同的并发请求的查询接口
+COALESCED_METHODS = (
+    "get_mc_notes",
+    "get_mc_notes_widget",
+    "get_mc_explorer",
+    "get_mc_roles",
+    "get_mc_role_detail",
+)
+
+
+async def _close_client(client: MCClient):
+    await client.shutdown()
+
+
 class GenshinHelper(Plugin):
     def __init__(
         self,
@@ -217,11 +340,61 @@ class GenshinHelper(Plugin):
         self.devices_service = devices
         if None in (temp := [self.user_service, self.cookies_service, self.players_service]):
             raise ServiceNotFoundError(*filter(lambda x: x is None, temp))
+        pool_config = MCClientPoolConfig()
+        # 相同账号的命令与定时任务复用同一个客户端，避免每次请求都重新建立连接
+        self.client_pool: ClientPool[tuple, MCClient] = ClientPool(
+            _close_client, ttl=pool_config.ttl, max_size=pool_config.max_size
+        )
+        # 群组中多人同时查询同一账号或重复点击时，相同的查询只向服务器请求一次
+        self.single_flight: SingleFlight[tuple] = SingleFlight(ttl=pool_config.cache_ttl)
+
+    async def shutdown(self) -> None:
+        await self.client_pool.close()
+
+    def coalesce_client(self, client: MCClient, scope: Hashable) -> MCClient:
+        """合并客户端上相同的并发查询请求
+        :param client: 客户端
+        :param scope: 请求的范围，相同范围与参数的请求会被合并
+        :return: 客户端
+        """
+        for name in COALESCED_METHODS:
+            method = getattr(client, name, None)
+            if method is not None:
+                setattr(client, name, self._coalesce_method(client, scope, name, method))
+        return client
+
+    def _coalesce_method(self, client: MCClient, scope: Hashable, name: str, method: Callable) -> Callable:
+        try:
+            signature = inspect.signature(method)
+        except (TypeError, ValueError):
+            signature = None
 
-    @asynccontextmanager
-    async def genshin(  # skipcq: PY-R1000 #
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs) -> Any:
+            key = (scope, client.player_id, name, get_call_key(signature, args, kwargs))
+            try:
+                hash(key)
+            except TypeError:
+                return await method(*args, **kwargs)
+            return await self.single_flight.do(key, lambda: method(*args, **kwargs))
+
+        return wrapper
+
+    @staticmethod
+    def get_cookies_fingerprint(cookies: Dict) -> Tuple:
+        return tuple(sorted((str(k), str(v)) for k, v in cookies.items()))
+
+    @staticmethod
+    def get_region(region: RegionEnum) -> Region:
+        if region == RegionEnum.HYPERION:  # 国服
+            return Region.CHINESE
+        if region == RegionEnum.HOYOLAB:  # 国际服
+            return Region.OVERSEAS
+        raise TypeError("Region is not None")
+
+    async def get_player_cookies(
         self, user_id: int, region: Optional[RegionEnum] = None, player_id: int = None, offset: int = 0
-    ) -> MCClient:
+    ):
         player = await self.players_service.get_player(user_id, region, player_id, offset)
         if player is None:
             raise PlayerNotFoundError(user_id)
@@ -231,25 +404,39 @@ class GenshinHelper(Plugin):
         cookie_model = await self.cookies_service.get(player.user_id, player.account_id, player.region)
         if cookie_model is None:
             raise CookiesNotFoundError(user_id, player.region)
-        cookies = cookie_model.data
-
-        if player.region == RegionEnum.HYPERION:  # 国服
-            region = Region.CHINESE
-        elif player.region == RegionEnum.HOYOLAB:  # 国际服
-            region = Region.OVERSEAS
-        else:
-            raise TypeError("Region is not None")
-
-        async with MCClient(
-            cookies,
-            region=region,
-            account_id=player.account_id,
-            player_id=player.player_id,
-            lang="zh-cn",
-        ) as client:
+        return player, cookie_model
+
+    def get_pooled_client(self, player, cookies: Dict):
+        """获取客户端池中的参数
+        :return: 客户端的键、Cookies 指纹与创建客户端的函数
+        """
+        region = self.get_region(player.region)
+        key = (player.account_id, region, player.player_id)
+
+        def factory() -> MCClient:
+            client = MCClient(
+                cookies,
+                region=region,
+                account_id=player.account_id,
+                player_id=player.player_id,
+                lang="zh-cn",
+            )
+            return self.coalesce_client(client, ("account", player.account_id))
+
+        return key, self.get_cookies_fingerprint(cookies), factory
+
+    @asynccontextmanager
+    async def genshin(  # skipcq: PY-R1000 #
+        self, user_id: int, region: Optional[RegionEnum] = None, player_id: int = None, offset: int = 0
+    ) -> MCClient:
+        player, cookie_model = await self.get_player_cookies(user_id, region, player_id, offset)
+        key, fingerprint, factory = self.get_pooled_client(player, cookie_model.data)
+
+        async with self.client_pool.use(key, fingerprint, factory) as client:
             try:
                 yield client
             except InvalidCookies as exc:
+                await self.client_pool.invalidate(key, client)
                 cookie_model.status = CookiesStatusEnum.INVALID_COOKIES
                 try:
                     await self.cookies_service.update(cookie_model)
@@ -265,31 +452,10 @@ class GenshinHelper(Plugin):
     async def get_genshin_client(
         self, user_id: int, region: Optional[RegionEnum] = None, player_id: int = None, offset: int = 0
     ) -> MCClient:
-        player = await self.players_service.get_player(user_id, region, player_id, offset)
-        if player is None:
-            raise PlayerNotFoundError(user_id)
-
-        if player.account_id is None:
-            raise CookiesNotFoundError(user_id, player.region)
-        cookie_model = await self.cookies_service.get(player.user_id, player.account_id, player.region)
-        if cookie_model is None:
-            raise CookiesNotFoundError(user_id, player.region)
-        cookies = cookie_model.data
-
-        if player.region == RegionEnum.HYPERION:
-            region = Region.CHINESE
-        elif player.region == RegionEnum.HOYOLAB:
-            region = Region.OVERSEAS
-        else:
-            raise TypeError("Region is not None")
-
-        return MCClient(
-            cookies,
-            region=region,
-            account_id=player.account_id,
-            player_id=player.player_id,
-            lang="zh-cn",
-        )
+        """获取不在客户端池中的客户端，由调用方负责关闭，一般应使用 genshin"""
+        player, cookie_model = await self.get_player_cookies(user_id, region, player_id, offset)
+        _, _, factory = self.get_pooled_client(player, cookie_model.data)
+        return factory()
 
     @asynccontextmanager
     async def public_genshin(
@@ -303,19 +469,22 @@ class GenshinHelper(Plugin):
 
         cookies = await self.public_cookies_service.get_cookies(user_id, region)
 
-        if region == RegionEnum.HYPERION:
-            region = Region.CHINESE
-        elif region == RegionEnum.HOYOLAB:
-            region = Region.OVERSEAS
-        else:
+        if region not in (RegionEnum.HYPERION, RegionEnum.HOYOLAB):
             raise TypeError("Region is not `RegionEnum.NULL`")
+        region = self.get_region(region)
+
+        def factory() -> MCClient:
+            client = MCClient(
+                cookies.data,
+                region=region,
+                player_id=uid,
+                lang="zh-cn",
+            )
+            # 公共 Cookies 查询到的数据与使用哪个 Cookies 无关
+            return self.coalesce_client(client, "public")
 
-        async with MCClient(
-            cookies.data,
-            region=region,
-            player_id=uid,
-            lang="zh-cn",
-        ) as client:
+        key = ("public", cookies.account_id, region, uid)
+        async with self.client_pool.use(key, self.get_cookies_fingerprint(cookies.data), factory) as client:
             yield client
 
     @asynccontextmanager
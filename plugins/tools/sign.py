@@ -4,26 +4,33 @@ from enum import Enum
 from typing import Optional, Tuple, List, TYPE_CHECKING
 
 from httpx import TimeoutException
+from kuronet import Game
 from kuronet.errors import BadRequest as SimnetBadRequest, AlreadyClaimed, InvalidCookies, TimedOut as SimnetTimedOut
+from kuronet.utils.player import recognize_region
 from sqlalchemy.orm.exc import StaleDataError
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode
 from telegram.error import Forbidden, BadRequest
 
 from core.config import config
+from core.dependence.database import Database
 from core.dependence.redisdb import RedisDB
 from core.plugin import Plugin
 from core.services.cookies import CookiesService
+from core.services.task.batch import update_batch
 from core.services.task.models import TaskStatusEnum
 from core.services.task.services import SignServices
 from core.services.users.services import UserService
+from gram_core.basemodel import Settings, SettingsConfigDict
 from modules.apihelper.client.components.verify import Verify
 from plugins.tools.genshin import PlayerNotFoundError, CookiesNotFoundError, GenshinHelper
+from utils.limiter import KeyedTokenBucket, TokenBucket
 from utils.log import logger
 
 if TYPE_CHECKING:
     from kuronet import MCClient
     from telegram.ext import ContextTypes
+    from core.services.task.models import Task
 
 
 class SignJobType(Enum):
@@ -45,6 +52,21 @@ class NeedChallenge(Exception):
         self.challenge = challenge
 
 
+class SignJobConfig(Settings):
+    """自动签到任务配置"""
+
+    workers: int = 8
+    """同时执行签到的协程数"""
+    region_rate: float = 5.0
+    """每个服务器每秒最多发起的签到数"""
+    message_rate: float = 20.0
+    """每秒最多发送的消息数"""
+    batch_size: int = 100
+    """每次写入数据库的签到状态数"""
+
+    model_config = SettingsConfigDict(env_prefix="sign_job_")
+
+
 class SignSystem(Plugin):
     def __init__(
         self,
@@ -53,7 +75,9 @@ class SignSystem(Plugin):
         cookies_service: CookiesService,
         sign_service: SignServices,
         genshin_helper: GenshinHelper,
+        database: Database = None,
     ):
+        self.database = database
         self.cookies_service = cookies_service
         self.user_service = user_service
         self.sign_service = sign_service
@@ -157,6 +181,82 @@ class SignSystem(Plugin):
         )
         return message
 
+    async def sign_one(self, sign_db: "Task", title: str) -> Optional[str]:
+        """为一个用户执行签到并更新状态
+        :return: 需要发送的消息，用户已被移除时返回 None
+        """
+        user_id = sign_db.user_id
+        player_id = sign_db.player_id
+        try:
+            async with self.genshin_helper.genshin(user_id, player_id=player_id) as client:
+                text = await self.start_sign(client, is_raise=True, title=title)
+        except InvalidCookies:
+            text = "自动签到执行失败，Cookie无效"
+            sign_db.status = TaskStatusEnum.INVALID_COOKIES
+        except AlreadyClaimed:
+            text = "今天开拓者已经签到过了~"
+            sign_db.status = TaskStatusEnum.ALREADY_CLAIMED
+        except SimnetBadRequest as exc:
+            text = f"自动签到执行失败，API返回信息为 {str(exc)}"
+            sign_db.status = TaskStatusEnum.GENSHIN_EXCEPTION
+        except SimnetTimedOut:
+            text = "签到失败了呜呜呜 ~ 服务器连接超时 服务器熟啦 ~ "
+            sign_db.status = TaskStatusEnum.TIMEOUT_ERROR
+        except NeedChallenge:
+            text = "签到失败，触发验证码风控"
+            sign_db.status = TaskStatusEnum.NEED_CHALLENGE
+        except PlayerNotFoundError:
+            logger.info("用户 user_id[%s] 玩家不存在 关闭并移除自动签到", user_id)
+            await self.sign_service.remove(sign_db)
+            return None
+        except CookiesNotFoundError:
+            logger.info("用户 user_id[%s] cookie 不存在 关闭并移除自动签到", user_id)
+            await self.sign_service.remove(sign_db)
+            return None
+        except Exception as exc:
+            logger.error("执行自动签到时发生错误 user_id[%s]", user_id, exc_info=exc)
+            text = "签到失败了呜呜呜 ~ 执行自动签到时发生错误"
+        else:
+            sign_db.status = TaskStatusEnum.STATUS_SUCCESS
+        return text
+
+    async def send_sign_result(self, context: "ContextTypes.DEFAULT_TYPE", sign_db: "Task", text: str) -> bool:
+        """发送签到结果并更新状态
+        :return: 是否需要写入数据库
+        """
+        user_id = sign_db.user_id
+        if sign_db.chat_id < 0:
+            text = f'<a href="tg://user?id={sign_db.user_id}">NOTICE {sign_db.user_id}</a>\n\n{text}'
+        try:
+            await context.bot.send_message(sign_db.chat_id, text, parse_mode=ParseMode.HTML)
+        except BadRequest as exc:
+            logger.error("执行自动签到时发生错误 user_id[%s] Message[%s]", user_id, exc.message)
+            sign_db.status = TaskStatusEnum.BAD_REQUEST
+        except Forbidden as exc:
+            logger.error("执行自动签到时发生错误 user_id[%s] message[%s]", user_id, exc.message)
+            sign_db.status = TaskStatusEnum.FORBIDDEN
+        except Exception as exc:
+            logger.error("执行自动签到时发生错误 user_id[%s]", user_id, exc_info=exc)
+            return False
+        else:
+            sign_db.status = TaskStatusEnum.STATUS_SUCCESS
+        return True
+
+    async def update_sign_batch(self, sign_list: List["Task"]):
+        """批量写入签到状态，已过期的数据跳过，不影响其余数据"""
+        if not sign_list:
+            return
+        if self.database is not None:
+            user_ids = [i.user_id for i in sign_list]
+            for index in await update_batch(self.database.engine, sign_list):
+                logger.warning("用户 user_id[%s] 自动签到数据过期，跳过更新数据", user_ids[index])
+            return
+        for sign_db in sign_list:
+            try:
+                await self.sign_service.update(sign_db)
+            except StaleDataError:
+                logger.warning("用户 user_id[%s] 自动签到数据过期，跳过更新数据", sign_db.user_id)
+
     async def do_sign_job(self, context: "ContextTypes.DEFAULT_TYPE", job_type: SignJobType):
         include_status: List[TaskStatusEnum] = [
             TaskStatusEnum.STATUS_SUCCESS,
@@ -172,59 +272,58 @@ class SignSystem(Plugin):
             include_status.remove(TaskStatusEnum.ALREADY_CLAIMED)
         else:
             raise ValueError
-        sign_list = await self.sign_service.get_all()
+        sign_list = [i for i in await self.sign_service.get_all() if i.status in include_status]
+        job_config = SignJobConfig()
+        start_time = time.monotonic()
+        sign_queue: "asyncio.Queue[Task]" = asyncio.Queue()
         for sign_db in sign_list:
-            if sign_db.status not in include_status:
-                continue
-            user_id = sign_db.user_id
-            player_id = sign_db.player_id
-            try:
-                async with self.genshin_helper.genshin(user_id, player_id=player_id) as client:
-                    text = await self.start_sign(client, is_sleep=True, is_raise=True, title=title)
-            except InvalidCookies:
-                text = "自动签到执行失败，Cookie无效"
-                sign_db.status = TaskStatusEnum.INVALID_COOKIES
-            except AlreadyClaimed:
-                text = "今天开拓者已经签到过了~"
-                sign_db.status = TaskStatusEnum.ALREADY_CLAIMED
-            except SimnetBadRequest as exc:
-                text = f"自动签到执行失败，API返回信息为 {str(exc)}"
-                sign_db.status = TaskStatusEnum.GENSHIN_EXCEPTION
-            except SimnetTimedOut:
-                text = "签到失败了呜呜呜 ~ 服务器连接超时 服务器熟啦 ~ "
-                sign_db.status = TaskStatusEnum.TIMEOUT_ERROR
-            except NeedChallenge:
-                text = "签到失败，触发验证码风控"
-                sign_db.status = TaskStatusEnum.NEED_CHALLENGE
-            except PlayerNotFoundError:
-                logger.info("用户 user_id[%s] 玩家不存在 关闭并移除自动签到", user_id)
-                await self.sign_service.remove(sign_db)
-                continue
-            except CookiesNotFoundError:
-                logger.info("用户 user_id[%s] cookie 不存在 关闭并移除自动签到", user_id)
-                await self.sign_service.remove(sign_db)
-                continue
-            except Exception as exc:
-                logger.error("执行自动签到时发生错误 user_id[%s]", user_id, exc_info=exc)
-                text = "签到失败了呜呜呜 ~ 执行自动签到时发生错误"
-            else:
-                sign_db.status = TaskStatusEnum.STATUS_SUCCESS
-            if sign_db.chat_id < 0:
-                text = f'<a href="tg://user?id={sign_db.user_id}">NOTICE {sign_db.user_id}</a>\n\n{text}'
-            try:
-                await context.bot.send_message(sign_db.chat_id, text, parse_mode=ParseMode.HTML)
-            except BadRequest as exc:
-                logger.error("执行自动签到时发生错误 user_id[%s] Message[%s]", user_id, exc.message)
-                sign_db.status = TaskStatusEnum.BAD_REQUEST
-            except Forbidden as exc:
-                logger.error("执行自动签到时发生错误 user_id[%s] message[%s]", user_id, exc.message)
-                sign_db.status = TaskStatusEnum.FORBIDDEN
-            except Exception as exc:
-                logger.error("执行自动签到时发生错误 user_id[%s]", user_id, exc_info=exc)
-                continue
-            else:
-                sign_db.status = TaskStatusEnum.STATUS_SUCCESS
+            sign_queue.put_nowait(sign_db)
+        # 签到结果交给单独的发送协程，签到不会被 Telegram 的发送速度拖慢
+        message_queue: "asyncio.Queue[Optional[Tuple[Task, str]]]" = asyncio.Queue()
+        region_limiter = KeyedTokenBucket(job_config.region_rate)
+        message_limiter = TokenBucket(job_config.message_rate)
+
+        async def sign_worker():
+            while True:
+                try:
+                    sign_db = sign_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await region_limiter.acquire(recognize_region(sign_db.player_id, Game.MC))
+                    text = await self.sign_one(sign_db, title)
+                except Exception as exc:  # pylint: disable=W0703
+                    logger.error("执行自动签到时发生错误 user_id[%s]", sign_db.user_id, exc_info=exc)
+                    continue
+                if text is not None:
+                    await message_queue.put((sign_db, text))
+
+        async def flush(pending: List["Task"]):
+            # 写入失败只影响这一批数据，不能结束发送协程，否则之后的签到结果都不会被发送
             try:
-                await self.sign_service.update(sign_db)
-            except StaleDataError:
-                logger.warning("用户 user_id[%s] 自动签到数据过期，跳过更新数据", user_id)
+                await self.update_sign_batch(pending)
+            except Exception as exc:  # pylint: disable=W0703
+                logger.error("批量写入自动签到状态时发生错误 共 %s 个用户", len(pending), exc_info=exc)
+
+        async def message_worker():
+            pending = []
+            while (item := await message_queue.get()) is not None:
+                sign_db, text = item
+                try:
+                    await message_limiter.acquire()
+                    if await self.send_sign_result(context, sign_db, text):
+                        pending.append(sign_db)
+                except Exception as exc:  # pylint: disable=W0703
+                    logger.error("发送自动签到结果时发生错误 user_id[%s]", sign_db.user_id, exc_info=exc)
+                if len(pending) >= job_config.batch_size:
+                    await flush(pending)
+                    pending = []
+            await flush(pending)
+
+        message_task = asyncio.create_task(message_worker())
+        try:
+            await asyncio.gather(*(sign_worker() for _ in range(max(job_config.workers, 1))))
+        finally:
+            await message_queue.put(None)
+            await message_task
+        logger.info("%s完成 共 %s 个用户 耗时 %.1f 秒", title, len(sign_list), time.monotonic() - start_time)
@@ -0,0 +1,54 @@
+import zlib
+from typing import List
+
+import pytest
+from pydantic import BaseModel, Field
+
+from modules.character_details import codec
+from modules.character_details.codec import MAGIC, SCHEMA_VERSION, decode_detail, encode_detail
+
+
+class RoleDetail(BaseModel):
+    role_id: int = Field(alias="roleId")
+    level: int
+    chains: List[str] = []
+
+
+@pytest.fixture(autouse=True)
+def role_detail_model(monkeypatch):
+    # 只测试存储格式，使用字段结构相同的简单模型代替 MCRoleDetail
+    monkeypatch.setattr(codec, "MCRoleDetail", RoleDetail)
+
+
+def make_detail() -> RoleDetail:
+    return RoleDetail(roleId=1304, level=90, chains=["第一链"] * 50)
+
+
+def test_codec_round_trip():
+    detail = make_detail()
+    data = encode_detail(detail)
+    assert data[: len(MAGIC)] == b"CD" and data[len(MAGIC)] == SCHEMA_VERSION
+    assert len(data) < len(detail.model_dump_json(by_alias=True).encode("utf-8"))
+    assert decode_detail(data) == detail
+
+
+def test_codec_legacy_json():
+    detail = make_detail()
+    legacy = detail.model_dump_json(by_alias=True)
+    assert decode_detail(legacy) == detail
+    assert decode_detail(legacy.encode("utf-8")) == detail
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"CD",
+        b"XX\x01" + zlib.compress(b"{}"),
+        MAGIC + bytes((SCHEMA_VERSION + 1,)) + zlib.compress(b"{}"),
+        MAGIC + bytes((SCHEMA_VERSION,)) + b"not zlib",
+    ],
+)
+def test_codec_invalid(data):
+    with pytest.raises(ValueError):
+        decode_detail(data)
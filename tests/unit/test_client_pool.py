@@ -0,0 +1,62 @@
+from utils.client_pool import ClientPool
+
+
+class FakeClient:
+    def __init__(self, name: str):
+        self.name = name
+        self.closed = False
+
+
+def make_pool(**kwargs):
+    async def closer(client: FakeClient):
+        client.closed = True
+
+    return ClientPool(closer, **kwargs)
+
+
+async def test_client_pool_reuse_and_fingerprint():
+    pool = make_pool()
+    async with pool.use("a", 1, lambda: FakeClient("a1")) as client:
+        first = client
+    async with pool.use("a", 1, lambda: FakeClient("a2")) as client:
+        assert client is first
+    async with pool.use("a", 2, lambda: FakeClient("a3")) as client:
+        assert client.name == "a3"
+    assert first.closed
+    await pool.close()
+    assert client.closed and len(pool) == 0
+
+
+async def get(pool, key, factory):
+    async with pool.use(key, 0, factory) as client:
+        return client
+
+
+async def test_client_pool_evict():
+    pool = make_pool(max_size=2)
+    clients = [await get(pool, i, lambda i=i: FakeClient(str(i))) for i in range(3)]
+    assert len(pool) == 2 and 0 not in pool
+    assert clients[0].closed and not clients[2].closed
+
+    pool = make_pool(ttl=0)
+    async with pool.use("a", 0, lambda: FakeClient("a")) as client:
+        await get(pool, "b", lambda: FakeClient("b"))
+        # 正在使用的客户端在使用结束后才关闭
+        assert "a" not in pool and not client.closed
+    assert client.closed
+
+    # 超出数量时也不会关闭正在使用的客户端
+    pool = make_pool(max_size=1)
+    async with pool.use("a", 0, lambda: FakeClient("a")) as client:
+        await get(pool, "b", lambda: FakeClient("b"))
+        assert not client.closed
+    assert client.closed
+
+
+async def test_client_pool_invalidate():
+    pool = make_pool()
+    client = await get(pool, "a", lambda: FakeClient("a"))
+    await pool.invalidate("a", FakeClient("other"))
+    assert "a" in pool
+    await pool.invalidate("a", client)
+    assert "a" not in pool and client.closed
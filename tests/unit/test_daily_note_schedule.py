@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from modules.daily_note.schedule import (
+    RESIN_ONE_TIME,
+    DailyData,
+    NoteScheduler,
+    NoteSnapshot,
+    ResinData,
+    need_request,
+    next_request_time,
+)
+
+NOW = datetime(2024, 6, 1, 12, 0)
+MAX_SKIP = timedelta(minutes=120)
+RETRY = timedelta(minutes=20)
+
+
+def test_stamina_prediction():
+    snapshot = NoteSnapshot(NOW, 100, 240)
+    assert snapshot.stamina_at(NOW - RESIN_ONE_TIME) == 100
+    assert snapshot.stamina_at(NOW + RESIN_ONE_TIME * 10 + timedelta(minutes=5)) == 110
+    assert snapshot.stamina_at(NOW + RESIN_ONE_TIME * 1000) == 240
+
+    resin = ResinData(notice_num=140)
+    # 第 40 次恢复时达到提醒数值
+    crossing = NOW + RESIN_ONE_TIME * 40
+    assert not need_request(resin, None, snapshot, crossing - timedelta(seconds=1), MAX_SKIP * 10)
+    assert need_request(resin, None, snapshot, crossing, MAX_SKIP * 10)
+    assert next_request_time(resin, None, snapshot, NOW, MAX_SKIP * 10, RETRY) == crossing
+    # 超过最长跳过时间时重新请求
+    assert next_request_time(resin, None, snapshot, NOW, MAX_SKIP, RETRY) == NOW + MAX_SKIP
+    assert need_request(resin, None, snapshot, NOW + MAX_SKIP, MAX_SKIP)
+    # 上限低于提醒数值时不会触发提醒
+    assert next_request_time(resin, None, NoteSnapshot(NOW, 100, 120), NOW, MAX_SKIP, RETRY) == NOW + MAX_SKIP
+    # 已提醒时需要确认结晶波片被使用
+    resin.noticed = True
+    assert need_request(resin, None, snapshot, NOW, MAX_SKIP)
+    assert next_request_time(resin, None, snapshot, NOW, MAX_SKIP, RETRY) == NOW + RETRY
+    assert need_request(resin, None, None, NOW, MAX_SKIP)
+
+
+def test_daily_notice_time():
+    snapshot = NoteSnapshot(NOW, 0, 240)
+    daily = DailyData(notice_hour=13)
+    assert not need_request(None, daily, snapshot, NOW, MAX_SKIP)
+    assert need_request(None, daily, snapshot, NOW.replace(hour=13), MAX_SKIP)
+    assert next_request_time(None, daily, snapshot, NOW, timedelta(days=1), RETRY) == NOW.replace(hour=13)
+    daily.notice_hour = 11
+    tomorrow = NOW.replace(hour=11) + timedelta(days=1)
+    assert next_request_time(None, daily, snapshot, NOW, timedelta(days=2), RETRY) == tomorrow
+
+
+def test_note_scheduler_lazy_deletion():
+    scheduler = NoteScheduler()
+    scheduler.schedule((1, 1), NOW + timedelta(minutes=10))
+    scheduler.schedule((2, 2), NOW + timedelta(minutes=5))
+    scheduler.schedule((3, 3), NOW + timedelta(minutes=1))
+    # 重新安排后旧的记录失效
+    scheduler.schedule((1, 1), NOW + timedelta(minutes=30))
+    scheduler.remove((3, 3))
+    assert len(scheduler) == 2 and (3, 3) not in scheduler
+    assert scheduler.pop_due(NOW + timedelta(minutes=15)) == [(2, 2)]
+    assert (1, 1) in scheduler
+    assert scheduler.pop_due(NOW + timedelta(minutes=30)) == [(1, 1)]
+    assert not scheduler.pop_due(NOW + timedelta(days=1))
+
+    for i in range(10):
+        scheduler.schedule((i, i), NOW)
+    scheduler.retain({(0, 0)})
+    assert len(scheduler) == 1
+    assert scheduler.pop_due(NOW) == [(0, 0)]
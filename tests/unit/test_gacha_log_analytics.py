@@ -0,0 +1,78 @@
+import datetime
+
+from modules.gacha_log import analytics
+from modules.gacha_log.analytics import PoolAnalytics, most_common
+from modules.gacha_log.models import GachaItem
+
+
+def make_items():
+    base = datetime.datetime(2024, 5, 23, 10, 0, 0)
+    result = []
+    for i in range(300):
+        rank = "5" if i % 70 == 69 else ("4" if i % 10 == 9 else "3")
+        names = {
+            "5": "卡卡罗" if i == 139 else "今汐",
+            "4": "散华" if i % 20 == 9 else "白芷",
+            "3": "源能长刃·测壹",
+        }
+        name = names[rank]
+        result.append(
+            GachaItem(
+                id=str(i),
+                name=name,
+                gacha_type="1",
+                item_type="武器" if rank == "3" else "角色",
+                rank_type=rank,
+                time=base + datetime.timedelta(days=i // 10),
+            )
+        )
+    return result
+
+
+def check_up(name: str, _: datetime.datetime) -> bool:
+    return name != "卡卡罗"
+
+
+def run(data):
+    pool = PoolAnalytics(data)
+    five, no_five_star = pool.five_star_items("角色祈愿", check_up)
+    four, no_four_star = pool.four_star_items()
+    banners = pool.banner_windows(
+        [{"name": "test", "five": [], "four": [], "from": "2024-05-25 00:00:00", "to": "2024-05-30 23:59:59"}]
+    )
+    return (
+        [(i.name, i.count, i.isUp, i.isBig) for i in five],
+        no_five_star,
+        [(i.name, i.count) for i in four],
+        no_four_star,
+        [(i.count, i.start, i.end) for i in banners],
+    )
+
+
+def test_pool_analytics():
+    data = make_items()
+    five, no_five_star, four, no_four_star, banners = run(data)
+    assert five == [
+        ("今汐", 70, True, False),
+        ("今汐", 70, True, True),
+        ("卡卡罗", 70, False, False),
+        ("今汐", 70, True, False),
+    ]
+    assert no_five_star == 20
+    assert len(four) == 30 - 4 and four[-1] == ("散华", 10)
+    assert no_four_star == 0
+    assert banners == [(60, data[20].time, data[79].time)]
+
+
+def test_pool_analytics_without_numpy(monkeypatch):
+    data = make_items()
+    expected = run(data)
+    monkeypatch.setattr(analytics, "np", None)
+    assert run(data) == expected
+
+
+def test_most_common():
+    names = ["白芷", "散华"] * 50 + ["秧秧"]
+    assert most_common(names) == ("白芷", 50)
+    assert most_common(list(reversed(names))) == ("散华", 50)
+    assert most_common([]) == ("", 0)
@@ -0,0 +1,88 @@
+import asyncio
+import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.services.gacha_log_rank.models import GachaLogRank, GachaLogTypeEnum
+from modules.gacha_log.models import GachaItem, GachaLogInfo
+from modules.gacha_log.recount import RecountCheckpoint, bulk_upsert_ranks, recount_worker
+from modules.gacha_log.storage import JsonGachaLogStorage
+
+
+def test_recount_checkpoint(tmp_path):
+    path = tmp_path / "rank_recount.json"
+    checkpoint = RecountCheckpoint(path)
+    assert not checkpoint.load()
+    checkpoint.update([("1", "100000001"), ("2", "100000002")])
+
+    checkpoint = RecountCheckpoint(path)
+    assert checkpoint.load()
+    assert checkpoint.is_done(("1", "100000001"))
+    assert not checkpoint.is_done(("3", "100000003"))
+
+    checkpoint.remove()
+    assert not path.exists()
+    assert not RecountCheckpoint(path).load()
+
+
+def test_recount_worker(tmp_path):
+    base = datetime.datetime(2024, 5, 23, 10, 0, 0)
+    info = GachaLogInfo(user_id="1", uid="100000001", update_time=datetime.datetime.now(), import_type="UIGF")
+    info.item_list["角色祈愿"] = [
+        GachaItem(
+            id=str(1000 + i),
+            name="今汐" if i % 80 == 79 else "散华",
+            gacha_type="1",
+            item_type="角色",
+            rank_type="5" if i % 80 == 79 else "4",
+            time=base + datetime.timedelta(minutes=i),
+        )
+        for i in range(160)
+    ]
+    asyncio.run(JsonGachaLogStorage(tmp_path).save("1", "100000001", info))
+    files = sorted(i.name for i in tmp_path.iterdir())
+
+    result = recount_worker(str(tmp_path), [("1", "100000001"), ("2", "100000002")])
+    assert [key for key, _ in result] == [("1", "100000001"), ("2", "100000002")]
+    ranks = result[0][1]
+    assert len(ranks) == 1
+    rank = GachaLogRank(**ranks[0])
+    assert (rank.player_id, rank.type, rank.score_1, rank.score_2) == (100000001, GachaLogTypeEnum.CHARACTER, 160, 8000)
+    # 不存在的记录返回空列表，子进程不写入任何文件
+    assert result[1][1] == []
+    assert sorted(i.name for i in tmp_path.iterdir()) == files
+
+
+async def test_bulk_upsert_ranks():
+    pytest.importorskip("aiosqlite")
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.create_all, tables=[GachaLogRank.__table__])
+    try:
+        await bulk_upsert_ranks(
+            engine,
+            [
+                GachaLogRank(player_id=1, type=GachaLogTypeEnum.CHARACTER, score_1=10),
+                GachaLogRank(player_id=1, type=GachaLogTypeEnum.WEAPON, score_1=20),
+            ],
+        )
+        await bulk_upsert_ranks(
+            engine,
+            [
+                GachaLogRank(player_id=1, type=GachaLogTypeEnum.CHARACTER, score_1=11, score_2=5),
+                GachaLogRank(player_id=2, type=GachaLogTypeEnum.CHARACTER, score_1=30),
+                GachaLogRank(player_id=2, type=GachaLogTypeEnum.CHARACTER, score_1=31),
+            ],
+        )
+        async with AsyncSession(engine) as session:
+            ranks = (await session.exec(select(GachaLogRank).order_by(GachaLogRank.player_id, GachaLogRank.type))).all()
+        assert [(i.player_id, i.type, i.score_1, i.score_2) for i in ranks] == [
+            (1, GachaLogTypeEnum.CHARACTER, 11, 5),
+            (1, GachaLogTypeEnum.WEAPON, 20, None),
+            (2, GachaLogTypeEnum.CHARACTER, 31, None),
+        ]
+    finally:
+        await engine.dispose()
@@ -0,0 +1,84 @@
+import asyncio
+import datetime
+
+import pytest
+
+from modules.gacha_log.models import GachaItem, GachaLogInfo
+from modules.gacha_log.storage import ColumnarGachaLogStorage, JsonGachaLogStorage
+
+
+def make_items(start: int, count: int):
+    base = datetime.datetime(2024, 5, 23, 10, 0, 0)
+    return [
+        GachaItem(
+            id=str(1000 + i),
+            name="今汐" if i % 80 == 79 else "散华",
+            gacha_type="1",
+            item_type="角色",
+            rank_type="5" if i % 80 == 79 else "4",
+            time=base + datetime.timedelta(minutes=i // 10),
+        )
+        for i in range(start, start + count)
+    ]
+
+
+def make_info(count: int) -> GachaLogInfo:
+    info = GachaLogInfo(user_id="1", uid="100000001", update_time=datetime.datetime.now(), import_type="UIGF")
+    info.item_list["角色祈愿"] = make_items(0, count)
+    return info
+
+
+def dump(info: GachaLogInfo):
+    return {k: [i.model_dump() for i in v] for k, v in info.item_list.items()}
+
+
+@pytest.mark.asyncio
+async def test_columnar_round_trip(tmp_path):
+    info = make_info(200)
+    storage = ColumnarGachaLogStorage(tmp_path)
+    await storage.save("1", "100000001", info)
+    data = await ColumnarGachaLogStorage(tmp_path).load("1", "100000001")
+    assert dump(data) == dump(info)
+    assert list(data.item_list) == list(info.item_list)
+
+
+@pytest.mark.asyncio
+async def test_columnar_append_and_rewrite(tmp_path):
+    info = make_info(200)
+    storage = ColumnarGachaLogStorage(tmp_path)
+    await storage.save("1", "100000001", info)
+    file_path = storage.get_file_path("1", "100000001")
+    size = file_path.stat().st_size
+
+    info.item_list["角色祈愿"].extend(make_items(200, 10))
+    await storage.save("1", "100000001", info)
+    assert not storage.get_file_path("1", "100000001", bak=True).exists()
+    assert file_path.stat().st_size > size
+    assert dump(await ColumnarGachaLogStorage(tmp_path).load("1", "100000001")) == dump(info)
+
+    older = make_items(0, 1)[0]
+    older.id, older.time = "abc", datetime.datetime(2020, 1, 1)
+    info.item_list["角色祈愿"].insert(0, older)
+    await storage.save("1", "100000001", info)
+    assert storage.get_file_path("1", "100000001", bak=True).exists()
+    assert dump(await ColumnarGachaLogStorage(tmp_path).load("1", "100000001")) == dump(info)
+
+
+@pytest.mark.asyncio
+async def test_columnar_migrate_json(tmp_path):
+    info = make_info(100)
+    await JsonGachaLogStorage(tmp_path).save("1", "100000001", info)
+    storage = ColumnarGachaLogStorage(tmp_path)
+    assert storage.exists("1", "100000001")
+    assert dump(await storage.load("1", "100000001")) == dump(info)
+    assert storage.get_file_path("1", "100000001").exists()
+    assert list(storage.iter_keys()) == [("1", "100000001")]
+
+
+@pytest.mark.asyncio
+async def test_columnar_lock_per_file(tmp_path):
+    storage = ColumnarGachaLogStorage(tmp_path)
+    async with storage.get_lock(storage.get_file_path("1", "100000001")):
+        # 其他用户的保存不等待该文件的锁
+        await asyncio.wait_for(storage.save("2", "100000002", make_info(10)), 1)
+    assert storage.get_file_path("2", "100000002").exists()
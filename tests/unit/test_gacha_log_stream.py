@@ -0,0 +1,39 @@
+import json
+from io import BytesIO
+
+import pytest
+
+from modules.gacha_log.stream import UIGFStreamReader
+
+
+def make_data(count: int):
+    return {
+        "list": [
+            {"id": str(1000 + i), "name": "今汐", "gacha_type": "1", "rank_type": "5", "count": i * 1234567}
+            for i in range(count)
+        ],
+        "info": {"uid": "100000001", "export_app": "UIGF", "region_time_zone": 8, "extra": [1.5, None, True]},
+    }
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 64 * 1024])
+def test_stream_reader(read_size):
+    data = make_data(23)
+    raw = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8-sig")
+    reader = UIGFStreamReader(BytesIO(raw), read_size=read_size)
+    chunks = list(reader.iter_items(chunk_size=10))
+    assert [len(i) for i in chunks] == [10, 10, 3]
+    assert [j for i in chunks for j in i] == data["list"]
+    assert reader.info == data["info"]
+
+
+def test_stream_reader_empty_list():
+    reader = UIGFStreamReader(BytesIO(b'{"info": {"uid": "1"}, "list": []}'))
+    assert reader.read_all() == ({"uid": "1"}, [])
+
+
+def test_stream_reader_invalid():
+    with pytest.raises(ValueError):
+        UIGFStreamReader(BytesIO(b'{"info": {"uid": "1"}, "list": [{"id": 1} {"id": 2}]}'), read_size=4).read_all()
+    with pytest.raises(ValueError):
+        UIGFStreamReader(BytesIO(b'{"info": {"uid": "1"}, "list": [{"id": 1}'), read_size=4).read_all()
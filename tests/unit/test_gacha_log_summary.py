@@ -0,0 +1,80 @@
+import datetime
+
+from modules.gacha_log import summary as summary_module
+from modules.gacha_log.models import GachaItem, GachaLogInfo
+from modules.gacha_log.storage import ColumnarGachaLogStorage
+from modules.gacha_log.summary import GachaLogSummaries
+
+
+class Summaries(GachaLogSummaries):
+    def __init__(self, path):
+        self.gacha_log_path = path
+        self.storage = ColumnarGachaLogStorage(path)
+        self.built = 0
+
+    @staticmethod
+    def check_avatar_up(name: str, __: datetime.datetime) -> bool:
+        return name != "卡卡罗"
+
+    async def build_summary(self, gacha_log: GachaLogInfo, content_hash: str = ""):
+        self.built += 1
+        return await super().build_summary(gacha_log, content_hash)
+
+
+def make_info(count: int) -> GachaLogInfo:
+    base = datetime.datetime(2024, 5, 23, 10, 0, 0)
+    info = GachaLogInfo(user_id="1", uid="100000001", update_time=datetime.datetime.now(), import_type="UIGF")
+    info.item_list["角色祈愿"] = [
+        GachaItem(
+            id=str(1000 + i),
+            name="今汐" if i % 80 == 79 else "散华",
+            gacha_type="1",
+            item_type="角色",
+            rank_type="5" if i % 80 == 79 else "4",
+            time=base + datetime.timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+    return info
+
+
+async def test_gacha_log_summary_cache(tmp_path, monkeypatch):
+    summaries = Summaries(tmp_path)
+    info = make_info(160)
+    await summaries.storage.save("1", "100000001", info)
+
+    summary = await summaries.get_summary("1", "100000001")
+    pool = summary.pools["角色祈愿"]
+    assert (pool.total, len(pool.five), pool.no_five_star) == (160, 2, 0)
+    assert summaries.get_summary_path("1", "100000001").exists()
+    assert (await summaries.get_summary("1", "100000001")).hash == summary.hash
+    assert summaries.built == 1
+
+    # 抽卡记录变化
+    info.item_list["角色祈愿"].extend(make_info(170).item_list["角色祈愿"][160:])
+    await summaries.storage.save("1", "100000001", info)
+    assert (await summaries.get_summary("1", "100000001")).pools["角色祈愿"].no_five_star == 10
+    assert summaries.built == 2
+
+    # 统计逻辑或卡池数据变化
+    monkeypatch.setattr(summary_module, "SUMMARY_VERSION", summary_module.SUMMARY_VERSION + 1)
+    assert (await summaries.get_summary("1", "100000001")).version == summary_module.SUMMARY_VERSION
+    assert summaries.built == 3
+    monkeypatch.setattr(Summaries, "POOL_METADATA_HASH", "new")
+    assert (await summaries.get_summary("1", "100000001")).pool_hash == "new"
+    assert summaries.built == 4
+    await summaries.get_summary("1", "100000001")
+    assert summaries.built == 4
+
+
+async def test_gacha_log_read_summary(tmp_path):
+    summaries = Summaries(tmp_path)
+    legacy = summaries.storage.legacy
+    await legacy.save("1", "100000001", make_info(80))
+    files = sorted(i.name for i in tmp_path.iterdir())
+
+    summary = await summaries.read_summary("1", "100000001")
+    assert summary.pools["角色祈愿"].total == 80
+    # 只读：不迁移旧版记录，也不保存统计
+    assert sorted(i.name for i in tmp_path.iterdir()) == files
+    assert await summaries.read_summary("1", "100000002") is None
@@ -0,0 +1,58 @@
+import logging
+import queue
+import threading
+
+from utils.log._queue import QueueHandler, QueueListener
+
+
+class _Handler(logging.Handler):
+    def __init__(self, event: threading.Event = None):
+        super().__init__()
+        self.event = event
+        self.started = threading.Event()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.started.set()
+        if self.event is not None:
+            self.event.wait(5)
+        self.messages.append(record.getMessage())
+
+
+def _record(level: int, msg: str, *args) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 0, msg, args, None)
+
+
+def test_queue_handler_drop_and_summary():
+    event = threading.Event()
+    handler = _Handler(event)
+    queue_handler = QueueHandler(queue.Queue(2), block_timeout=0.01)
+    listener = QueueListener(queue_handler, handler, logger_name="test")
+    listener.start()
+    data = {"value": 0}
+    queue_handler.handle(_record(logging.INFO, "data %s", data))
+    data["value"] = 1
+    assert handler.started.wait(5)
+    for i in range(10):
+        queue_handler.handle(_record(logging.DEBUG, "debug %s", i))
+    event.set()
+    listener.stop()
+    assert handler.messages[0] == "data {'value': 0}"
+    assert "日志队列已满，丢弃了 8 条日志" in handler.messages
+    assert len(handler.messages) == 4
+
+
+def test_queue_listener_handler_error(monkeypatch):
+    class _Broken(logging.Handler):
+        def emit(self, record: logging.LogRecord) -> None:
+            raise RuntimeError
+
+    monkeypatch.setattr(logging, "raiseExceptions", False)
+    handler = _Handler()
+    queue_handler = QueueHandler(queue.Queue(10))
+    listener = QueueListener(queue_handler, _Broken(), handler)
+    listener.start()
+    queue_handler.handle(_record(logging.ERROR, "first"))
+    queue_handler.handle(_record(logging.ERROR, "second"))
+    listener.stop()
+    assert handler.messages == ["first", "second"]
@@ -0,0 +1,78 @@
+import json
+import os
+
+from metadata import genshin
+from metadata.cache import CompiledMetadata, load_compiled
+
+DATA = {
+    "10000001": {"name": "今汐", "icon": "UI_AvatarIcon_Jinhsi", "rarity": 5, "skills": [1, 2]},
+    "10000002": {"name": "散华", "icon": "UI_AvatarIcon_Sanhua", "rarity": 4, "skills": [3]},
+}
+
+
+def write_json(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def test_compiled_metadata_round_trip(tmp_path):
+    source = tmp_path / "avatar.json"
+    write_json(source, DATA)
+    compiled = load_compiled(source)
+    try:
+        assert source.with_suffix(".mdc").exists()
+        assert list(compiled) == list(DATA) and len(compiled) == 2 and "10000001" in compiled
+        # 索引只读取标量字段，不解码值
+        assert dict(compiled.index_items())["10000001"] == {"name": "今汐", "icon": "UI_AvatarIcon_Jinhsi", "rarity": 5}
+        assert not compiled._decoded  # pylint: disable=W0212
+        assert dict(compiled) == DATA
+    finally:
+        compiled.close()
+
+
+def test_compiled_metadata_recompile(tmp_path, monkeypatch):
+    source = tmp_path / "avatar.json"
+    write_json(source, DATA)
+    load_compiled(source).close()
+
+    calls = []
+    compile_ = CompiledMetadata.compile
+    monkeypatch.setattr(CompiledMetadata, "compile", staticmethod(lambda *args: calls.append(args)))
+    # 只修改了修改时间时复用缓存
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    load_compiled(source).close()
+    assert not calls
+
+    monkeypatch.setattr(CompiledMetadata, "compile", staticmethod(compile_))
+    write_json(source, {**DATA, "10000003": {"name": "秧秧"}})
+    compiled = load_compiled(source)
+    try:
+        assert compiled["10000003"] == {"name": "秧秧"}
+    finally:
+        compiled.close()
+
+
+def test_compiled_metadata_not_object(tmp_path):
+    source = tmp_path / "list.json"
+    write_json(source, [1, 2, 3])
+    assert load_compiled(source) is None
+
+
+def test_data_compiled_cache(tmp_path, monkeypatch):
+    write_json(tmp_path / "avatar.json", DATA)
+    monkeypatch.setattr(genshin, "data_dir", tmp_path)
+    monkeypatch.setattr(genshin._cache_config, "compiled_cache", True)  # pylint: disable=W0212
+    monkeypatch.setattr(genshin, "_cache", {})
+    data = genshin.Data("avatar")
+    try:
+        assert data.get_key_by_name("散华") == "10000002"
+        assert data.get_key_by_icon_suffix("Jinhsi") == "10000001"
+        assert not data.data._decoded  # pylint: disable=W0212
+        compiled = data.data
+        data.reload()
+        # 重新加载时关闭旧的映射
+        assert compiled._mmap.closed  # pylint: disable=W0212
+        assert data["10000001"]["skills"] == [1, 2]
+    finally:
+        genshin.Data._instances.remove(data)  # pylint: disable=W0212
+        data.reload()
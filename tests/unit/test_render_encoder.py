@@ -0,0 +1,72 @@
+from io import BytesIO
+
+import pytest
+
+from core.services.render_cache.encoder import ImageEncoder, OutputFormat, RenderOutputConfig
+from core.services.render_cache.services import RenderCacheService
+from core.services.template.models import FileType, RenderResult
+
+
+def test_render_encoder_scale_and_format():
+    encoder = ImageEncoder(RenderOutputConfig(templates={"bot/help/help.jinja2": OutputFormat.PNG}))
+    assert encoder.get_format("bot/help/help.jinja2") == OutputFormat.PNG
+    assert encoder.get_format("mc/stats/stats.jinja2") == OutputFormat.JPEG
+    assert encoder.get_format("bot/help/help.jinja2", OutputFormat.WEBP) == OutputFormat.WEBP
+    assert encoder.get_scale(1280, 900) == 1
+    assert encoder.get_scale(2080, 9920) == pytest.approx(10000 / 12000)
+    assert encoder.get_scale(2080, 20000) is None
+    assert encoder.get_scale(500, 10001) is None
+
+
+def make_png(width: int, height: int) -> bytes:
+    image_module = pytest.importorskip("PIL.Image")
+    output = BytesIO()
+    image_module.effect_noise((width, height), 64).convert("RGB").save(output, "PNG")
+    return output.getvalue()
+
+
+def test_render_encoder_encode():
+    image_module = pytest.importorskip("PIL.Image")
+    encoder = ImageEncoder(RenderOutputConfig(max_side_sum=1000))
+    data = make_png(400, 200)
+
+    result, suffix = encoder.encode(data, OutputFormat.JPEG)
+    assert suffix == "jpg"
+    with image_module.open(BytesIO(result)) as image:
+        assert (image.format, image.size) == ("JPEG", (400, 200))
+    assert encoder.encode(data, OutputFormat.PNG) == (data, "png")
+
+    # 宽高之和超出限制时缩放
+    result, suffix = encoder.encode(make_png(800, 400), OutputFormat.WEBP)
+    assert suffix == "webp"
+    with image_module.open(BytesIO(result)) as image:
+        assert (image.format, image.size) == ("WEBP", (666, 333))
+
+    # 宽高比或大小无法满足限制时保留原图
+    assert encoder.encode(make_png(30, 1000), OutputFormat.JPEG) == (None, "png")
+    encoder = ImageEncoder(RenderOutputConfig(max_size=1024))
+    assert encoder.encode(data, OutputFormat.JPEG) == (None, "png")
+
+
+class FakeCache:
+    def __init__(self):
+        self.file_ids = {}
+
+    async def get_file_id(self, digest: str, file_type: str):
+        return self.file_ids.get((digest, file_type))
+
+
+async def test_render_cache_document_fallback():
+    data = make_png(30, 1000)
+    cache = FakeCache()
+    service = RenderCacheService(None, cache)
+    result = RenderResult(html="", photo=data, file_type=FileType.PHOTO, cache=None, filename="a.png")
+    # 无法以图片发送时改为以文件发送
+    await service.encode(result, OutputFormat.JPEG)
+    assert (result.file_type, result.photo, result.filename) == (FileType.DOCUMENT, data, "a.png")
+
+    # 以文件发送的结果按图片请求时也能命中缓存
+    digest = service.get_digest("a.jinja2", {}, viewport=None, full_page=True, evaluate=None, query_selector=None)
+    cache.file_ids[(digest, FileType.DOCUMENT.name)] = "file_id"
+    result = await service.render("a.jinja2", {})
+    assert (result.file_type, result.photo) == (FileType.DOCUMENT, "file_id")
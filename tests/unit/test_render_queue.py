@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from core.services.render_cache.queue import RenderPriority, RenderQueue, RenderQueueFull
+
+
+async def test_render_queue_order():
+    queue = RenderQueue(workers=1, max_queue=10)
+    gate = asyncio.Event()
+    order = []
+
+    def render(name: str):
+        async def _render():
+            if name == "first":
+                await gate.wait()
+            order.append(name)
+            return name
+
+        return _render
+
+    first = asyncio.create_task(queue.run(render("first"), chat_id=1))
+    await asyncio.sleep(0)
+    tasks = [
+        asyncio.create_task(queue.run(render("a1"), chat_id="a")),
+        asyncio.create_task(queue.run(render("a2"), chat_id="a")),
+        asyncio.create_task(queue.run(render("b1"), chat_id="b")),
+        asyncio.create_task(queue.run(render("job"), priority=RenderPriority.BATCH)),
+        asyncio.create_task(queue.run(render("c1"), chat_id="c")),
+    ]
+    await asyncio.sleep(0)
+    assert queue.get_metrics()["queued"] == 5
+    gate.set()
+    await asyncio.gather(first, *tasks)
+    assert order == ["first", "a1", "b1", "c1", "a2", "job"]
+    assert queue.running == 0
+    assert queue.get_metrics()["completed"] == 6
+
+
+async def test_render_queue_backpressure_and_cancel():
+    queue = RenderQueue(workers=1, max_queue=1, template_workers=1)
+    gate = asyncio.Event()
+
+    async def render():
+        await gate.wait()
+
+    running = asyncio.create_task(queue.run(render, template="a"))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(queue.run(render, template="a"))
+    await asyncio.sleep(0)
+    with pytest.raises(RenderQueueFull):
+        await queue.run(render, template="b")
+    assert queue.rejected == 1
+    waiting.cancel()
+    await asyncio.sleep(0)
+    assert queue.queued == 0
+    gate.set()
+    await running
+    assert queue.running == 0
+    assert await queue.run(lambda: asyncio.sleep(0, "ok"), template="a") == "ok"
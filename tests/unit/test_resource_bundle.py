@@ -0,0 +1,37 @@
+from utils import resource_bundle
+from utils.resource_bundle import get_asset, get_charset, to_unicode_range
+
+
+def test_to_unicode_range():
+    assert to_unicode_range([]) == ""
+    assert to_unicode_range([0x41]) == "U+41"
+    assert to_unicode_range([0x43, 0x41, 0x42, 0x4E00, 0x4E02]) == "U+41-43,U+4E00,U+4E02"
+
+
+def test_get_charset(tmp_path, monkeypatch):
+    resources, metadata = tmp_path / "resources", tmp_path / "metadata"
+    resources.mkdir()
+    metadata.mkdir()
+    (resources / "index.html").write_text("<p>鿏</p>", encoding="utf-8")
+    (resources / "ignored.png").write_text("鿐", encoding="utf-8")
+    (metadata / "data.json").write_text('{"name": "鿑"}', encoding="utf-8")
+    monkeypatch.setattr(resource_bundle, "RESOURCE_DIR", resources)
+    monkeypatch.setattr(resource_bundle, "METADATA_DIR", metadata)
+    charset = get_charset()
+    assert {ord("A"), ord("。"), ord("啊"), ord("鿏"), ord("鿑")} <= charset
+    assert ord("鿐") not in charset
+
+
+def test_get_asset(tmp_path, monkeypatch):
+    monkeypatch.setattr(resource_bundle, "RESOURCE_DIR", tmp_path)
+    monkeypatch.setattr(resource_bundle, "MANIFEST_PATH", tmp_path / "bundle.json")
+    (tmp_path / "bg.webp").write_bytes(b"")
+    resource_bundle.save_manifest({"fonts": {}, "images": {"bg.png": "bg.webp", "other.png": "other.webp"}})
+    resource_bundle._get_images.cache_clear()  # pylint: disable=W0212
+    try:
+        assert get_asset("bg.png") == "bg.webp"
+        # 转换结果不存在或未转换时使用原图
+        assert get_asset("other.png") == "other.png"
+        assert get_asset("logo.png") == "logo.png"
+    finally:
+        resource_bundle._get_images.cache_clear()  # pylint: disable=W0212
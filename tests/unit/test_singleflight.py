@@ -0,0 +1,72 @@
+import asyncio
+import inspect
+
+import pytest
+
+from utils.singleflight import SingleFlight, get_call_key
+
+
+async def test_single_flight_coalesce():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"stamina": 100}
+
+    results = await asyncio.gather(*(single_flight.do("notes", request) for _ in range(5)))
+    assert len(calls) == 1
+    assert all(i is results[0] for i in results)
+    await single_flight.do("notes", request)
+    assert len(calls) == 2
+
+
+async def test_single_flight_error_and_cancel():
+    single_flight = SingleFlight()
+
+    async def request():
+        await asyncio.sleep(0.01)
+        raise ValueError("Too Many Requests")
+
+    with pytest.raises(ValueError):
+        await asyncio.gather(single_flight.do("a", request), single_flight.do("a", request))
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return 1
+
+    first = asyncio.create_task(single_flight.do("b", slow))
+    second = asyncio.create_task(single_flight.do("b", slow))
+    await asyncio.sleep(0)
+    first.cancel()
+    # 一个调用者被取消不影响其他调用者
+    assert await second == 1
+
+
+async def test_single_flight_ttl():
+    single_flight = SingleFlight(ttl=60)
+    calls = []
+
+    async def request():
+        calls.append(1)
+        return len(calls)
+
+    assert await single_flight.do("a", request) == 1
+    assert await single_flight.do("a", request) == 1
+    single_flight.clear()
+    assert await single_flight.do("a", request) == 2
+
+
+def test_single_flight_call_key():
+    async def request(player_id=None, lang="zh-cn", **kwargs):
+        return player_id, lang, kwargs
+
+    signature = inspect.signature(request)
+    key = get_call_key(signature, (), {})
+    assert get_call_key(signature, (None,), {}) == key
+    assert get_call_key(signature, (), {"lang": "zh-cn"}) == key
+    assert get_call_key(signature, (1,), {}) == get_call_key(signature, (), {"player_id": 1}) != key
+    assert get_call_key(signature, (), {"a": 1, "b": 2}) == get_call_key(signature, (), {"b": 2, "a": 1})
+    # 参数与签名不符时按原样生成
+    assert get_call_key(signature, (1, 2, 3), {}) == ((1, 2, 3), ())
@@ -0,0 +1,13 @@
+from utils import tailwind
+
+
+def test_tailwind_styles_up_to_date():
+    assert tailwind.get_families()
+    assert tailwind.get_stale_families() == []
+
+
+def test_tailwind_styles_dynamic_classes():
+    # 模板中按数据选择的类名也需要包含在预编译样式中
+    css = tailwind.STYLES_DIR.joinpath("genshin-gcsim.css").read_text(encoding="utf-8")
+    for name in ("w-full", r"w-1\/2", r"w-1\/3", r"w-1\/4", "bg-blue-400", "bg-green-400", "bg-red-400"):
+        assert f".{name}{{" in css
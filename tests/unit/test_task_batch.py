@@ -0,0 +1,54 @@
+from typing import Optional
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Field, SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.services.task.batch import update_batch
+
+pytest.importorskip("aiosqlite")
+
+
+class BatchTask(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int
+    status: int = 0
+
+
+@pytest.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite://")
+
+    # pysqlite 默认不会发出 BEGIN，SAVEPOINT 需要自行开启事务
+    @event.listens_for(engine.sync_engine, "connect")
+    def _connect(dbapi_connection, _):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.create_all, tables=[BatchTask.__table__])
+    yield engine
+    await engine.dispose()
+
+
+async def test_update_batch_stale_row(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add_all([BatchTask(user_id=i) for i in range(3)])
+        await session.commit()
+        rows = list((await session.exec(select(BatchTask).order_by(BatchTask.id))).all())
+    async with AsyncSession(engine) as session:
+        await session.delete(await session.get(BatchTask, rows[1].id))
+        await session.commit()
+
+    for row in rows:
+        row.status = 1
+    assert await update_batch(engine, rows) == [1]
+    assert [(rows[0].user_id, rows[0].status), (rows[2].user_id, rows[2].status)] == [(0, 1), (2, 1)]
+    async with AsyncSession(engine) as session:
+        saved = (await session.exec(select(BatchTask).order_by(BatchTask.id))).all()
+    assert [(i.user_id, i.status) for i in saved] == [(0, 1), (2, 1)]
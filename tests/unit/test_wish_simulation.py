@@ -0,0 +1,32 @@
+from modules.wish import simulation
+from modules.wish.simulation import CHARACTER_BANNER, WEAPON_BANNER, PullSimulator, parse_simulate_args
+
+
+def test_pull_simulator_pity():
+    simulator = PullSimulator(CHARACTER_BANNER)
+    assert simulator.hard_pity == 80
+    totals = simulator.simulate(1, pity=79, guaranteed=True, samples=1000, seed=1)
+    assert set(totals) == {1}
+    totals = simulator.simulate(3, samples=1000, seed=1)
+    assert 3 <= min(totals) and max(totals) <= 3 * 2 * 80
+    weapon = PullSimulator(WEAPON_BANNER).simulate(1, samples=1000, seed=1)
+    assert max(weapon) <= 80
+
+
+def test_pull_simulator_pure_python(monkeypatch):
+    simulator = PullSimulator(CHARACTER_BANNER)
+    expected = simulator.run(1, pity=30, samples=20000, seed=1)
+    monkeypatch.setattr(simulation, "np", None)
+    result = simulator.run(1, pity=30, samples=20000, seed=1)
+    assert result.samples == 20000
+    assert abs(result.mean - expected.mean) < 2
+    assert abs(result.percentiles[50] - expected.percentiles[50]) <= 3
+
+
+def test_parse_simulate_args():
+    assert parse_simulate_args("唤取模拟", 7) == (False, 1)
+    assert parse_simulate_args("唤取模拟武器 3", 7) == (True, 3)
+    assert parse_simulate_args("唤取模拟 3", 7) == (False, 3)
+    assert parse_simulate_args("唤取模拟角色10", 7) == (False, 7)
+    assert parse_simulate_args("/summon_simulate@MCGram2Bot 武器 2", 7) == (True, 2)
+    assert parse_simulate_args("/summon_simulate@MCGram2Bot", 7) == (False, 1)
@@ -0,0 +1,134 @@
+"""按账号复用的 API 客户端池"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Generic, Hashable, List, Optional, TypeVar
+
+__all__ = ("ClientPool",)
+
+K = TypeVar("K", bound=Hashable)
+C = TypeVar("C")
+
+
+class _PoolEntry(Generic[C]):
+    __slots__ = ("client", "fingerprint", "last_used", "users", "stale")
+
+    def __init__(self, client: C, fingerprint: Hashable):
+        self.client = client
+        self.fingerprint = fingerprint
+        self.last_used = time.monotonic()
+        self.users = 0
+        self.stale = False
+
+
+class ClientPool(Generic[K, C]):
+    """客户端池
+
+    相同键的请求复用同一个客户端及其连接。``fingerprint`` 变化（如 Cookies 更新）时重新创建客户端，
+    空闲超过 ``ttl`` 秒或超过 ``max_size`` 的客户端会被移出池。客户端只能在 ``use`` 中使用，
+    使用期间被移出的客户端在使用结束后再关闭。
+    """
+
+    def __init__(self, closer: Callable[[C], Awaitable[None]], ttl: float = 300, max_size: int = 1024):
+        """
+        :param closer: 关闭客户端的函数
+        :param ttl: 客户端最长空闲时间，单位秒
+        :param max_size: 最多保留的客户端数
+        """
+        self.closer = closer
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[K, _PoolEntry[C]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def _evict(self, now: float) -> List[_PoolEntry[C]]:
+        """移除过期与超出数量的客户端，按最近使用顺序从最久未使用的开始检查
+        :return: 需要关闭的客户端
+        """
+        removed = []
+        for key, entry in list(self._entries.items()):
+            if len(self._entries) <= self.max_size and now - entry.last_used < self.ttl:
+                break
+            del self._entries[key]
+            entry.stale = True
+            if entry.users == 0:
+                removed.append(entry)
+        return removed
+
+    async def _close(self, entries: List[_PoolEntry[C]]):
+        for entry in entries:
+            try:
+                await self.closer(entry.client)
+            except Exception:  # pylint: disable=W0703
+                pass
+
+    async def _acquire(self, key: K, fingerprint: Hashable, factory: Callable[[], C]) -> _PoolEntry[C]:
+        now = time.monotonic()
+        removed = []
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.fingerprint != fingerprint:
+                del self._entries[key]
+                entry.stale = True
+                if entry.users == 0:
+                    removed.append(entry)
+                entry = None
+            if entry is None:
+                entry = self._entries[key] = _PoolEntry(factory(), fingerprint)
+            else:
+                self._entries.move_to_end(key)
+            entry.users += 1
+            entry.last_used = now
+            removed.extend(self._evict(now))
+        await self._close(removed)
+        return entry
+
+    async def _release(self, entry: _PoolEntry[C]):
+        entry.users -= 1
+        entry.last_used = time.monotonic()
+        if entry.stale and entry.users == 0:
+            await self._close([entry])
+
+    @asynccontextmanager
+    async def use(self, key: K, fingerprint: Hashable, factory: Callable[[], C]) -> AsyncIterator[C]:
+        """获取客户端，使用期间不会被关闭
+        :param key: 客户端的键
+        :param fingerprint: 客户端参数的指纹，与缓存的客户端不一致时重新创建
+        :param factory: 创建客户端的函数
+        """
+        entry = await self._acquire(key, fingerprint, factory)
+        try:
+            yield entry.client
+        finally:
+            await self._release(entry)
+
+    async def invalidate(self, key: K, client: Optional[C] = None):
+        """移除客户端，正在使用时在使用结束后关闭
+        :param key: 客户端的键
+        :param client: 只在缓存的客户端为该客户端时移除
+        """
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (client is not None and entry.client is not client):
+                return
+            del self._entries[key]
+            entry.stale = True
+        if entry.users == 0:
+            await self._close([entry])
+
+    async def close(self):
+        """关闭所有客户端"""
+        async with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.stale = True
+        await self._close([entry for entry in entries if entry.users == 0])
@@ -9,11 +9,11 @@ from pathlib import Path
 from typing import Awaitable, Callable, Iterator, Match, Pattern, Type, TypeVar, Union
 
 import aiofiles
-import httpx
 from httpx import UnsupportedProtocol
 from typing_extensions import ParamSpec
 
 from utils.const import REQUEST_HEADERS
+from utils.httpclient import get_client
 
 __all__ = ("sha1", "gen_pkg", "async_re_sub", "execute", "isabstract", "download_resource")
 
@@ -128,11 +128,10 @@ async def download_resource(url: str, return_path: bool = False, timeout: float
     temp_file_name = url_sha1 + extension
     file_dir = os.path.join(cache_dir, temp_file_name)
     if not os.path.exists(file_dir):
-        async with httpx.AsyncClient(headers=REQUEST_HEADERS, timeout=timeout) as client:
-            try:
-                data = await client.get(url)
-            except UnsupportedProtocol as exc:
-                raise RuntimeError("Unsupported Protocol") from exc
+        try:
+            data = await get_client().get(url, headers=REQUEST_HEADERS, timeout=timeout)
+        except UnsupportedProtocol as exc:
+            raise RuntimeError("Unsupported Protocol") from exc
         if data.is_error and data.status_code == 200:
             raise RuntimeError("Request Error")
         if data.status_code != 200:
@@ -0,0 +1,78 @@
+"""共用的 HTTP 客户端
+
+各模块通过名称获取客户端，同名的客户端在整个进程中共用连接池，避免每次请求都重新建立 TCP/TLS 连接。
+"""
+
+from typing import Any, Dict, Optional
+
+from httpx import AsyncClient, Limits, Timeout
+
+from utils.log import logger
+
+try:
+    import h2  # noqa: F401 pylint: disable=W0611
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+__all__ = ("HTTPClientRegistry", "http_clients", "get_client")
+
+
+class HTTPClientRegistry:
+    """HTTP 客户端注册表"""
+
+    def __init__(self):
+        self._clients: Dict[str, AsyncClient] = {}
+
+    @staticmethod
+    def get_limits() -> Limits:
+        from core.config import config  # pylint: disable=C0415
+
+        return Limits(
+            max_connections=config.connection_pool_size,
+            max_keepalive_connections=config.connection_pool_size,
+            keepalive_expiry=30.0,
+        )
+
+    def get(
+        self,
+        name: str = "default",
+        timeout: Optional[float] = None,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> AsyncClient:
+        """获取客户端，不存在或已关闭时创建，参数只在创建时生效
+        :param name: 客户端名称，需要独立 cookies 或请求头的模块应使用单独的名称
+        :param timeout: 默认超时时间
+        :param headers: 默认请求头
+        :return: 客户端
+        """
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = AsyncClient(
+                timeout=Timeout(timeout if timeout is not None else 5.0),
+                headers=headers,
+                limits=self.get_limits(),
+                http2=HTTP2_AVAILABLE,
+                **kwargs,
+            )
+        return client
+
+    async def close(self):
+        """关闭所有客户端"""
+        clients = list(self._clients.items())
+        self._clients.clear()
+        for name, client in clients:
+            try:
+                await client.aclose()
+            except Exception as exc:  # pylint: disable=W0703
+                logger.warning("关闭 HTTP 客户端 %s 失败 %s", name, repr(exc))
+
+
+http_clients = HTTPClientRegistry()
+
+
+def get_client(name: str = "default", **kwargs: Any) -> AsyncClient:
+    """从共用的注册表中获取客户端"""
+    return http_clients.get(name, **kwargs)
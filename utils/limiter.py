@@ -0,0 +1,68 @@
+"""异步限速工具"""
+
+import asyncio
+import time
+from typing import Dict, Generic, Hashable, Optional, TypeVar
+
+__all__ = ("TokenBucket", "KeyedTokenBucket")
+
+K = TypeVar("K", bound=Hashable)
+
+
+class TokenBucket:
+    """令牌桶
+
+    以固定速率补充令牌，允许不超过容量的突发请求。等待令牌的协程按先后顺序获得令牌。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        :param rate: 每秒补充的令牌数
+        :param capacity: 令牌桶容量，默认与 rate 相同
+        """
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        self.rate = rate
+        self.capacity = max(capacity if capacity is not None else rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """获取令牌，令牌不足时等待"""
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return None
+
+
+class KeyedTokenBucket(Generic[K]):
+    """按键区分的令牌桶，每个键单独限速"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets: Dict[K, TokenBucket] = {}
+
+    def get(self, key: K) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+        return bucket
+
+    async def acquire(self, key: K, tokens: float = 1.0):
+        await self.get(key).acquire(tokens)
@@ -2,7 +2,8 @@ from multiprocessing import RLock as Lock
 from pathlib import Path
 from typing import List, Literal, Optional, Union, ClassVar
 
-from pydantic_settings import BaseSettings
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from utils.const import PROJECT_ROOT
 
@@ -13,6 +14,8 @@ class LoggerConfig(BaseSettings):
     _lock: ClassVar[Lock] = Lock()
     _instance: ClassVar[Optional["LoggerConfig"]] = None
 
+    model_config = SettingsConfigDict(populate_by_name=True)
+
     def __new__(cls, *args, **kwargs) -> "LoggerConfig":
         with cls._lock:
             if cls._instance is None:
@@ -49,3 +52,8 @@ class LoggerConfig(BaseSettings):
     traceback_locals_max_depth: Optional[int] = None
     traceback_locals_max_length: int = 10
     traceback_locals_max_string: int = 80
+
+    queue: bool = Field(default=True, validation_alias="logger_queue")
+    """是否在后台线程中格式化与输出 log，开启后打印 log 时只将 record 放入队列"""
+    queue_size: int = Field(default=10000, validation_alias="logger_queue_size")
+    """队列的最大长度，队列已满时丢弃 WARNING 以下的 log"""
@@ -1,7 +1,9 @@
+import atexit
 import inspect
 import io
 import logging
 import os
+import queue
 import traceback as traceback_
 from multiprocessing import RLock as Lock
 from pathlib import Path
@@ -11,6 +13,7 @@ from typing import Any, Callable, List, Mapping, Optional, TYPE_CHECKING, Tuple,
 from typing_extensions import Self
 
 from utils.log._handler import FileHandler, Handler
+from utils.log._queue import QueueHandler, QueueListener
 from utils.typedefs import LogFilterType
 
 if TYPE_CHECKING:
@@ -73,21 +76,33 @@ class Logger(logging.Logger):  # skipcq: PY-A6006
                 **handler_config,
             ),
         )
+        handlers = [handler, debug_handler, error_handler]
+        formatter = logging.Formatter("%(message)s", self.config.time_format)
+        for item in handlers:
+            item.setFormatter(formatter)
+        warnings_handlers = [handler, debug_handler]
+        self.listener: Optional[QueueListener] = None
+        if self.config.queue:
+            # 格式化、渲染 traceback 与写入文件都在后台线程中进行
+            queue_handler = QueueHandler(queue.Queue(self.config.queue_size))
+            self.listener = QueueListener(queue_handler, *handlers, logger_name=self.config.name)
+            self.listener.start()
+            atexit.register(self.listener.stop)
+            handlers = warnings_handlers = [queue_handler]
         logging.basicConfig(
             level=10 if self.config.debug else 20,
             format="%(message)s",
             datefmt=self.config.time_format,
-            handlers=[handler, debug_handler, error_handler],
+            handlers=handlers,
         )
         if self.config.capture_warnings:
             logging.captureWarnings(True)
             warnings_logger = logging.getLogger("py.warnings")
-            warnings_logger.addHandler(handler)
-            warnings_logger.addHandler(debug_handler)
+            for warnings_handler in warnings_handlers:
+                warnings_logger.addHandler(warnings_handler)
 
-        self.addHandler(handler)
-        self.addHandler(debug_handler)
-        self.addHandler(error_handler)
+        for item in handlers:
+            self.addHandler(item)
 
     def success(
         self,
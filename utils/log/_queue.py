@@ -0,0 +1,99 @@
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler as DefaultQueueHandler, QueueListener as DefaultQueueListener
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from logging import LogRecord
+
+__all__ = ("QueueHandler", "QueueListener")
+
+
+class QueueHandler(DefaultQueueHandler):
+    """只将 record 放入队列，格式化与输出由 QueueListener 在后台线程中完成
+
+    队列已满时丢弃 WARNING 以下的 record 并计数，WARNING 及以上的 record 最多等待 block_timeout 秒。
+    """
+
+    def __init__(self, log_queue: "queue.Queue", block_timeout: float = 1.0) -> None:
+        super().__init__(log_queue)
+        self.block_timeout = block_timeout
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: "LogRecord") -> "LogRecord":
+        # 在当前线程合并参数，避免参数在输出前被修改
+        # 保留 exc_info，由后台线程渲染 traceback
+        if record.args and isinstance(record.msg, str):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: "LogRecord") -> None:
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if record.levelno >= logging.WARNING:
+            try:
+                self.queue.put(record, timeout=self.block_timeout)
+                return
+            except queue.Full:
+                pass
+        with self._dropped_lock:
+            self._dropped += 1
+
+    def pop_dropped(self) -> int:
+        """获取并清空丢弃的 record 数量"""
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        return dropped
+
+
+class QueueListener(DefaultQueueListener):
+    """在后台线程中将 record 交给实际的 handler，并汇总输出被丢弃的 record 数量"""
+
+    def __init__(self, queue_handler: QueueHandler, *handlers: logging.Handler, logger_name: str = "") -> None:
+        super().__init__(queue_handler.queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+        self.logger_name = logger_name
+
+    def report_dropped(self) -> None:
+        """输出被丢弃的 record 数量"""
+        dropped = self.queue_handler.pop_dropped()
+        if dropped:
+            record = logging.makeLogRecord(
+                {
+                    "name": self.logger_name,
+                    "levelno": logging.WARNING,
+                    "levelname": logging.getLevelName(logging.WARNING),
+                    "msg": f"日志队列已满，丢弃了 {dropped} 条日志",
+                }
+            )
+            self.dispatch(record)
+
+    def dispatch(self, record: "LogRecord") -> None:
+        # handler 出错时不能结束后台线程，否则之后的 log 都会被丢弃
+        for handler in self.handlers:
+            if record.levelno < handler.level:
+                continue
+            try:
+                handler.handle(record)
+            except Exception:  # pylint: disable=W0703
+                handler.handleError(record)
+
+    def handle(self, record: "LogRecord") -> None:
+        self.dispatch(self.prepare(record))
+        self.report_dropped()
+
+    def enqueue_sentinel(self) -> None:
+        # 队列已满时等待后台线程处理完队列中的 record
+        self.queue.put(self._sentinel)
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        super().stop()
+        self.report_dropped()
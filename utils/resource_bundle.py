@@ -0,0 +1,233 @@
+"""渲染资源预处理
+
+- 字体：按模板、元数据中出现的字符与常用汉字生成字体子集，``styles/fonts.css`` 中子集通过 ``unicode-range`` 优先使用，
+  子集中没有的字符（如玩家昵称中的生僻字）由浏览器回退加载完整字体。需要安装 fonttools，未安装时只使用完整字体。
+- 背景图片：``IMAGES`` 中的背景缩放后转换为 WebP，渲染时通过 ``get_asset`` 按 ``resources/bundle.json`` 解析，
+  不修改模板与 CSS，转换结果不存在时使用原图。需要 Pillow。
+
+fonttools 与 brotli 通过 ``pip install .[bundle]`` 安装。处理结果记录在 ``resources/bundle.json`` 中，修改模板或资源后重新执行::
+
+    python -m utils.resource_bundle
+"""
+
+import json
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+from utils.const import METADATA_DIR, RESOURCE_DIR
+from utils.log import logger
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:
+    font_subset = None
+
+try:
+    import brotli  # noqa: F401  pylint: disable=W0611
+except ImportError:
+    brotli = None
+
+__all__ = ("FontFace", "FONT_FACES", "IMAGES", "get_asset", "build_fonts", "build_images", "build")
+
+MANIFEST_PATH = RESOURCE_DIR / "bundle.json"
+FONTS_DIR = RESOURCE_DIR / "fonts"
+SUBSET_DIR = FONTS_DIR / "subset"
+FONTS_CSS_PATH = RESOURCE_DIR / "styles" / "fonts.css"
+TEXT_SUFFIXES = {".jinja2", ".html", ".css"}
+IMAGE_MAX_WIDTH = 1920
+IMAGE_QUALITY = 85
+
+
+class FontFace:
+    __slots__ = ("family", "weight", "file", "subset")
+
+    def __init__(self, family: str, weight: str, file: str, subset: bool = False):
+        self.family = family
+        self.weight = weight
+        self.file = file
+        self.subset = subset
+
+
+FONT_FACES = (
+    FontFace("seguiemj", "normal", "seguiemj.ttf"),
+    FontFace("HYWH", "200", "HYWenHei-35W.ttf", True),
+    FontFace("HYWH", "300", "HYWenHei-45W.ttf", True),
+    FontFace("HYWH", "400", "HYWenHei-55W.ttf", True),
+    FontFace("HYWH", "500", "HYWenHei-65W.ttf", True),
+    FontFace("HYWH", "600", "HYWenHei-75W.ttf", True),
+    FontFace("HYWH", "700", "HYWenHei-85W.ttf", True),
+    FontFace("Number", "normal", "tttgbnumber.ttf"),
+)
+
+
+IMAGES = (
+    "mc/gacha_log/img/mc.png",
+    "mc/stats/background/liyue.png",
+    "bot/help/background/2020021114213984258.png",
+)
+"""渲染时通过 get_asset 引用的背景图片"""
+
+
+def load_manifest() -> Dict[str, Dict[str, str]]:
+    if not MANIFEST_PATH.exists():
+        return {"fonts": {}, "images": {}}
+    return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+
+
+def save_manifest(manifest: Dict[str, Dict[str, str]]):
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2, sort_keys=True, ensure_ascii=False) + "\n", "utf-8")
+
+
+@lru_cache(1)
+def _get_images() -> Dict[str, str]:
+    # 转换结果不存在时（如未提交或已被删除）使用原图
+    return {k: v for k, v in load_manifest().get("images", {}).items() if (RESOURCE_DIR / v).exists()}
+
+
+def get_asset(path: str) -> str:
+    """获取资源处理后的路径
+    :param path: 相对于 resources 的路径
+    :return: 处理后的路径，未处理或处理结果不存在时返回原路径
+    """
+    return _get_images().get(path, path)
+
+
+def get_charset() -> Set[int]:
+    """字体子集需要包含的字符：ASCII、常用标点、GB2312 一级汉字以及模板与元数据中出现的字符"""
+    chars = set(range(0x20, 0x7F))
+    chars.update(range(0x3000, 0x3040))
+    chars.update(range(0xFF00, 0xFFF0))
+    for high in range(0xB0, 0xD8):
+        for low in range(0xA1, 0xFF):
+            try:
+                chars.add(ord(bytes((high, low)).decode("gb2312")))
+            except UnicodeDecodeError:
+                continue
+    files = [i for i in RESOURCE_DIR.rglob("*") if i.suffix in TEXT_SUFFIXES]
+    files.extend(METADATA_DIR.rglob("*.json"))
+    files.extend(METADATA_DIR.rglob("*.py"))
+    for path in files:
+        chars.update(ord(i) for i in path.read_text(encoding="utf-8", errors="ignore") if ord(i) > 0x7F)
+    return chars
+
+
+def to_unicode_range(codepoints: Iterable[int]) -> str:
+    ranges: List[Tuple[int, int]] = []
+    for codepoint in sorted(codepoints):
+        if ranges and ranges[-1][1] + 1 == codepoint:
+            ranges[-1] = (ranges[-1][0], codepoint)
+        else:
+            ranges.append((codepoint, codepoint))
+    return ",".join(f"U+{start:X}" if start == end else f"U+{start:X}-{end:X}" for start, end in ranges)
+
+
+def subset_font(path: Path, charset: Set[int]) -> Tuple[Path, Set[int]]:
+    """生成字体子集
+    :param path: 字体文件
+    :param charset: 需要包含的字符
+    :return: 子集文件与子集包含的字符
+    """
+    options = font_subset.Options()
+    options.flavor = "woff2" if brotli is not None else "woff"
+    options.layout_features = ["*"]
+    options.name_IDs = ["*"]
+    options.notdef_outline = True
+    font = font_subset.load_font(str(path), options)
+    codepoints = charset.intersection(font.getBestCmap())
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    SUBSET_DIR.mkdir(parents=True, exist_ok=True)
+    target = SUBSET_DIR / f"{path.stem}.{options.flavor}"
+    font_subset.save_font(font, str(target), options)
+    font.close()
+    return target, codepoints
+
+
+def _font_face_css(face: FontFace, url: str, font_format: str, unicode_range: str = "") -> str:
+    lines = [
+        "@font-face {",
+        f'    font-family: "{face.family}";',
+        f'    src: url("{url}") format("{font_format}");',
+        f"    font-weight: {face.weight};",
+        "    font-style: normal;",
+    ]
+    if unicode_range:
+        lines.append(f"    unicode-range: {unicode_range};")
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def build_fonts() -> Dict[str, str]:
+    """生成字体子集与 fonts.css
+    :return: 原字体文件与子集文件
+    """
+    if font_subset is None:
+        logger.warning("未安装 fonttools，fonts.css 只使用完整字体")
+    charset = get_charset() if font_subset is not None else set()
+    blocks = []
+    fonts = {}
+    for face in FONT_FACES:
+        path = FONTS_DIR / face.file
+        # 先声明完整字体，子集中没有的字符才会加载完整字体
+        blocks.append(_font_face_css(face, f"../fonts/{face.file}", "truetype"))
+        if not face.subset or font_subset is None or not path.exists():
+            continue
+        target, codepoints = subset_font(path, charset)
+        url = f"../fonts/subset/{target.name}"
+        blocks.append(_font_face_css(face, url, target.suffix[1:], to_unicode_range(codepoints)))
+        fonts[f"fonts/{face.file}"] = target.relative_to(RESOURCE_DIR).as_posix()
+        logger.info("字体子集 %s %s -> %s 字节", face.file, path.stat().st_size, target.stat().st_size)
+    FONTS_CSS_PATH.write_text(
+        "/* 由 python -m utils.resource_bundle 生成，请勿直接修改 */\n\n" + "\n\n".join(blocks) + "\n", "utf-8"
+    )
+    return fonts
+
+
+def convert_image(path: Path) -> bool:
+    """缩放图片并转换为 WebP，结果比原图小时保留
+    :param path: 图片文件
+    :return: 是否保留转换结果
+    """
+    from PIL import Image  # pylint: disable=C0415
+
+    target = path.with_suffix(".webp")
+    with Image.open(path) as image:
+        if image.width > IMAGE_MAX_WIDTH:
+            height = round(image.height * IMAGE_MAX_WIDTH / image.width)
+            image = image.resize((IMAGE_MAX_WIDTH, height), Image.LANCZOS)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or "A" in image.getbands() else "RGB")
+        image.save(target, "WEBP", quality=IMAGE_QUALITY, method=6)
+    if target.stat().st_size >= path.stat().st_size:
+        target.unlink()
+        return False
+    logger.info("转换图片 %s %s -> %s 字节", path.name, path.stat().st_size, target.stat().st_size)
+    return True
+
+
+def build_images() -> Dict[str, str]:
+    """转换 IMAGES 中的背景图片
+    :return: 原图片与转换后的图片
+    """
+    images = {}
+    for name in IMAGES:
+        path = RESOURCE_DIR / name
+        if path.exists() and convert_image(path):
+            images[name] = path.with_suffix(".webp").relative_to(RESOURCE_DIR).as_posix()
+    return images
+
+
+def build(images: bool = True):
+    manifest = load_manifest()
+    manifest["fonts"] = build_fonts()
+    if images:
+        manifest["images"] = build_images()
+    save_manifest(manifest)
+    _get_images.cache_clear()
+
+
+if __name__ == "__main__":
+    build("--no-images" not in sys.argv[1:])
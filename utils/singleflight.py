@@ -0,0 +1,97 @@
+"""合并相同的并发请求"""
+
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+__all__ = ("SingleFlight", "get_call_key")
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+def get_call_key(signature: Optional[inspect.Signature], args: Tuple, kwargs: Dict[str, Any]) -> Hashable:
+    """生成调用参数的键，以位置参数或关键字参数传入、省略或显式传入默认值的相同调用得到相同的键
+    :param signature: 函数签名，为 None 或参数与签名不符时按原样生成
+    :param args: 位置参数
+    :param kwargs: 关键字参数
+    :return: 参数的键
+    """
+    if signature is not None:
+        try:
+            bound = signature.bind(*args, **kwargs)
+        except TypeError:
+            pass
+        else:
+            bound.apply_defaults()
+            items = []
+            for name, value in bound.arguments.items():
+                if signature.parameters[name].kind == inspect.Parameter.VAR_KEYWORD:
+                    value = tuple(sorted(value.items()))
+                items.append((name, value))
+            return tuple(items)
+    return args, tuple(sorted(kwargs.items()))
+
+
+class SingleFlight(Generic[K]):
+    """相同键的请求在执行期间只会发起一次，其他调用者等待并共享同一个结果
+
+    请求在单独的任务中执行，某个调用者被取消不会影响其他调用者。``ttl`` 大于 0 时成功的结果会缓存 ``ttl`` 秒。
+    """
+
+    def __init__(self, ttl: float = 0, max_cache_size: int = 4096):
+        """
+        :param ttl: 结果缓存时间，单位秒，0 表示不缓存
+        :param max_cache_size: 最多缓存的结果数
+        """
+        self.ttl = ttl
+        self.max_cache_size = max_cache_size
+        self._calls: Dict[K, "asyncio.Task"] = {}
+        self._cache: Dict[K, Tuple[float, Any]] = {}
+
+    def _get_cache(self, key: K, now: float) -> Tuple[bool, Any]:
+        cached = self._cache.get(key)
+        if cached is None:
+            return False, None
+        expire, value = cached
+        if expire <= now:
+            del self._cache[key]
+            return False, None
+        return True, value
+
+    def _set_cache(self, key: K, value: Any, now: float):
+        if len(self._cache) >= self.max_cache_size:
+            self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+            if len(self._cache) >= self.max_cache_size:
+                self._cache.pop(next(iter(self._cache)))
+        self._cache[key] = (now + self.ttl, value)
+
+    def _on_done(self, key: K, task: "asyncio.Task"):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if task.cancelled():
+            return
+        # 所有调用者都被取消时避免出现 exception was never retrieved
+        if task.exception() is None and self.ttl > 0:
+            self._set_cache(key, task.result(), time.monotonic())
+
+    async def do(self, key: K, func: Callable[[], Awaitable[T]]) -> T:
+        """执行请求，相同键的请求正在执行时等待其结果
+        :param key: 请求的键
+        :param func: 发起请求的函数
+        :return: 请求结果
+        """
+        if self.ttl > 0:
+            hit, value = self._get_cache(key, time.monotonic())
+            if hit:
+                return value
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        return await asyncio.shield(task)
+
+    def clear(self):
+        """清除缓存的结果"""
+        self._cache.clear()
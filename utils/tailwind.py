@@ -0,0 +1,167 @@
+"""模板样式预编译
+
+模板通过 ``styles/tailwind/<family>.css`` 引用预编译的样式，不再在浏览器中加载 Tailwind JIT 脚本。
+同一目录下的模板为一个 family，构建时扫描目录中的模板与脚本中用到的类名，
+使用 node 执行 ``resources/js/tailwindcss-3.1.8.js`` 生成样式，结果与浏览器中生成的一致。
+
+修改模板后需要重新构建::
+
+    python -m utils.tailwind
+"""
+
+import hashlib
+import re
+import subprocess  # nosec B404
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+from utils.const import RESOURCE_DIR
+from utils.log import logger
+
+try:
+    import ujson as jsonlib
+except ImportError:
+    import json as jsonlib
+
+__all__ = ("STYLES_DIR", "get_families", "get_stale_families", "build", "check")
+
+TAILWIND_SCRIPT = RESOURCE_DIR / "js" / "tailwindcss-3.1.8.js"
+STYLES_DIR = RESOURCE_DIR / "styles" / "tailwind"
+MANIFEST_PATH = STYLES_DIR / "manifest.json"
+TEMPLATE_SUFFIXES = {".jinja2", ".html"}
+CONTENT_SUFFIXES = TEMPLATE_SUFFIXES | {".js"}
+_LINK_PATTERN = re.compile(r"styles/tailwind/([\w-]+)\.css")
+# 在 node 中模拟浏览器环境，将扫描到的内容作为页面的类名交给 Tailwind 处理
+_NODE_RUNNER = """
+const fs = require("fs");
+const vm = require("vm");
+const script = process.argv[1];
+const content = fs.readFileSync(0, "utf8");
+const observers = [];
+let style = null;
+globalThis.window = globalThis;
+globalThis.self = globalThis;
+globalThis.MutationObserver = class {
+  constructor(callback) { this.callback = callback; observers.push(this); }
+  observe() {}
+};
+globalThis.document = {
+  documentElement: {},
+  body: {},
+  head: { append(element) { style = element; } },
+  createElement() { return { isConnected: true }; },
+  querySelectorAll(selector) { return selector === "[class]" ? [{ classList: [content] }] : []; },
+};
+console.warn = () => {};
+vm.runInThisContext(fs.readFileSync(script, "utf8"), { filename: script });
+observers[0].callback([]).then(() => process.stdout.write(style ? style.textContent : ""));
+"""
+
+
+def get_families() -> Dict[str, List[Path]]:
+    """查找引用了预编译样式的模板目录
+    :return: family 名称与需要扫描的文件
+    """
+    families: Dict[str, set] = {}
+    for path in RESOURCE_DIR.rglob("*"):
+        if path.suffix not in TEMPLATE_SUFFIXES or path.name.startswith("example"):
+            continue
+        for family in _LINK_PATTERN.findall(path.read_text(encoding="utf-8")):
+            families.setdefault(family, set()).add(path.parent)
+    return {
+        family: sorted(
+            path
+            for directory in directories
+            for path in directory.iterdir()
+            if path.suffix in CONTENT_SUFFIXES and not path.name.startswith("example")
+        )
+        for family, directories in sorted(families.items())
+    }
+
+
+def get_digest(files: List[Path]) -> str:
+    """计算 family 内容与 Tailwind 脚本的哈希值"""
+    digest = hashlib.sha1()  # nosec B303
+    for path in [TAILWIND_SCRIPT] + files:
+        digest.update(path.relative_to(RESOURCE_DIR).as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def load_manifest() -> Dict[str, str]:
+    if not MANIFEST_PATH.exists():
+        return {}
+    return jsonlib.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+
+
+def get_stale_families() -> List[str]:
+    """样式已过期的 family"""
+    manifest = load_manifest()
+    return [
+        family
+        for family, files in get_families().items()
+        if manifest.get(family) != get_digest(files) or not STYLES_DIR.joinpath(f"{family}.css").exists()
+    ]
+
+
+def compile_css(content: str) -> str:
+    """生成内容中用到的样式
+    :param content: 模板内容
+    :return: 压缩后的样式
+    :raise RuntimeError: node 执行失败
+    """
+    try:
+        process = subprocess.run(  # nosec B603 B607
+            ["node", "-e", _NODE_RUNNER, str(TAILWIND_SCRIPT)],
+            input=content.encode("utf-8"),
+            capture_output=True,
+            check=False,
+        )
+    except FileNotFoundError as exc:
+        raise RuntimeError("node is required to build styles") from exc
+    if process.returncode != 0 or not process.stdout:
+        raise RuntimeError(process.stderr.decode("utf-8", errors="replace"))
+    css = process.stdout.decode("utf-8")
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s*\n\s*", "", css)
+    return css.strip() + "\n"
+
+
+def build(force: bool = False) -> List[str]:
+    """构建过期的样式
+    :param force: 是否重新构建所有样式
+    :return: 构建的 family
+    """
+    STYLES_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
+    families = get_families()
+    built = []
+    for family, files in families.items():
+        digest = get_digest(files)
+        target = STYLES_DIR / f"{family}.css"
+        if not force and manifest.get(family) == digest and target.exists():
+            continue
+        content = "\n".join(path.read_text(encoding="utf-8") for path in files)
+        target.write_text(compile_css(content), encoding="utf-8")
+        manifest[family] = digest
+        built.append(family)
+    manifest = {family: manifest[family] for family in families if family in manifest}
+    MANIFEST_PATH.write_text(jsonlib.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    return built
+
+
+def check():
+    """启动时检查样式是否过期"""
+    try:
+        stale = get_stale_families()
+    except OSError as exc:
+        logger.warning("检查模板样式失败", exc_info=exc)
+        return
+    if stale:
+        logger.warning("模板样式已过期 %s，请执行 python -m utils.tailwind 重新构建", "、".join(stale))
+
+
+if __name__ == "__main__":
+    for name in build("--force" in sys.argv[1:]):
+        print(f"built {name}")  # noqa: T201